@@ -0,0 +1,273 @@
+"""AI điều khiển một nhân vật: tìm kiếm nhìn trước trên bản sao headless (combat_core.Fighter) của trận đấu.
+
+Việc tìm kiếm chạy trong một tiến trình riêng; vòng lặp 60 fps chỉ gửi trạng thái hiện tại và kiểm tra
+(không chờ) xem đã có quyết định hay chưa. Độ khó = ngân sách thời gian cho mỗi quyết định: ngân sách
+càng lớn thì tìm kiếm lặp sâu dần (iterative deepening) đi được càng sâu.
+"""
+import multiprocessing
+import time
+
+from combat_core import Fighter, TickClock
+from combat_events import CombatEventBus
+from timers import TimerScheduler
+from profiler import percentile
+
+# Ngân sách thời gian (ms) cho mỗi quyết định theo độ khó
+DIFFICULTY_BUDGETS = {"easy": 0.3, "normal": 2.0, "hard": 10.0}
+
+AI_ACTIONS = ("attack", "defend", "release")
+
+# Luật chiến đấu được sao sang bản mô phỏng của AI
+RULE_NAMES = ("hit_display_duration", "healing_amount", "healing_interval", "attack_cooldown",
+              "attack_damage", "shield_broken_damage", "blocked_damage", "shield_max_hits")
+
+# Xác suất hành động của đối thủ (mô hình kỳ vọng) tại mỗi điểm quyết định
+OPPONENT_MODEL = {None: 0.5, "attack": 0.3, "defend": 0.15, "release": 0.05}
+
+
+class _SearchTimeout(Exception):
+    pass
+
+
+def fighter_config(fighter):
+    """Những gì bản mô phỏng cần biết về một nhân vật: loại, animation (số khung, fps) và luật."""
+    specs = {}
+    for anim_name in ("idle", fighter.attack_animation):
+        if fighter._has_animation(anim_name):
+            specs[anim_name] = (fighter._frame_count(anim_name), fighter.fps_settings.get(anim_name, 10))
+    return {"owner_type": fighter.owner_type, "animation_specs": specs,
+            "rules": {name: getattr(fighter, name) for name in RULE_NAMES}}
+
+
+def _make_fighter(config, clock, timers, events):
+    fighter = Fighter(config["owner_type"], clock=clock, animation_specs=config["animation_specs"], verbose=False,
+                      events=events, timers=timers)
+    for name, value in config["rules"].items():
+        setattr(fighter, name, value)
+    fighter.reschedule_timers() # Hẹn giờ hồi máu theo healing_interval vừa gán
+    return fighter
+
+
+class LookaheadSearch:
+    """Expectimax trên các điểm quyết định cách nhau decision_ms: AI chọn hành động tốt nhất,
+    đối thủ hành động theo OPPONENT_MODEL. Mỗi nút mô phỏng decision_ms bằng các bước step_ms."""
+
+    def __init__(self, me_config, opponent_config, decision_ms=100, step_ms=1000 / 60, max_depth=6):
+        self.clock = TickClock()
+        self.timers = TimerScheduler(self.clock)
+        # Bus riêng, không subscriber: các nhánh mô phỏng không gọi hiệu ứng/HUD của trận thật và không tạo CombatEvent
+        self.events = CombatEventBus()
+        self.me = _make_fighter(me_config, self.clock, self.timers, self.events)
+        self.opponent = _make_fighter(opponent_config, self.clock, self.timers, self.events)
+        self.me.opponent = self.opponent
+        self.opponent.opponent = self.me
+        self.decision_ms = decision_ms
+        self.step_ms = step_ms
+        self.max_depth = max_depth
+        self.nodes = 0
+        self._deadline = 0.0
+
+    # --- Mô phỏng ---
+    def _state(self):
+        return self.me.snapshot(), self.opponent.snapshot(), self.clock.now
+
+    def _restore(self, state):
+        me_state, opponent_state, self.clock.now = state
+        self.me.restore(me_state)
+        self.opponent.restore(opponent_state)
+
+    @staticmethod
+    def _legal(fighter):
+        """Các hành động có tác dụng ở trạng thái hiện tại (bỏ các nhánh không làm gì)."""
+        actions = [None]
+        if fighter.is_alive and fighter.action_state == "idle" and not fighter.is_showing_hit:
+            if fighter.clock() - fighter.last_attack_time >= fighter.attack_cooldown: # Cùng điều kiện với start_attack_direct
+                actions.append("attack")
+            actions.append("defend")
+        if fighter.is_defending:
+            actions.append("release")
+        return actions
+
+    @staticmethod
+    def _apply(fighter, action):
+        if action == "attack":
+            fighter.start_attack_direct()
+        elif action == "defend":
+            fighter.start_defend()
+        elif action == "release":
+            fighter.stop_defend()
+
+    def _play(self, my_action, opponent_action):
+        self._apply(self.me, my_action)
+        self._apply(self.opponent, opponent_action)
+        end = self.clock.now + self.decision_ms
+        while self.clock.now < end and self.me.is_alive and self.opponent.is_alive:
+            if self.me.is_alive:
+                self.me.update()
+            if self.opponent.is_alive:
+                self.opponent.update()
+            self.timers.run_due()
+            self.clock.advance(self.step_ms)
+
+    def _evaluate(self):
+        me, opponent = self.me, self.opponent
+        if not me.is_alive:
+            return -1000.0
+        if not opponent.is_alive:
+            return 1000.0
+        return (me.current_hp - opponent.current_hp) + 5 * (me.shield_hits_left - opponent.shield_hits_left)
+
+    # --- Tìm kiếm ---
+    def _expectimax(self, depth):
+        self.nodes += 1
+        if time.perf_counter() > self._deadline:
+            raise _SearchTimeout
+        if depth == 0 or not self.me.is_alive or not self.opponent.is_alive:
+            return self._evaluate(), None
+
+        state = self._state()
+        opponent_actions = self._legal(self.opponent)
+        weight_total = sum(OPPONENT_MODEL[action] for action in opponent_actions)
+        best_value, best_action = float("-inf"), None
+        for my_action in self._legal(self.me):
+            value = 0.0
+            for opponent_action in opponent_actions:
+                self._restore(state)
+                self._play(my_action, opponent_action)
+                value += OPPONENT_MODEL[opponent_action] / weight_total * self._expectimax(depth - 1)[0]
+            if value > best_value:
+                best_value, best_action = value, my_action
+        self._restore(state)
+        return best_value, best_action
+
+    def decide(self, me_state, opponent_state, now, budget_ms):
+        """Tìm sâu dần tới khi hết budget_ms; trả về (hành động, độ sâu đã hoàn thành, số nút)."""
+        self._restore((me_state, opponent_state, now))
+        self.nodes = 0
+        self._deadline = time.perf_counter() + budget_ms / 1000
+        action, completed_depth = None, 0
+        for depth in range(1, self.max_depth + 1):
+            try:
+                _, action = self._expectimax(depth)
+            except _SearchTimeout:
+                break
+            completed_depth = depth
+        return action, completed_depth, self.nodes
+
+
+def _worker_main(connection, me_config, opponent_config, search_options):
+    search = LookaheadSearch(me_config, opponent_config, **search_options)
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        request_id, me_state, opponent_state, now, budget_ms = request
+        action, depth, nodes = search.decide(me_state, opponent_state, now, budget_ms)
+        connection.send((request_id, action, depth, nodes))
+    connection.close()
+
+
+class AIController:
+    """Điều khiển `fighter` đánh với `opponent`; poll() mỗi khung hình trả về hành động cần áp dụng hoặc None.
+
+    use_process=False: tìm kiếm ngay trong poll() (dùng khi mô phỏng headless, chặn vòng lặp).
+    """
+
+    def __init__(self, fighter, opponent, difficulty="normal", budget_ms=None, decision_interval_ms=100,
+                 use_process=True, **search_options):
+        self.fighter = fighter
+        self.opponent = opponent
+        self.budget_ms = budget_ms if budget_ms is not None else DIFFICULTY_BUDGETS[difficulty]
+        self.decision_interval_ms = decision_interval_ms
+        search_options.setdefault("decision_ms", decision_interval_ms)
+        me_config, opponent_config = fighter_config(fighter), fighter_config(opponent)
+
+        self._search = None
+        self._process = None
+        if use_process:
+            self._connection, child_connection = multiprocessing.Pipe()
+            self._process = multiprocessing.Process(target=_worker_main, name="ai-worker", daemon=True,
+                                                    args=(child_connection, me_config, opponent_config, search_options))
+            self._process.start()
+            child_connection.close()
+        else:
+            self._search = LookaheadSearch(me_config, opponent_config, **search_options)
+
+        self._request_id = 0
+        self._pending = None # (request_id, thời điểm gửi)
+        self._last_request_ms = None
+        self._last_state = None # (action_state, is_showing_hit) của hai bên lúc gửi yêu cầu gần nhất
+
+        # --- Thống kê ---
+        self.started_at = time.perf_counter()
+        self.decisions = 0
+        self.latencies_ms = [] # Từ lúc gửi trạng thái tới lúc nhận quyết định
+        self.depths = []
+        self.nodes = []
+        self.actions = {action: 0 for action in (None,) + AI_ACTIONS}
+
+    def _request(self, now):
+        self._request_id += 1
+        self._last_request_ms = now
+        self._last_state = self._observed_state()
+        request = (self._request_id, Fighter.snapshot(self.fighter), Fighter.snapshot(self.opponent), now,
+                   self.budget_ms)
+        self._pending = (self._request_id, time.perf_counter())
+        if self._process is not None:
+            self._connection.send(request)
+            return None
+        return self._finish(*((self._request_id,) + self._search.decide(*request[1:])))
+
+    def _finish(self, request_id, action, depth, nodes):
+        sent_at = self._pending[1]
+        self._pending = None
+        self.decisions += 1
+        self.latencies_ms.append((time.perf_counter() - sent_at) * 1000)
+        self.depths.append(depth)
+        self.nodes.append(nodes)
+        self.actions[action] += 1
+        return action
+
+    def poll(self, now):
+        """Không bao giờ chờ: nhận quyết định nếu đã có, gửi yêu cầu mới khi đến lượt."""
+        if not self.fighter.is_alive or not self.opponent.is_alive:
+            return None
+        if self._pending is not None:
+            if self._process is None or not self._connection.poll():
+                return None
+            return self._finish(*self._connection.recv())
+        # Hỏi lại ngay khi một bên đổi trạng thái (ví dụ vừa hết bị choáng), không chờ hết chu kỳ
+        if (self._last_request_ms is None or now - self._last_request_ms >= self.decision_interval_ms
+                or self._observed_state() != self._last_state):
+            return self._request(now)
+        return None
+
+    def _observed_state(self):
+        return (self.fighter.action_state, self.fighter.is_showing_hit,
+                self.opponent.action_state, self.opponent.is_showing_hit)
+
+    def metrics(self):
+        elapsed = time.perf_counter() - self.started_at
+        latencies = sorted(self.latencies_ms)
+        return {
+            "budget_ms": self.budget_ms,
+            "decisions": self.decisions,
+            "decisions_per_second": self.decisions / elapsed if elapsed > 0 else 0.0,
+            "latency_ms_p50": percentile(latencies, 50),
+            "latency_ms_p95": percentile(latencies, 95),
+            "latency_ms_p99": percentile(latencies, 99),
+            "mean_depth": sum(self.depths) / len(self.depths) if self.depths else 0.0,
+            "mean_nodes": sum(self.nodes) / len(self.nodes) if self.nodes else 0.0,
+            "actions": {str(action): count for action, count in self.actions.items()},
+        }
+
+    def close(self):
+        if self._process is not None:
+            try:
+                self._connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self._process.join(timeout=1)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
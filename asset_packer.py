@@ -0,0 +1,108 @@
+"""Bước build: đóng gói mọi animation trong anim_config thành một atlas đã scale sẵn + manifest.
+
+Chạy:  python asset_packer.py <thư mục assets> --scale 1.5 --out <thư mục assets>/atlas.png
+Manifest JSON được ghi cạnh ảnh atlas (cùng tên, đuôi .json).
+"""
+import argparse
+import json
+import os
+
+import pygame
+
+from assets import animation_frame_paths, load_scaled_image
+
+
+def _collect_frames(anim_config, scale_factor, flip):
+    """Tải và scale mọi khung hình của một skin theo đúng thứ tự Character sử dụng."""
+    animations = {}
+    for anim_name, config in anim_config.items():
+        image_paths = animation_frame_paths(config["path"])
+        if image_paths is None:
+            print(f"Bỏ qua '{anim_name}': đường dẫn '{config['path']}' không tồn tại.")
+            continue
+
+        frames = []
+        for image_path in image_paths:
+            try:
+                frames.append(load_scaled_image(image_path, scale_factor, flip))
+            except pygame.error as e:
+                print(f"Lỗi khi tải hoặc xử lý khung hình {image_path}: {e}")
+        if frames:
+            animations[anim_name] = {"fps": config.get("fps", 10), "frames": frames}
+    return animations
+
+
+def _shelf_pack(sizes, max_width, padding):
+    """Xếp các hình chữ nhật theo từng kệ (cao trước), trả về vị trí và kích thước atlas."""
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i][1], reverse=True)
+    positions = [None] * len(sizes)
+    x = y = shelf_height = atlas_width = 0
+    for i in order:
+        w, h = sizes[i]
+        if x > 0 and x + w > max_width:
+            y += shelf_height + padding
+            x = shelf_height = 0
+        positions[i] = (x, y)
+        x += w + padding
+        shelf_height = max(shelf_height, h)
+        atlas_width = max(atlas_width, x - padding)
+    return positions, (max(atlas_width, 1), max(y + shelf_height, 1))
+
+
+def pack_atlas(skins, scale_factor, atlas_path, max_width=2048, padding=1):
+    """Đóng gói skins = {tên: (anim_config, flipped)} vào atlas_path và ghi manifest cạnh nó."""
+    loaded = {name: (flipped, _collect_frames(anim_config, scale_factor, flipped))
+              for name, (anim_config, flipped) in skins.items()}
+
+    entries = [(name, anim_name, index, frame)
+               for name, (_, animations) in loaded.items()
+               for anim_name, anim in animations.items()
+               for index, frame in enumerate(anim["frames"])]
+    positions, atlas_size = _shelf_pack([frame.get_size() for *_, frame in entries], max_width, padding)
+
+    atlas = pygame.Surface(atlas_size, pygame.SRCALPHA)
+    manifest = {
+        "version": 1,
+        "image": os.path.basename(atlas_path),
+        "scale_factor": scale_factor,
+        "skins": {name: {"flipped": flipped,
+                         "animations": {anim_name: {"fps": anim["fps"], "frames": []}
+                                        for anim_name, anim in animations.items()}}
+                  for name, (flipped, animations) in loaded.items()},
+    }
+    for (name, anim_name, index, frame), (x, y) in zip(entries, positions):
+        # BLEND_RGBA_MAX trên nền trong suốt = sao chép nguyên pixel, kể cả kênh alpha
+        atlas.blit(frame, (x, y), special_flags=pygame.BLEND_RGBA_MAX)
+        manifest["skins"][name]["animations"][anim_name]["frames"].append([x, y, *frame.get_size()])
+
+    pygame.image.save(atlas, atlas_path)
+    manifest_path = os.path.splitext(atlas_path)[0] + ".json"
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Đã ghi atlas {atlas_size[0]}x{atlas_size[1]} ({len(entries)} khung hình) vào {atlas_path}")
+    return manifest_path
+
+
+def main():
+    from code_1 import build_animation_configs
+
+    parser = argparse.ArgumentParser(description="Đóng gói animation thành texture atlas.")
+    parser.add_argument("assets", help="Thư mục assets gốc (chứa Main/ và enemy/)")
+    parser.add_argument("--scale", type=float, default=1.5, help="Hệ số scale dùng khi chơi")
+    parser.add_argument("--out", help="Đường dẫn ảnh atlas (mặc định <assets>/atlas.png)")
+    parser.add_argument("--max-width", type=int, default=2048)
+    args = parser.parse_args()
+
+    # Chỉ cần surface, không cần cửa sổ thật
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    pygame.display.set_mode((1, 1), pygame.HIDDEN)
+
+    player_configs, enemy_configs = build_animation_configs(args.assets)
+    skins = {"player": (player_configs, False), "enemy": (enemy_configs, True)}
+    pack_atlas(skins, args.scale, args.out or os.path.join(args.assets, "atlas.png"), args.max_width)
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+
+
+def list_image_files(path):
+    """Trả về đường dẫn các tệp ảnh trong thư mục animation, sắp xếp theo tên."""
+    return [os.path.join(path, f) for f in sorted(os.listdir(path))
+            if f.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+def animation_frame_paths(path):
+    """Các tệp ảnh của một animation: mọi ảnh trong thư mục (theo tên) hoặc chính tệp ảnh; None nếu không tồn tại."""
+    if os.path.isdir(path):
+        return list_image_files(path)
+    if os.path.isfile(path):
+        return [path]
+    return None
+
+
+def load_scaled_image(path, scale_factor, flip=False):
+    """Tải một ảnh, phóng to/thu nhỏ theo scale_factor và lật ngang nếu cần.
+
+    Nếu ảnh đã được gửi cho parallel_decoder thì chờ kết quả của nhóm luồng thay vì giải mã lại;
+    convert_alpha() (cần màn hình) luôn chạy ở đây, trên luồng chính.
+    """
+    future = parallel_decoder.take(path, scale_factor, flip)
+    if future is not None:
+        return future.result().convert_alpha() # Ném lại pygame.error của luồng giải mã nếu có
+    return decode_scaled_image(path, scale_factor, flip).convert_alpha()
+
+
+def decode_scaled_image(path, scale_factor, flip=False):
+    """Giải mã + scale + lật một ảnh, chưa convert_alpha() (không đụng tới màn hình nên gọi được từ luồng phụ)."""
+    img = pygame.image.load(path)
+    new_width = int(img.get_width() * scale_factor)
+    new_height = int(img.get_height() * scale_factor)
+    img = pygame.transform.scale(img, (new_width, new_height))
+    if flip:
+        img = pygame.transform.flip(img, True, False)
+    return img
+
+
+# --- Giải mã ảnh song song lúc khởi động ---
+class ParallelDecoder:
+    """Nhóm luồng giải mã và scale ảnh; submit() trả về Future, load_scaled_image() lấy kết quả khi cần
+    và gọi convert_alpha() trên luồng chính.
+
+    pygame nhả GIL khi giải mã PNG và khi scale, nên các luồng chạy song song thật trên máy nhiều nhân.
+    Chỉ gọi submit()/take() từ luồng chính; mỗi future được lấy ra đúng một lần rồi bỏ khỏi hàng chờ.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+        self._pending = {} # key -> Future chưa được lấy
+        self.submitted = 0
+        self.taken = 0
+
+    @staticmethod
+    def key(path, scale_factor, flip=False):
+        return os.path.normpath(path), scale_factor, bool(flip)
+
+    def submit(self, path, scale_factor, flip=False):
+        key = self.key(path, scale_factor, flip)
+        future = self._pending.get(key)
+        if future is None:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="decode")
+            future = self._pending[key] = self._executor.submit(decode_scaled_image, path, scale_factor, flip)
+            self.submitted += 1
+        return future
+
+    def take(self, path, scale_factor, flip=False):
+        """Future của ảnh nếu đã được gửi (và bỏ nó khỏi hàng chờ), None nếu chưa."""
+        if not self._pending:
+            return None
+        future = self._pending.pop(self.key(path, scale_factor, flip), None)
+        if future is not None:
+            self.taken += 1
+        return future
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._pending.clear()
+
+    def stats(self):
+        return {"workers": self.max_workers, "submitted": self.submitted, "taken": self.taken,
+                "pending": len(self._pending)}
+
+
+parallel_decoder = ParallelDecoder()
+
+
+def surface_bytes(surface):
+    """Số byte điểm ảnh mà một Surface chiếm."""
+    return surface.get_pitch() * surface.get_height()
+
+
+# --- Animation tải khi cần, giới hạn bộ nhớ theo byte ---
+class AnimationBudget:
+    """Cache LRU các animation đã giải mã, khóa theo (path, scale_factor, flip), giới hạn bởi max_bytes.
+
+    Khi vượt ngân sách, animation lâu không dùng nhất bị bỏ và sẽ được tải lại ở lần dùng sau.
+    Animation vừa tải không bao giờ bị bỏ ngay, nên một animation lớn hơn ngân sách vẫn dùng được.
+    Là cache khung hình duy nhất của tiến trình: Character lazy lẫn eager đều đi qua đây.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # key -> (frames, nbytes)
+        self.resident_bytes = 0
+        self.peak_bytes = 0
+        self.hits = 0
+        self.misses = 0 # Mọi lần gọi loader, kể cả khi thất bại
+        self.loads = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(path, scale_factor, flip=False):
+        return os.path.normpath(path), scale_factor, bool(flip)
+
+    def get(self, key, loader):
+        """Trả về danh sách khung hình của key, gọi loader() nếu chưa có; None nếu loader thất bại."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        frames = loader()
+        if not frames:
+            return None
+        self.loads += 1
+        nbytes = sum(surface_bytes(frame) for frame in frames)
+        self._entries[key] = (frames, nbytes)
+        self.resident_bytes += nbytes
+        self.peak_bytes = max(self.peak_bytes, self.resident_bytes)
+        self._evict(keep=key)
+        return frames
+
+    def _evict(self, keep=None):
+        while self.resident_bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            _, nbytes = self._entries.pop(key)
+            self.resident_bytes -= nbytes
+            self.evictions += 1
+
+    def set_max_bytes(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def entry_bytes(self, key):
+        """Số byte của animation nếu đang nằm trong bộ nhớ, 0 nếu chưa tải hoặc đã bị bỏ."""
+        entry = self._entries.get(key)
+        return entry[1] if entry is not None else 0
+
+    def clear(self):
+        self._entries.clear()
+        self.resident_bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "resident_bytes": self.resident_bytes,
+            "peak_bytes": self.peak_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+animation_budget = AnimationBudget()
+
+
+class LazyAnimations:
+    """Bảng {anim_name: [khung hình]} của một nhân vật, chỉ giải mã animation ở lần truy cập đầu tiên.
+
+    Dùng như dict chỉ đọc; khung hình nằm trong AnimationBudget dùng chung nên các nhân vật cùng skin,
+    cùng scale chia sẻ một bản. loader(anim_name, path) trả về danh sách khung hình hoặc None khi lỗi.
+    """
+
+    def __init__(self, sources, scale_factor, flip, loader, budget=None):
+        self.sources = dict(sources) # anim_name -> path
+        self.budget = budget if budget is not None else animation_budget
+        self._keys = {name: AnimationBudget.key(path, scale_factor, flip) for name, path in self.sources.items()}
+        self._loader = loader
+        self._failed = set() # Animation không tải được, không thử lại
+
+    def get(self, anim_name, default=None):
+        key = self._keys.get(anim_name)
+        if key is None or anim_name in self._failed:
+            return default
+        frames = self.budget.get(key, lambda: self._loader(anim_name, self.sources[anim_name]))
+        if frames is None:
+            self._failed.add(anim_name)
+            return default
+        return frames
+
+    def __getitem__(self, anim_name):
+        frames = self.get(anim_name)
+        if frames is None:
+            raise KeyError(anim_name)
+        return frames
+
+    def __contains__(self, anim_name):
+        # Kiểm tra "in" luôn đi trước việc dùng animation, nên tải luôn để biết chắc có dùng được hay không
+        return self.get(anim_name) is not None
+
+    def keys(self):
+        return [name for name in self.sources if name not in self._failed]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def is_resident(self, anim_name):
+        key = self._keys.get(anim_name)
+        return key is not None and key in self.budget
+
+    def resident_bytes(self):
+        """Số byte khung hình của nhân vật đang nằm trong bộ nhớ (phần dùng chung tính cho mỗi nhân vật)."""
+        return sum(self.budget.entry_bytes(key) for key in self._keys.values())
+
+    def stats(self):
+        return {
+            "animations": len(self.sources),
+            "resident": [name for name in self.sources if self.is_resident(name)],
+            "failed": sorted(self._failed),
+            "resident_bytes": self.resident_bytes(),
+        }
+
+
+# --- Atlas đóng gói sẵn bởi asset_packer.py ---
+class TextureAtlas:
+    """Một ảnh atlas đã scale sẵn + manifest; khung hình là subsurface, không sao chép pixel."""
+
+    def __init__(self, manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        image_path = os.path.join(os.path.dirname(manifest_path), self.manifest["image"])
+        self.image = pygame.image.load(image_path).convert_alpha()
+        self.scale_factor = self.manifest["scale_factor"]
+        self._skins = {}
+
+    @property
+    def skin_names(self):
+        return list(self.manifest["skins"].keys())
+
+    def is_flipped(self, skin_name):
+        return self.manifest["skins"][skin_name]["flipped"]
+
+    def skin(self, skin_name):
+        """Trả về {anim_name: {"fps": fps, "frames": [subsurface, ...]}} cho một skin."""
+        if skin_name not in self._skins:
+            animations = {}
+            for anim_name, anim in self.manifest["skins"][skin_name]["animations"].items():
+                animations[anim_name] = {
+                    "fps": anim["fps"],
+                    "frames": [self.image.subsurface(pygame.Rect(rect)) for rect in anim["frames"]],
+                }
+            self._skins[skin_name] = animations
+        return self._skins[skin_name]
+
+    def frame_size(self, skin_name, anim_name, index=0):
+        x, y, w, h = self.manifest["skins"][skin_name]["animations"][anim_name]["frames"][index]
+        return w, h
@@ -0,0 +1,250 @@
+"""Mô phỏng hàng loạt N trận 1-1 độc lập bằng mảng NumPy (cần numpy).
+
+Mỗi bước thời gian áp dụng đúng thứ tự và luật của combat_core.Match/Fighter (sát thương 25/10/0,
+khiên 3 lần đỡ, cooldown 500 ms, hồi 2.5 HP mỗi 5 giây, 500 ms trúng đòn) cho cả N trận cùng lúc.
+Giá trị mặc định của luật được đọc từ Fighter để hai bên luôn khớp nhau.
+
+Chạy:  python batch_sim.py --matches 100000 --player aggressive --enemy defensive
+"""
+import argparse
+import time
+
+import numpy as np
+
+from combat_core import Fighter
+
+# Hành động mỗi bước (giống phím bấm trong run_game_scene)
+NONE, ATTACK, DEFEND, RELEASE = 0, 1, 2, 3
+
+# action_state dưới dạng số
+IDLE, ATTACKING, DEFENDING, HIT, DEAD = 0, 1, 2, 3, 4
+
+# Kết quả trận
+NO_WINNER, PLAYER_WINS, ENEMY_WINS = 0, 1, 2
+
+RULE_NAMES = ("max_hp", "attack_cooldown", "healing_amount", "healing_interval", "hit_display_duration",
+              "shield_max_hits", "attack_damage", "shield_broken_damage", "blocked_damage")
+
+
+def default_rules():
+    """Luật mặc định lấy trực tiếp từ một Fighter mới tạo."""
+    fighter = Fighter(verbose=False)
+    rules = {name: getattr(fighter, name) for name in RULE_NAMES}
+    rules["attack_frames"] = fighter.frame_counts[fighter.attack_animation]
+    rules["attack_fps"] = fighter.fps_settings[fighter.attack_animation]
+    return rules
+
+
+class BatchSide:
+    """Trạng thái của một phía (player hoặc enemy) trong N trận, mỗi thuộc tính là một mảng."""
+
+    def __init__(self, n, rules):
+        self.hp = np.full(n, float(rules["max_hp"]))
+        self.alive = np.ones(n, dtype=bool)
+        self.state = np.full(n, IDLE, dtype=np.int8)
+        self.shield = np.full(n, rules["shield_max_hits"], dtype=np.int16)
+        self.defending = np.zeros(n, dtype=bool)
+        self.key_held = np.zeros(n, dtype=bool)
+        self.showing_hit = np.zeros(n, dtype=bool)
+        self.hit_start = np.zeros(n)
+        self.last_attack = np.zeros(n)
+        self.last_heal = np.zeros(n)
+        # Chỉ animation tấn công ảnh hưởng tới luật: đang chạy hay không, khung hiện tại, lần đổi khung cuối
+        self.in_attack = np.zeros(n, dtype=bool)
+        self.frame = np.zeros(n, dtype=np.int16)
+        self.last_frame = np.zeros(n)
+
+
+class BatchSim:
+    """N trận độc lập dùng chung một đồng hồ, tiến từng bước step_ms như Match.step."""
+
+    def __init__(self, n_matches, step_ms=1000 / 60, **rules):
+        self.rules = default_rules()
+        unknown = set(rules) - set(self.rules)
+        if unknown:
+            raise ValueError(f"Luật không hợp lệ: {sorted(unknown)}")
+        self.rules.update(rules)
+
+        self.n = n_matches
+        self.step_ms = step_ms
+        self.now = 0
+        self.frame_count = 0
+        self.player = BatchSide(n_matches, self.rules)
+        self.enemy = BatchSide(n_matches, self.rules)
+        self.winner = np.full(n_matches, NO_WINNER, dtype=np.int8)
+        self.end_time = np.full(n_matches, np.nan)
+
+    @property
+    def active(self):
+        return self.player.alive & self.enemy.alive
+
+    # --- Các luật của Fighter, viết lại dưới dạng mặt nạ boolean ---
+    def _take_damage(self, side, mask, amount):
+        m = mask & side.alive
+        side.hp[m] -= amount
+        dead = m & (side.hp <= 0)
+        side.hp[dead] = 0
+        side.alive[dead] = False
+        side.state[dead] = DEAD
+
+    def _react_to_hit(self, side, mask):
+        show = mask & side.alive
+        side.showing_hit[show] = True
+        side.state[show] = HIT
+        side.hit_start[show] = self.now
+        side.state[mask & ~side.alive] = IDLE # Giống Fighter._react_to_hit: đã chết cũng về "idle"
+
+    def _start_defend(self, side, mask):
+        m = mask & (side.state == IDLE) & ~side.showing_hit & side.alive
+        side.defending[m] = True
+        side.key_held[m] = True
+        side.state[m] = DEFENDING
+
+    def _stop_defend(self, side, mask):
+        side.key_held[mask] = False
+        m = mask & side.defending
+        side.defending[m] = False
+        side.state[m] = IDLE
+        side.in_attack[m & ~side.showing_hit & side.alive] = False # set_animation("idle")
+
+    def _start_attack(self, attacker, defender, mask):
+        r = self.rules
+        m = (mask & (self.now - attacker.last_attack >= r["attack_cooldown"]) & (attacker.state == IDLE)
+             & ~attacker.defending & ~attacker.showing_hit & attacker.alive)
+        attacker.in_attack[m] = True
+        attacker.frame[m] = 0
+        attacker.last_frame[m] = self.now
+        attacker.state[m] = ATTACKING
+
+        hit = m & defender.alive
+        blocked = hit & defender.defending & (defender.shield > 0)
+        broken = hit & defender.defending & (defender.shield <= 0)
+        open_hit = hit & ~defender.defending
+
+        defender.shield[blocked] -= 1
+        self._take_damage(defender, blocked, r["blocked_damage"])
+        self._stop_defend(defender, blocked & (defender.shield == 0))
+        self._take_damage(defender, broken, r["shield_broken_damage"])
+        self._react_to_hit(defender, broken)
+        self._take_damage(defender, open_hit, r["attack_damage"])
+        self._react_to_hit(defender, open_hit)
+
+    def _apply(self, side, opponent, actions, mask):
+        self._start_attack(side, opponent, mask & (actions == ATTACK))
+        self._start_defend(side, mask & (actions == DEFEND))
+        self._stop_defend(side, mask & (actions == RELEASE))
+
+    def _update(self, side, mask):
+        r = self.rules
+        now = self.now
+        u = mask & side.alive
+        held = side.defending & side.key_held
+
+        showing = u & side.showing_hit
+        expired = showing & (now - side.hit_start > r["hit_display_duration"])
+        side.showing_hit[expired] = False
+        side.state[expired] = IDLE
+        side.in_attack[expired & ~held] = False
+
+        ticking = u & ~showing & ~held & side.in_attack
+        tick = ticking & (now - side.last_frame > 1000 / r["attack_fps"])
+        side.frame[tick] += 1
+        done = tick & (side.frame >= r["attack_frames"])
+        side.last_attack[done] = now
+        side.state[done] = IDLE
+        side.in_attack[done] = False
+        side.last_frame[tick] = now
+
+        heal = u & (side.state == IDLE) & (now - side.last_heal > r["healing_interval"])
+        side.hp[heal] = np.minimum(r["max_hp"], side.hp[heal] + r["healing_amount"])
+        side.last_heal[heal] = now
+
+    def step(self, player_actions, enemy_actions):
+        """Một khung hình cho mọi trận còn đang đấu: input player, input enemy, update, tăng đồng hồ."""
+        active = self.active
+        self._apply(self.player, self.enemy, player_actions, active)
+        self._apply(self.enemy, self.player, enemy_actions, active)
+        self._update(self.player, active)
+        self._update(self.enemy, active)
+        self.now += self.step_ms
+        self.frame_count += 1
+
+        finished = active & ~self.active
+        self.winner[finished & self.player.alive] = PLAYER_WINS
+        self.winner[finished & self.enemy.alive] = ENEMY_WINS
+        self.end_time[finished] = self.now
+
+    def run(self, player_policy, enemy_policy, max_duration_ms=300000, seed=None):
+        """Chạy đến khi mọi trận kết thúc hoặc hết thời gian; policy(me, opponent, now, rng) -> mảng hành động."""
+        rng = np.random.default_rng(seed)
+        while self.now < max_duration_ms and self.active.any():
+            self.step(player_policy(self.player, self.enemy, self.now, rng),
+                      enemy_policy(self.enemy, self.player, self.now, rng))
+        return self.summary()
+
+    def summary(self):
+        finished = ~np.isnan(self.end_time)
+        ttk = self.end_time[finished]
+        percentiles = np.percentile(ttk, [5, 50, 95]) if ttk.size else [np.nan] * 3
+        return {
+            "matches": self.n,
+            "player_win_rate": float(np.mean(self.winner == PLAYER_WINS)),
+            "enemy_win_rate": float(np.mean(self.winner == ENEMY_WINS)),
+            "timeout_rate": float(np.mean(~finished)),
+            "ttk_mean_ms": float(ttk.mean()) if ttk.size else float("nan"),
+            "ttk_p5_ms": float(percentiles[0]),
+            "ttk_p50_ms": float(percentiles[1]),
+            "ttk_p95_ms": float(percentiles[2]),
+            "simulated_ms": self.now,
+        }
+
+    def ttk_histogram(self, bin_ms=500):
+        """Phân bố thời gian hạ gục (ms) của các trận đã kết thúc: (số trận mỗi bin, mép bin)."""
+        ttk = self.end_time[~np.isnan(self.end_time)]
+        if not ttk.size:
+            return np.zeros(0, dtype=int), np.zeros(1)
+        edges = np.arange(0, ttk.max() + bin_ms, bin_ms)
+        return np.histogram(ttk, bins=edges)
+
+
+# --- Chiến thuật vector hóa có sẵn ---
+def aggressive(me, opponent, now, rng):
+    return np.full(me.hp.shape, ATTACK, dtype=np.int8)
+
+
+def defensive(me, opponent, now, rng):
+    """Giữ khiên đến khi vỡ, sau đó nhả phím và tấn công liên tục."""
+    return np.where(me.shield > 0, DEFEND, np.where(me.key_held, RELEASE, ATTACK)).astype(np.int8)
+
+
+def random_policy(p_attack=0.1, p_defend=0.05, p_release=0.05):
+    cumulative = np.cumsum([1 - p_attack - p_defend - p_release, p_attack, p_defend])
+
+    def policy(me, opponent, now, rng):
+        return np.searchsorted(cumulative, rng.random(me.hp.shape), side="right").astype(np.int8)
+    return policy
+
+
+POLICIES = {"aggressive": aggressive, "defensive": defensive, "random": random_policy()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mô phỏng hàng loạt trận đấu bằng NumPy.")
+    parser.add_argument("--matches", type=int, default=100000)
+    parser.add_argument("--player", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--enemy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--max-duration", type=float, default=300000, help="Giới hạn thời gian mỗi trận (ms)")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    sim = BatchSim(args.matches)
+    start = time.perf_counter()
+    result = sim.run(POLICIES[args.player], POLICIES[args.enemy], args.max_duration, args.seed)
+    elapsed = time.perf_counter() - start
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    print(f"Thời gian chạy: {elapsed:.2f} s ({sim.frame_count} bước, {sim.n * sim.frame_count / elapsed:,.0f} trận-bước/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""Chế độ N-vs-N: nhiều nhân vật mỗi phe, đòn đánh trúng mọi kẻ địch nằm trong hitbox.
+
+Broad phase dùng lưới đều (UniformGrid) dựng lại mỗi khung hình, nên mỗi đòn chỉ kiểm tra
+các nhân vật ở cùng ô với hitbox thay vì toàn bộ các cặp.
+"""
+import os
+import random
+
+import pygame
+
+from assets import parallel_decoder
+from code_1 import STARTUP_ANIMATIONS, Character, build_animation_configs, run_loading_screen, submit_animations
+from effects import EffectSystem
+from hud import text_cache
+from timers import TimerScheduler
+
+
+class UniformGrid:
+    """Lưới ô vuông cạnh cell_size; mỗi ô giữ các phần tử có rect chạm vào ô đó."""
+
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._item_cells = {} # phần tử -> các ô đang chứa nó (để move)
+        self.rects = {} # phần tử -> rect lúc được đặt vào lưới
+
+    def clear(self):
+        self._cells.clear()
+        self._item_cells.clear()
+        self.rects.clear()
+
+    def _cell_range(self, rect):
+        size = self.cell_size
+        return (range(rect.left // size, (rect.right - 1) // size + 1),
+                range(rect.top // size, (rect.bottom - 1) // size + 1))
+
+    def insert(self, item, rect):
+        columns, rows = self._cell_range(rect)
+        keys = [(cx, cy) for cx in columns for cy in rows]
+        for key in keys:
+            self._cells.setdefault(key, []).append(item)
+        self._item_cells[item] = keys
+        self.rects[item] = rect
+
+    def move(self, item, rect):
+        """Đặt lại một phần tử theo rect mới mà không dựng lại cả lưới."""
+        for key in self._item_cells.pop(item, ()):
+            self._cells[key].remove(item)
+        self.insert(item, rect)
+
+    def query(self, rect):
+        """Các phần tử có thể chạm rect (ứng viên, chưa kiểm tra va chạm chính xác)."""
+        found = []
+        seen = set()
+        columns, rows = self._cell_range(rect)
+        for cx in columns:
+            for cy in rows:
+                for item in self._cells.get((cx, cy), ()):
+                    if id(item) not in seen:
+                        seen.add(id(item))
+                        found.append(item)
+        return found
+
+
+class Battle:
+    """Quản lý các phe và giải quyết đòn đánh theo hình học cho Character.start_attack_direct."""
+
+    def __init__(self, cell_size=128, query_margin=32):
+        self.query_margin = query_margin # Lưới dựng một lần mỗi khung; nới vùng tìm để bù cho di chuyển/đổi ảnh giữa khung
+        self.fighters = []
+        self.teams = {} # fighter -> tên phe
+        self.cell_size = cell_size
+        self.grids = {} # tên phe -> UniformGrid các nhân vật còn sống của phe: tìm địch không duyệt qua đồng đội
+        self.timers = None # Scheduler chung của mọi nhân vật (tạo theo đồng hồ của nhân vật đầu tiên), update() chạy nó
+        self.narrow_phase_checks = 0 # Số lần kiểm tra va chạm chính xác (thống kê)
+
+    def add(self, fighter, team):
+        fighter.battle = self
+        if self.timers is None:
+            self.timers = TimerScheduler(fighter.clock)
+        fighter.attach_timers(self.timers)
+        self.fighters.append(fighter)
+        self.teams[fighter] = team
+        if team not in self.grids:
+            self.grids[team] = UniformGrid(self.cell_size)
+
+    def rebuild_grid(self):
+        for grid in self.grids.values():
+            grid.clear()
+        for fighter in self.fighters:
+            if fighter.is_alive:
+                self.grids[self.teams[fighter]].insert(fighter, fighter.hurtbox())
+
+    def _enemy_candidates(self, team, rect):
+        """Ứng viên (chưa kiểm tra va chạm) của mọi phe khác `team` quanh rect, đã nới query_margin."""
+        area = rect.inflate(self.query_margin * 2, self.query_margin * 2)
+        for other_team, grid in self.grids.items():
+            if other_team != team:
+                yield from grid.query(area)
+
+    def targets_for(self, attacker):
+        """Mọi kẻ địch còn sống bị hitbox của attacker chạm tới (lọc bằng rect, xác nhận bằng mask điểm ảnh)."""
+        if attacker.is_attacking:
+            # Vừa đổi sang khung tấn công (có thể rộng hơn khung idle rất nhiều, query_margin không bù được):
+            # đặt lại attacker trong lưới để các đòn sau trong cùng khung hình tìm thấy nó theo khung mới
+            self.grids[self.teams[attacker]].move(attacker, attacker.hurtbox())
+        hitbox = attacker.attack_hitbox()
+        targets = []
+        for candidate in self._enemy_candidates(self.teams[attacker], hitbox):
+            if not candidate.is_alive:
+                continue
+            self.narrow_phase_checks += 1
+            if candidate.hurtbox().colliderect(hitbox) and attacker.hits(candidate):
+                targets.append(candidate)
+        return targets
+
+    def enemy_in_reach(self, fighter):
+        """Có kẻ địch còn sống trong tầm đánh (fighter.attack_reach) không: chỉ lưới và rect, không kiểm tra mask.
+
+        Dùng để quyết định có chém hay không ở mọi khung; targets_for (có mask) chỉ chạy khi đòn thật sự tung ra.
+        """
+        reach = fighter.attack_reach()
+        area = reach.inflate(self.query_margin * 2, self.query_margin * 2)
+        team = self.teams[fighter]
+        for other_team, grid in self.grids.items():
+            if other_team == team:
+                continue
+            rects = grid.rects # Hurtbox lúc dựng lưới (đầu khung), đủ cho quyết định có chém hay không
+            for candidate in grid.query(area):
+                if candidate.is_alive and rects[candidate].colliderect(reach):
+                    return True
+        return False
+
+    def update(self):
+        """Cập nhật mọi nhân vật còn sống rồi dựng lại lưới cho khung hình kế tiếp."""
+        for fighter in self.fighters:
+            if fighter.is_alive:
+                fighter.update()
+        if self.timers is not None:
+            self.timers.run_due() # Chỉ các hẹn giờ đến hạn, không duyệt lại mọi nhân vật
+        self.rebuild_grid()
+
+    def alive_count(self, team):
+        return sum(1 for fighter in self.fighters if fighter.is_alive and self.teams[fighter] == team)
+
+    @property
+    def winner(self):
+        alive_teams = {self.teams[fighter] for fighter in self.fighters if fighter.is_alive}
+        if len(alive_teams) == 1:
+            return alive_teams.pop()
+        return None
+
+
+# --- Điều khiển tự động đơn giản cho từng nhân vật ---
+def auto_control(battle, fighter, rng, walk_speed=2, attack_chance=0.2, defend_chance=0.01):
+    """Tiến về phía địch cho đến khi có địch trong tầm đánh thì chém; thỉnh thoảng giơ khiên."""
+    if not fighter.is_alive or fighter.is_showing_hit:
+        return
+    if fighter.is_defending:
+        if rng.random() < 0.05:
+            fighter.stop_defend()
+        return
+    if fighter.action_state != "idle":
+        return
+
+    if battle.enemy_in_reach(fighter): # Rect, rẻ; đòn thật được giải bằng targets_for khi chém
+        if rng.random() < attack_chance:
+            fighter.start_attack_direct()
+        elif rng.random() < defend_chance:
+            fighter.start_defend()
+    else:
+        direction = -1 if fighter.is_flipped else 1
+        fighter.x += direction * walk_speed
+        fighter.original_x = fighter.x # Vị trí trở về sau khi hết trạng thái trúng đòn
+        fighter.rect.topleft = (fighter.x, fighter.y)
+
+
+def create_battle(player_anim_configs, enemy_anim_configs, team_size, window_width, window_height, scale_factor,
+                  clock=None):
+    """Hai phe `team_size` nhân vật xếp thành cột ở hai mép màn hình, quay mặt vào nhau."""
+    battle = Battle()
+    columns = max(1, team_size // 10)
+    rows = (team_size + columns - 1) // columns
+    spacing_y = max(1, (window_height - 160) // max(rows, 1))
+    for i in range(team_size):
+        col, row = divmod(i, rows)
+        y = 80 + row * spacing_y
+        player = Character(player_anim_configs, (40 + col * 40, y), scale_factor, owner_type="player", clock=clock)
+        enemy = Character(enemy_anim_configs, (window_width - 140 - col * 40, y), scale_factor,
+                          is_flipped=True, owner_type="enemy", clock=clock)
+        for fighter, team in ((player, "player"), (enemy, "enemy")):
+            fighter.verbose = False # Hàng trăm nhân vật: tắt log DEBUG
+            battle.add(fighter, team)
+    battle.rebuild_grid()
+    return battle
+
+
+def run_battle_scene(player_anim_configs, enemy_anim_configs, team_size=100,
+                     window_width=1280, window_height=720, scale_factor=0.4, seed=None, preload=True):
+    pygame.init()
+
+    screen = pygame.display.set_mode((window_width, window_height))
+    pygame.display.set_caption("Đại chiến N-vs-N")
+    rng = random.Random(seed)
+
+    # Giải mã song song các khung hình mà cả đội hình cần ngay, có màn hình chờ (xem code_1.run_loading_screen)
+    if preload:
+        futures = (submit_animations(player_anim_configs, scale_factor, names=STARTUP_ANIMATIONS)
+                   + submit_animations(enemy_anim_configs, scale_factor, is_flipped=True, names=STARTUP_ANIMATIONS))
+        if not run_loading_screen(screen, futures):
+            parallel_decoder.shutdown()
+            pygame.quit()
+            return
+
+    battle = create_battle(player_anim_configs, enemy_anim_configs, team_size, window_width, window_height,
+                           scale_factor)
+
+    # Hàng trăm nhân vật đánh nhau cùng lúc: pool lớn hơn, hết chỗ thì dùng lại hiệu ứng cũ nhất
+    effects = EffectSystem(capacity=512)
+    effects.load_default_kinds(enemy_anim_configs.get("enemy_shield_break", {}).get("path"), scale_factor)
+    effects.attach(battle.fighters[0].events, battle.fighters)
+
+    clock = pygame.time.Clock()
+    running = True
+    background_color = (255, 255, 255)
+    auto = True
+
+    print("--- Chế độ N-vs-N ---")
+    print("Nhấn **W** để cả phe Player TẤN CÔNG, **Mũi tên LÊN** để cả phe Enemy TẤN CÔNG.")
+    print("Nhấn **A** để bật/tắt điều khiển tự động. Nhấn **ESC** để thoát.")
+
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                if event.key == pygame.K_a:
+                    auto = not auto
+                if event.key in (pygame.K_w, pygame.K_UP):
+                    team = "player" if event.key == pygame.K_w else "enemy"
+                    for fighter in battle.fighters:
+                        if battle.teams[fighter] == team:
+                            fighter.start_attack_direct()
+
+        if auto and battle.winner is None:
+            for fighter in battle.fighters:
+                auto_control(battle, fighter, rng)
+
+        battle.update()
+        effects.update(pygame.time.get_ticks())
+
+        screen.fill(background_color)
+        for fighter in battle.fighters:
+            screen.blit(fighter.image, fighter.rect)
+        effects.draw(screen)
+
+        status = (f"Player: {battle.alive_count('player')}  Enemy: {battle.alive_count('enemy')}"
+                  f"  FPS: {clock.get_fps():.0f}")
+        if battle.winner is not None:
+            status += f"  Thắng: {battle.winner}"
+        screen.blit(text_cache.render(status, 24, (0, 0, 0)), (20, 20))
+
+        pygame.display.flip()
+        clock.tick(60)
+
+    effects.detach()
+    print(f"Hiệu ứng: {effects.stats()}")
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    player_configs, enemy_configs = build_animation_configs(os.path.dirname(os.path.abspath(__file__)))
+    run_battle_scene(player_configs, enemy_configs)
@@ -0,0 +1,249 @@
+"""Bộ benchmark headless (SDL dummy) cho các đường nóng: tải animation, update, tấn công, vẽ khung hình.
+
+Chạy:  python bench.py --output bench.json
+       python bench.py --baseline bench_baseline.json          # so sánh, mã thoát 1 nếu chậm đi
+       python bench.py --save-baseline bench_baseline.json     # ghi kết quả làm mốc mới
+Mọi số đo là thời gian trên một thao tác (càng nhỏ càng tốt), lấy trung vị của nhiều lần lặp.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from assets import animation_budget
+from battle import auto_control, create_battle
+from code_1 import Character, build_animation_configs
+from combat_core import TickClock
+from timers import TimerScheduler
+
+ASSETS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+BENCHMARKS = []
+
+
+def benchmark(func):
+    BENCHMARKS.append(func)
+    return func
+
+
+def measure(run, ops, repeat):
+    """Gọi run() `repeat` lần, trả về trung vị thời gian cho một thao tác (µs)."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - start) / ops * 1e6)
+    return statistics.median(samples)
+
+
+def make_fighters(count, scale_factor=1.5, clock=None):
+    """Tạo `count` nhân vật xen kẽ player/enemy, ghép cặp làm đối thủ, tắt log DEBUG."""
+    player_configs, enemy_configs = build_animation_configs(ASSETS_FOLDER)
+    clock = clock if clock is not None else TickClock()
+    timers = TimerScheduler(clock)
+    fighters = []
+    for i in range(count):
+        if i % 2 == 0:
+            fighter = Character(player_configs, (40 + i * 7 % 300, 200), scale_factor, owner_type="player", clock=clock,
+                                timers=timers)
+        else:
+            fighter = Character(enemy_configs, (330 + i * 7 % 300, 200), scale_factor, is_flipped=True,
+                                owner_type="enemy", clock=clock, timers=timers)
+        fighter.verbose = False
+        fighters.append(fighter)
+    for a, b in zip(fighters[::2], fighters[1::2]):
+        a.opponent = b
+        b.opponent = a
+    return fighters, clock
+
+
+# --- Các benchmark ---
+@benchmark
+def load_animations(repeat):
+    player_configs, _ = build_animation_configs(ASSETS_FOLDER)
+    clock = TickClock()
+
+    def load():
+        # Đường mặc định của game: Character lazy qua animation_budget, rồi dùng tới mọi animation
+        fighter = Character(player_configs, (40, 200), 1.5, owner_type="player", clock=clock)
+        fighter.verbose = False
+        for anim_name in fighter.animations.keys():
+            fighter.animations.get(anim_name)
+
+    def cold():
+        animation_budget.clear()
+        load()
+
+    yield "load_animations.cold", measure(cold, 1, repeat)
+    load()
+    yield "load_animations.warm", measure(load, 1, repeat)
+
+
+@benchmark
+def update_throughput(repeat):
+    for count in (10, 100, 1000):
+        fighters, clock = make_fighters(count)
+        frames = max(1, 20000 // count)
+
+        def run_update_animation():
+            for _ in range(frames):
+                clock.advance(16)
+                for fighter in fighters:
+                    fighter.update_animation()
+
+        def run_update():
+            for _ in range(frames):
+                clock.advance(16)
+                for fighter in fighters:
+                    fighter.update()
+                fighters[0].timers.run_due()
+
+        yield f"update_animation.n{count}", measure(run_update_animation, frames * count, repeat)
+        yield f"update.n{count}", measure(run_update, frames * count, repeat)
+
+
+@benchmark
+def attack_exchanges(repeat):
+    (player, enemy), clock = make_fighters(2)
+    exchanges = 2000
+
+    def run():
+        for _ in range(exchanges):
+            # Hồi đầy máu để trận không kết thúc giữa chừng; chờ qua cooldown rồi đánh qua lại
+            player.current_hp = enemy.current_hp = player.max_hp
+            clock.advance(600)
+            player.update()
+            enemy.update()
+            player.timers.run_due()
+            player.start_attack_direct()
+            clock.advance(600)
+            player.update()
+            enemy.update()
+            player.timers.run_due()
+            enemy.start_attack_direct()
+
+    yield "start_attack_direct.exchange", measure(run, exchanges, repeat)
+
+
+@benchmark
+def frame_draw(repeat):
+    screen = pygame.display.get_surface()
+    for scale_factor in (0.8, 1.5):
+        for count in (2, 8, 32):
+            fighters, clock = make_fighters(count, scale_factor)
+            frames = 60
+
+            def run():
+                for _ in range(frames):
+                    clock.advance(16)
+                    screen.fill((255, 255, 255))
+                    for fighter in fighters:
+                        screen.blit(fighter.image, fighter.rect)
+                    for i, fighter in enumerate(fighters):
+                        fighter.draw_health_bar(screen, 20 + (i % 2) * 410, 20 + (i // 2) * 24 % 600, 200, 20)
+                    pygame.display.flip()
+
+            yield f"frame_draw.scale{scale_factor}.n{count}", measure(run, frames, repeat)
+
+
+@benchmark
+def battle_frame(repeat):
+    """Logic một khung của chế độ N-vs-N (điều khiển tự động + Battle.update), chưa tính vẽ; ngân sách 60 fps."""
+    player_configs, enemy_configs = build_animation_configs(ASSETS_FOLDER)
+    for team_size in (50, 150):
+        clock = TickClock(1000)
+        battle = create_battle(player_configs, enemy_configs, team_size, 1280, 720, 0.4, clock)
+        start = [(fighter, fighter.snapshot()) for fighter in battle.fighters]
+        frames = 300
+
+        def run():
+            # Mỗi lần đo bắt đầu lại từ đội hình ban đầu, cùng seed: cùng một trận đấu
+            clock.now = 1000
+            for fighter, state in start:
+                fighter.restore(state)
+            battle.rebuild_grid()
+            rng = random.Random(0)
+            for _ in range(frames):
+                clock.advance(16)
+                if battle.winner is None:
+                    for fighter in battle.fighters:
+                        auto_control(battle, fighter, rng)
+                battle.update()
+
+        yield f"battle_frame.n{team_size}x2", measure(run, frames, repeat)
+
+
+# --- Chạy và so sánh với mốc ---
+def run_all(repeat, selected=None):
+    pygame.init()
+    pygame.display.set_mode((650, 650))
+    results = {}
+    for bench in BENCHMARKS:
+        if selected and bench.__name__ not in selected:
+            continue
+        with contextlib.redirect_stdout(io.StringIO()): # Bỏ các cảnh báo in ra trong lúc đo
+            for name, value in bench(repeat):
+                results[name] = value
+        print(f"{bench.__name__} xong", file=sys.stderr)
+    pygame.quit()
+    return {
+        "meta": {"python": platform.python_version(), "pygame": pygame.version.ver,
+                 "platform": platform.platform(), "repeat": repeat, "unit": "us/op"},
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Trả về danh sách (tên, mốc, hiện tại, tỉ lệ) của các số đo chậm hơn mốc quá `tolerance`."""
+    regressions = []
+    for name, base_value in baseline["results"].items():
+        value = current["results"].get(name)
+        if value is None or base_value <= 0:
+            continue
+        ratio = value / base_value
+        if ratio > 1 + tolerance:
+            regressions.append((name, base_value, value, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark headless các đường nóng của Character.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="Chỉ chạy các benchmark có tên này")
+    parser.add_argument("--output", help="Ghi kết quả JSON ra tệp")
+    parser.add_argument("--baseline", help="Tệp JSON mốc để so sánh")
+    parser.add_argument("--save-baseline", help="Ghi kết quả hiện tại làm mốc mới")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Ngưỡng chậm đi cho phép (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    current = run_all(args.repeat, args.only)
+    for name, value in current["results"].items():
+        print(f"{name:<40} {value:12.2f} us/op")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance)
+        for name, base_value, value, ratio in regressions:
+            print(f"CHẬM ĐI: {name}: {base_value:.2f} -> {value:.2f} us/op (x{ratio:.2f})")
+        if regressions:
+            sys.exit(1)
+        print("Không có số đo nào chậm đi so với mốc.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,44 @@
 import pygame
 import os
 
+from ai import AIController
+from assets import (LazyAnimations, TextureAtlas, animation_budget, animation_frame_paths, load_scaled_image,
+                    parallel_decoder, surface_bytes)
+import combat_events
+from combat_core import Fighter, TickClock
+from combat_events import ANIMATION_MISSING, WARNING
+from effects import EffectSystem
+from hitboxes import collision_cache
+from hud import HealthBar, get_font
+from profiler import FrameProfiler, NullProfiler
+from rendering import DirtyRectRenderer
+from timers import TimerScheduler
+from timestep import FixedTimestep, lerp
+
+# --- Ảnh khi chết: một Surface dùng chung ---
+_death_image = None
+
+
+def get_death_image():
+    """Ảnh mờ khi chết, tạo một lần và dùng chung cho mọi nhân vật."""
+    global _death_image
+    if _death_image is None:
+        _death_image = pygame.Surface((50, 50), pygame.SRCALPHA)
+        _death_image.fill((0, 0, 0, 100)) # Làm mờ nhân vật khi chết
+    return _death_image
+
+
 # --- Lớp Character (Nhân vật) để quản lý animation và trạng thái ---
-class Character(pygame.sprite.Sprite):
-    def __init__(self, anim_config, initial_position, scale_factor, is_flipped=False, owner_type="player", max_hp=250):
-        super().__init__()
+# Luật chiến đấu nằm ở combat_core.Fighter; Character là lớp hiển thị (hình ảnh, rect, thanh máu)
+class Character(Fighter, pygame.sprite.Sprite):
+    def __init__(self, anim_config, initial_position, scale_factor, is_flipped=False, owner_type="player", max_hp=250,
+                 atlas=None, atlas_skin=None, clock=None, lazy=True, budget=None, timers=None):
+        pygame.sprite.Sprite.__init__(self)
+        Fighter.__init__(self, owner_type=owner_type, max_hp=max_hp,
+                         clock=clock if clock is not None else pygame.time.get_ticks,
+                         animation_specs={}, timers=timers)
 
         self.animations = {}
-        self.fps_settings = {}
-        self.current_animation_name = ""
-        self.current_frame_index = 0
-        self.last_frame_update_time = pygame.time.get_ticks()
 
         self.scale_factor = scale_factor
         self.is_flipped = is_flipped
@@ -19,43 +47,30 @@ class Character(pygame.sprite.Sprite):
         self.original_y = initial_position[1]
 
         self.hit_image = None
-        self.is_showing_hit = False
-        self.hit_display_duration = 500
-        self.hit_start_time = 0
-
-        self.is_defending = False
-        self.defend_image = None
-        self.is_attacking = False # Cờ để biết nhân vật có đang trong trạng thái gây sát thương không
-
-        self.owner_type = owner_type
-
-        # --- Thuộc tính máu mới ---
-        self.max_hp = max_hp
-        self.current_hp = max_hp
-        self.is_alive = True # Trạng thái sống/chết
-
-        # --- Thuộc tính hồi máu mới ---
-        self.healing_amount = 2.5
-        self.healing_interval = 5000 # 5 giây = 5000 mili giây
-        self.last_heal_time = pygame.time.get_ticks() # Thời điểm hồi máu gần nhất
+        self._health_bars = {} # HealthBar đã vẽ sẵn, theo (width, height, border_thickness, font_size)
+        self._attack_reach = None # Tầm đánh theo tọa độ trong khung, tính một lần (xem attack_reach)
 
-        # --- Thuộc tính Cooldown mới ---
-        self.attack_cooldown = 500 # 0.5 giây = 500 mili giây
-        self.last_attack_time = 0 # Thời điểm tấn công gần nhất
+        # --- Vùng gây sát thương của khung tấn công (player và enemy), đo ở tỉ lệ attack_hitbox_reference_scale ---
+        self.attack_offset = 70
+        self.attack_range = 80
+        self.attack_hitbox_multiplier = 1.8
+        self.attack_hitbox_reference_scale = 1.5 # Tỉ lệ của cảnh chơi mặc định
 
-        # --- Thuộc tính Hitbox Enemy (đã điều chỉnh, vẫn giữ lại cho mục đích hình ảnh) ---
-        self.enemy_attack_offset = 70
-        self.enemy_attack_range = 80
-        self.enemy_attack_hitbox_multiplier = 1.8 
+        self.dash_speed = 20 
+        self.dash_target_x = 0
+        self.dash_start_x = 0
+        self.dash_sequence = []
 
-        self._load_animations(anim_config)
+        if atlas is not None:
+            self._load_animations_from_atlas(atlas, atlas_skin or owner_type)
+        elif lazy:
+            self._load_animations_lazy(anim_config, budget)
+        else:
+            self._load_animations(anim_config, budget)
 
-        if self.owner_type == "player" and "defend_static" in self.animations:
-            if self.animations["defend_static"]:
-                self.defend_image = self.animations["defend_static"][0]
-        elif self.owner_type == "enemy" and "enemy_defend_static" in self.animations:
-            if self.animations["enemy_defend_static"]:
-                self.defend_image = self.animations["enemy_defend_static"][0]
+        # Giải mã trước ảnh phòng thủ (lần phòng thủ đầu tiên không phải chờ) nhưng không giữ tham chiếu:
+        # _on_defend_start tra lại qua self.animations, nên AnimationBudget vẫn bỏ được khung hình này
+        self.animations.get("defend_static" if self.owner_type == "player" else "enemy_defend_static")
 
         if "idle" in self.animations:
             self.set_animation("idle")
@@ -71,383 +86,411 @@ class Character(pygame.sprite.Sprite):
         self.image = self.animations[self.current_animation_name][self.current_frame_index]
         self.rect = self.image.get_rect(topleft=(self.x, self.y))
 
-        self.action_state = "idle"
-        self.dash_speed = 20 
-        self.dash_target_x = 0
-        self.dash_start_x = 0
-        self.dash_sequence = []
-
-        # Thêm thuộc tính để lưu trữ đối tượng đối thủ
-        self.opponent = None 
-
-        # Thêm cờ để kiểm tra xem phím phòng thủ có đang được giữ hay không
-        self.is_defend_key_held = False 
-
-        # --- Thuộc tính khiên (shield) mới ---
-        self.shield_max_hits = 3      # Số lần khiên đỡ được
-        self.shield_hits_left = self.shield_max_hits
-
-    def _load_animations(self, anim_config):
+    def _load_animations(self, anim_config, budget=None):
+        budget = budget if budget is not None else animation_budget
         for anim_name, config in anim_config.items():
+            self.fps_settings[anim_name] = config.get("fps", 10)
             path = config["path"]
-            fps = config.get("fps", 10)
-            self.fps_settings[anim_name] = fps
-
-            frames = []
-            if os.path.isdir(path):
-                image_filenames = sorted([f for f in os.listdir(path)
-                                         if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif'))])
-
-                if not image_filenames:
-                    print(f"Không tìm thấy tệp hình ảnh nào trong thư mục '{path}' cho '{anim_name}'.")
-                    continue
-
-                for filename in image_filenames:
-                    full_path = os.path.join(path, filename)
-                    try:
-                        img = pygame.image.load(full_path).convert_alpha()
-                        new_width = int(img.get_width() * self.scale_factor)
-                        new_height = int(img.get_height() * self.scale_factor)
-                        img = pygame.transform.scale(img, (new_width, new_height))
-                        if self.is_flipped:
-                            img = pygame.transform.flip(img, True, False)
-                        frames.append(img)
-                    except pygame.error as e:
-                        print(f"Lỗi khi tải hoặc xử lý khung hình {full_path}: {e}")
-                        continue
+            # Cùng cache với chế độ lazy (AnimationBudget): chỉ giải mã khi chưa nhân vật nào tải animation này
+            frames = budget.get(budget.key(path, self.scale_factor, self.is_flipped),
+                                lambda: decode_animation(anim_name, path, self.scale_factor, self.is_flipped))
+            if not frames:
+                continue
+            if anim_name == "hit_static":
+                self.hit_image = frames[0]
+                collision_cache.get(self.hit_image)
+            else:
                 self.animations[anim_name] = frames
-            elif os.path.isfile(path):
-                try:
-                    img = pygame.image.load(path).convert_alpha()
-                    new_width = int(img.get_width() * self.scale_factor)
-                    new_height = int(img.get_height() * self.scale_factor)
-                    img = pygame.transform.scale(img, (new_width, new_height))
-                    if self.is_flipped:
-                        img = pygame.transform.flip(img, True, False)
-
-                    if anim_name == "hit_static":
-                        self.hit_image = img
-                    elif anim_name == "defend_static" or anim_name == "enemy_defend_static":
-                        frames.append(img)
-                        self.animations[anim_name] = frames
-                    else:
-                        frames.append(img)
-                        self.animations[anim_name] = frames
-                except pygame.error as e:
-                    print(f"Lỗi khi tải hoặc xử lý tệp hình ảnh {path} cho '{anim_name}': {e}")
-                else:
-                    print(f"Lỗi: Đường dẫn '{path}' cho '{anim_name}' không phải là thư mục cũng không phải tệp hình ảnh hợp lệ.")
-
-    def set_animation(self, anim_name, force_restart=False):
-        # Không thay đổi animation nếu đang hit hoặc đã chết
-        if self.is_showing_hit or not self.is_alive:
-            return
-        
-        # Nếu đang phòng thủ và phím phòng thủ vẫn đang giữ, không thay đổi animation
-        if self.is_defending and self.is_defend_key_held:
-            return
+                self._precompute_collision(anim_name, frames)
 
-        if anim_name not in self.animations:
-            print(f"Cảnh báo: Animation '{anim_name}' không tồn tại.")
-            return
+    def _load_animations_lazy(self, anim_config, budget=None):
+        """Chỉ ghi nhận đường dẫn; khung hình được giải mã ở lần set_animation đầu tiên (xem LazyAnimations)."""
+        for anim_name, config in anim_config.items():
+            self.fps_settings[anim_name] = config.get("fps", 10)
+        self.animations = LazyAnimations({anim_name: config["path"] for anim_name, config in anim_config.items()},
+                                         self.scale_factor, self.is_flipped, self._decode_animation, budget)
+
+    def _decode_animation(self, anim_name, path):
+        frames = decode_animation(anim_name, path, self.scale_factor, self.is_flipped)
+        if frames:
+            self._precompute_collision(anim_name, frames)
+        return frames
+
+    def animation_stats(self):
+        """Số byte khung hình đang nằm trong bộ nhớ và các animation đã tải của nhân vật."""
+        if isinstance(self.animations, LazyAnimations):
+            return self.animations.stats()
+        frames = [frame for anim in self.animations.values() for frame in anim]
+        if self.hit_image is not None:
+            frames.append(self.hit_image)
+        return {
+            "animations": len(self.animations),
+            "resident": list(self.animations.keys()),
+            "failed": [],
+            "resident_bytes": sum(surface_bytes(frame) for frame in frames),
+        }
+
+    def _load_animations_from_atlas(self, atlas, skin_name):
+        """Cắt khung hình từ TextureAtlas (subsurface) thay vì tải từng tệp."""
+        if atlas.scale_factor != self.scale_factor or atlas.is_flipped(skin_name) != self.is_flipped:
+            print(f"Cảnh báo: Atlas '{skin_name}' được đóng gói với scale={atlas.scale_factor}, "
+                  f"flipped={atlas.is_flipped(skin_name)}, khác với nhân vật.")
+
+        for anim_name, anim in atlas.skin(skin_name).items():
+            self.fps_settings[anim_name] = anim["fps"]
+            if anim_name == "hit_static":
+                self.hit_image = anim["frames"][0]
+                collision_cache.get(self.hit_image)
+            else:
+                self.animations[anim_name] = list(anim["frames"])
+                self._precompute_collision(anim_name, self.animations[anim_name])
 
-        if self.current_animation_name != anim_name or force_restart:
-            self.current_animation_name = anim_name
-            self.current_frame_index = 0
-            self.last_frame_update_time = pygame.time.get_ticks()
-            self.image = self.animations[self.current_animation_name][self.current_frame_index]
-            self.rect = self.image.get_rect(topleft=(self.x, self.y))
+    def snapshot(self):
+        """Trạng thái chiến đấu kèm trạng thái hiển thị (ảnh, rect, vị trí) để rollback vẽ lại đúng."""
+        return (Fighter.snapshot(self), self.image, self.rect.copy(), self.x, self.y, self.original_x, self.original_y)
 
-    def update_animation(self):
-        if not self.is_alive: # Không cập nhật animation nếu đã chết
-            return
+    def restore(self, state):
+        fighter_state, self.image, rect, self.x, self.y, self.original_x, self.original_y = state
+        Fighter.restore(self, fighter_state)
+        self.rect = rect.copy()
 
-        if self.is_showing_hit:
-            current_time = pygame.time.get_ticks()
-            if current_time - self.hit_start_time > self.hit_display_duration:
-                self.is_showing_hit = False
-                self.action_state = "idle"
-                self.x = self.original_x
-                self.y = self.original_y
-                self.rect.topleft = (self.x, self.y)
-                self.set_animation("idle")
-            return
+    # --- Hook hiển thị được Fighter gọi khi trạng thái thay đổi ---
+    def _has_animation(self, anim_name):
+        return anim_name in self.animations
 
-        # Nếu đang phòng thủ và phím phòng thủ đang giữ, không cập nhật animation khác
-        if self.is_defending and self.is_defend_key_held:
-            return
+    def _frame_count(self, anim_name):
+        return len(self.animations[anim_name])
 
-        current_time = pygame.time.get_ticks()
-        current_fps = self.fps_settings.get(self.current_animation_name, 10)
-        frame_duration_ms = 1000 / current_fps
-
-        if current_time - self.last_frame_update_time > frame_duration_ms:
-            self.current_frame_index += 1
-            num_frames = len(self.animations[self.current_animation_name])
-
-            if self.current_frame_index >= num_frames:
-                # Đảm bảo animation tấn công dừng ở khung cuối cùng và sau đó chuyển về idle
-                if self.current_animation_name in ["attack", "enemy_attack"]:
-                    self.current_frame_index = num_frames - 1 # Giữ ở khung cuối cùng
-                    self._action_complete_attack() # Xử lý hoàn thành tấn công
-                else:
-                    self.current_frame_index = 0
-
-            self.image = self.animations[self.current_animation_name][self.current_frame_index]
-            self.rect = self.image.get_rect(topleft=(self.x, self.y))
-
-            # --- ĐIỀU CHỈNH HITBOX CHO ANIMATION TẤN CÔNG (khi is_attacking là True) ---
-            # Vẫn giữ lại để hình ảnh hitbox trông đúng, nhưng sát thương đã được xử lý ở start_attack_direct
-            if self.is_attacking:
-                if self.owner_type == "player" and self.current_animation_name == "attack":
-                    offset_x_player = 50
-                    new_width_player = 100
-
-                    if not self.is_flipped:
-                        self.rect.x = self.x - offset_x_player
-                        self.rect.width = self.image.get_width() + new_width_player
-                    else:
-                        self.rect.x = self.x
-                        self.rect.width = self.image.get_width() + new_width_player
-
-                elif self.owner_type == "enemy" and self.current_animation_name == "enemy_attack":
-                    offset_x = self.enemy_attack_offset
-                    attack_width = int(self.enemy_attack_range * self.enemy_attack_hitbox_multiplier)
-
-                    if self.is_flipped: 
-                        self.rect.right = self.x + self.image.get_width() - offset_x
-                        self.rect.width = attack_width
-                        self.rect.x = self.rect.right - self.rect.width 
-                    else: 
-                        self.rect.x = self.x + offset_x
-                        self.rect.width = attack_width
-            else:
-                self.rect = self.image.get_rect(topleft=(self.x, self.y))
-
-            self.last_frame_update_time = current_time
-
-    # --- Phương thức xử lý hoàn thành tấn công ---
-    def _action_complete_attack(self):
-        self.is_attacking = False
-        self.last_attack_time = pygame.time.get_ticks() # Đặt thời gian cooldown khi kết thúc tấn công
-        self.action_state = "idle"
-        self.set_animation("idle")
-        print(f"DEBUG: {self.owner_type} kết thúc tấn công. is_attacking = {self.is_attacking}")
-
-    # --- Phương thức tấn công trực tiếp cho Player và Enemy ---
-    def start_attack_direct(self):
-        current_time = pygame.time.get_ticks()
-        if current_time - self.last_attack_time < self.attack_cooldown:
-            return
+    def _can_show_hit(self):
+        return self.hit_image is not None or "hit_static" in self.animations
 
-        if self.action_state == "idle" and not self.is_defending and not self.is_showing_hit and self.is_alive:
-            self.set_animation("attack" if self.owner_type == "player" else "enemy_attack", force_restart=True)
-            self.action_state = "attacking" if self.owner_type == "player" else "enemy_attacking"
-            self.is_attacking = True
-            
-            # --- LOGIC TRỪ HP NGAY LẬP TỨC KHI TẤN CÔNG KHỞI TẠO ---
-            if self.opponent and self.opponent.is_alive:
-                if self.opponent.is_defending and self.opponent.shield_hits_left > 0:
-                    damage_to_deal = 0  # Chặn hoàn toàn sát thương khi phòng thủ
-                    self.opponent.shield_hits_left -= 1
-                    print(f"DEBUG: {self.owner_type} tấn công. {self.opponent.owner_type} đang phòng thủ. Khiên còn lại: {self.opponent.shield_hits_left}. Không gây sát thương.")
-                    self.opponent.take_damage(damage_to_deal)
-                    if self.opponent.shield_hits_left == 0:
-                        print(f"DEBUG: {self.opponent.owner_type} đã hết khiên! Phòng thủ không còn hiệu lực.")
-                        self.opponent.stop_defend()
-                elif self.opponent.is_defending and self.opponent.shield_hits_left <= 0:
-                    damage_to_deal = 10
-                    print(f"DEBUG: {self.owner_type} tấn công. {self.opponent.owner_type} đang phòng thủ nhưng đã hết khiên. Gây {damage_to_deal} sát thương.")
-                    self.opponent.take_damage(damage_to_deal)
-                    # Nếu không phòng thủ, hiển thị hit_image
-                    if self.opponent.is_alive and self.opponent.hit_image:
-                        self.opponent.is_showing_hit = True
-                        self.opponent.action_state = "hit"
-                        self.opponent.hit_start_time = pygame.time.get_ticks()
-                        self.opponent.image = self.opponent.hit_image
-                        self.opponent.rect = self.opponent.image.get_rect(topleft=(self.opponent.x, self.opponent.y))
-                    else:
-                        self.opponent.action_state = "idle" # Nếu chết hoặc không có hit_image, về idle
-                        self.opponent.set_animation("idle")
-                else:
-                    damage_to_deal = 25
-                    print(f"DEBUG: {self.owner_type} tấn công. {self.opponent.owner_type} không phòng thủ. Gây {damage_to_deal} sát thương.")
-                    self.opponent.take_damage(damage_to_deal)
-                    # Nếu không phòng thủ, hiển thị hit_image
-                    if self.opponent.is_alive and self.opponent.hit_image:
-                        self.opponent.is_showing_hit = True
-                        self.opponent.action_state = "hit"
-                        self.opponent.hit_start_time = pygame.time.get_ticks()
-                        self.opponent.image = self.opponent.hit_image
-                        self.opponent.rect = self.opponent.image.get_rect(topleft=(self.opponent.x, self.opponent.y))
-                    else:
-                        self.opponent.action_state = "idle" # Nếu chết hoặc không có hit_image, về idle
-                        self.opponent.set_animation("idle")
-
-
-            print(f"DEBUG: {self.owner_type} bắt đầu tấn công trực tiếp. is_attacking = {self.is_attacking}")
-        else:
-            print(f"DEBUG: {self.owner_type} không thể tấn công: action_state={self.action_state}, defending={self.is_defending}, alive={self.is_alive}")
-
-    # --- Phương thức phòng thủ mới ---
-    def start_defend(self):
-        if self.action_state == "idle" and not self.is_showing_hit and self.is_alive:
-            self.is_defending = True
-            self.is_defend_key_held = True # Đặt cờ là phím phòng thủ đang được giữ
-            self.action_state = "defending"
-            print(f"DEBUG: {self.owner_type} BẮT ĐẦU phòng thủ. is_defending = {self.is_defending}")
-            if self.owner_type == "player" and "defend_static" in self.animations and self.animations["defend_static"]:
-                self.image = self.animations["defend_static"][0]
-            elif self.owner_type == "enemy" and "enemy_defend_static" in self.animations and self.animations["enemy_defend_static"]:
-                self.image = self.animations["enemy_defend_static"][0]
-            else:
-                print(f"Cảnh báo: Không tìm thấy ảnh phòng thủ cho {self.owner_type}.")
+    def _hit_frame(self):
+        # Chế độ lazy: ảnh trúng đòn nằm trong self.animations như mọi animation khác
+        return self.hit_image if self.hit_image is not None else self.animations["hit_static"][0]
 
-            self.rect = self.image.get_rect(topleft=(self.x, self.y))
+    def _on_animation_changed(self):
+        self.image = self.animations[self.current_animation_name][self.current_frame_index]
+        self.rect = self.image.get_rect(topleft=(self.x, self.y))
 
-    def stop_defend(self):
-        self.is_defend_key_held = False # Bỏ cờ phím phòng thủ không còn được giữ
-        if self.is_defending:
-            self.is_defending = False
-            self.action_state = "idle"
-            print(f"DEBUG: {self.owner_type} DỪNG phòng thủ. is_defending = {self.is_defending}")
-            self.set_animation("idle", force_restart=True)
+    def _on_frame_changed(self):
+        # Hitbox không còn được "độ" vào self.rect; xem attack_hitbox()/frame_collision()
+        self.image = self.animations[self.current_animation_name][self.current_frame_index]
+        self.rect = self.image.get_rect(topleft=(self.x, self.y))
 
-    def update_position(self):
-        pass # Không có di chuyển trong chế độ này
+    # --- Va chạm: mask và rect tính sẵn cho từng khung hình (hitboxes.collision_cache) ---
+    def _hit_region(self, anim_name, frame_size):
+        """Vùng gây sát thương của một khung tấn công, theo tọa độ trong khung; None nếu không phải đòn tấn công."""
+        if anim_name != self.attack_animation:
+            return None
+        width, height = frame_size
+        scale = self.scale_factor / self.attack_hitbox_reference_scale
+        offset = int(self.attack_offset * scale)
+        attack_width = int(self.attack_range * self.attack_hitbox_multiplier * scale)
+        # Phía trước của nhân vật: ảnh gốc quay sang phải, ảnh lật quay sang trái
+        if self.is_flipped:
+            return pygame.Rect(width - offset - attack_width, 0, attack_width, height)
+        return pygame.Rect(offset, 0, attack_width, height)
+
+    def _precompute_collision(self, anim_name, frames):
+        """Tính trước dữ liệu va chạm cho mọi khung của animation (lúc tải)."""
+        for frame in frames:
+            collision_cache.get(frame, self._hit_region(anim_name, frame.get_size()))
+
+    def frame_collision(self):
+        """FrameCollision của ảnh đang hiển thị (tra trong cache, chỉ tính khi khung chưa có)."""
+        hit_region = None
+        if self.is_alive and not self.is_showing_hit and not self.is_defending: # Đang phòng thủ: ảnh phòng thủ
+            hit_region = self._hit_region(self.current_animation_name, self.image.get_size())
+        return collision_cache.get(self.image, hit_region)
+
+    def attack_hitbox(self):
+        """Rect bao vùng điểm ảnh gây sát thương của khung hiện tại, tại vị trí được vẽ."""
+        return self.frame_collision().hit_rect.move(self.rect.topleft)
+
+    def attack_reach(self):
+        """Rect bao vùng gây sát thương của mọi khung tấn công, tại vị trí hiện tại: tầm đánh ước lượng
+        khi chưa chém, dùng cho quyết định của AI mà không cần kiểm tra mask (Battle.enemy_in_reach)."""
+        reach = self._attack_reach
+        if reach is None:
+            frames = self.animations.get(self.attack_animation) or ()
+            rects = [collision_cache.get(frame, self._hit_region(self.attack_animation, frame.get_size())).hit_rect
+                     for frame in frames]
+            reach = self._attack_reach = rects[0].unionall(rects[1:]) if rects else pygame.Rect(0, 0, 0, 0)
+        return reach.move(self.rect.topleft)
+
+    def hurtbox(self):
+        """Rect bao vùng điểm ảnh có thể bị đánh trúng của khung hiện tại, tại vị trí được vẽ."""
+        return self.frame_collision().hurt_rect.move(self.rect.topleft)
+
+    def hits(self, target):
+        """Va chạm chính xác theo điểm ảnh: hitbox của khung hiện tại chạm hurtbox của target."""
+        attacker = self.frame_collision()
+        defender = target.frame_collision()
+        offset = (target.rect.x - self.rect.x, target.rect.y - self.rect.y)
+        return attacker.hit_mask.overlap(defender.hurt_mask, offset) is not None
+
+    def _on_hit_start(self):
+        self.image = self._hit_frame()
+        self.rect = self.image.get_rect(topleft=(self.x, self.y))
 
-    def take_damage(self, damage_amount):
-        """Phương thức mới để giảm máu và kiểm tra cái chết."""
-        if not self.is_alive:
-            return
+    def _on_hit_end(self):
+        self.x = self.original_x
+        self.y = self.original_y
+        self.rect.topleft = (self.x, self.y)
 
-        self.current_hp -= damage_amount
-        if self.current_hp <= 0:
-            self.current_hp = 0
-            self.is_alive = False
-            print(f"DEBUG: {self.owner_type} đã bị đánh bại!")
-            self.action_state = "dead" # Thêm trạng thái chết
-            self.image = pygame.Surface((50, 50), pygame.SRCALPHA) # Ảnh rỗng hoặc ảnh chết
-            self.image.fill((0, 0, 0, 100)) # Làm mờ nhân vật khi chết
-            self.rect = self.image.get_rect(topleft=(self.x, self.y)) # Cập nhật rect
+    def _on_defend_start(self):
+        if self.owner_type == "player" and "defend_static" in self.animations and self.animations["defend_static"]:
+            self.image = self.animations["defend_static"][0]
+        elif self.owner_type == "enemy" and "enemy_defend_static" in self.animations and self.animations["enemy_defend_static"]:
+            self.image = self.animations["enemy_defend_static"][0]
         else:
-            print(f"DEBUG: {self.owner_type} nhận {damage_amount} sát thương. HP còn lại: {self.current_hp}")
+            self._emit(ANIMATION_MISSING, WARNING, "Cảnh báo: Không tìm thấy ảnh phòng thủ cho {}.", self.owner_type)
+
+        self.rect = self.image.get_rect(topleft=(self.x, self.y))
 
+    def _on_death(self):
+        self.image = get_death_image() # Dùng chung một Surface, không cấp phát mỗi lần có nhân vật chết
+        self.rect = self.image.get_rect(topleft=(self.x, self.y)) # Cập nhật rect
+
+    def get_health_bar(self, width, height, border_thickness=2, font_size=16):
+        """Trả về HealthBar (surface được cache) của nhân vật cho kích thước đã cho."""
+        key = (width, height, border_thickness, font_size)
+        health_bar = self._health_bars.get(key)
+        if health_bar is None:
+            # Màu sắc thanh máu
+            if self.owner_type == "player":
+                health_color = (255, 165, 0) # Màu cam cho Player
+            else:
+                health_color = (255, 0, 0) # Màu đỏ cho Enemy
+            health_bar = self._health_bars[key] = HealthBar(width, height, health_color, border_thickness, font_size)
+        return health_bar
 
     def draw_health_bar(self, screen, x, y, width, height, border_thickness=2, font_size=16):
         """Vẽ thanh máu của nhân vật và hiển thị số HP."""
-        # Màu sắc thanh máu
-        if self.owner_type == "player":
-            health_color = (255, 165, 0) # Màu cam cho Player
-        else:
-            health_color = (255, 0, 0) # Màu đỏ cho Enemy
+        health_bar = self.get_health_bar(width, height, border_thickness, font_size)
+        return health_bar.draw(screen, x, y, self.current_hp, self.max_hp)
+
+
+def decode_animation(anim_name, path, scale_factor, is_flipped=False, load=load_scaled_image):
+    """Giải mã một animation (thư mục ảnh hoặc một tệp ảnh) bằng load(path, scale, flip); None nếu không tải được."""
+    image_paths = animation_frame_paths(path)
+    if image_paths is None:
+        print(f"Lỗi: Đường dẫn '{path}' cho '{anim_name}' không phải là thư mục cũng không phải tệp hình ảnh hợp lệ.")
+        return None
+    if not image_paths:
+        print(f"Không tìm thấy tệp hình ảnh nào trong thư mục '{path}' cho '{anim_name}'.")
+        return None
+
+    frames = []
+    for image_path in image_paths:
+        try:
+            frames.append(load(image_path, scale_factor, is_flipped))
+        except pygame.error as e:
+            print(f"Lỗi khi tải hoặc xử lý khung hình {image_path}: {e}")
+    return frames
+
+
+def _idle_frame_size(anim_configs, scale_factor, is_flipped=False):
+    """Trả về kích thước khung idle đầu tiên đã scale, (0, 0) nếu không tải được."""
+    if "idle" not in anim_configs:
+        return 0, 0
+    idle_path = anim_configs["idle"]["path"]
+    # Tải qua animation_budget để Character (chế độ lazy) tạo sau đó dùng lại đúng animation này
+    frames = animation_budget.get(animation_budget.key(idle_path, scale_factor, is_flipped),
+                                  lambda: decode_animation("idle", idle_path, scale_factor, is_flipped))
+    return frames[0].get_size() if frames else (0, 0)
+
+
+# Animation mà Character (lazy=True) giải mã ngay khi được tạo: idle và ảnh phòng thủ
+STARTUP_ANIMATIONS = ("idle", "defend_static", "enemy_defend_static")
+
+
+def submit_animations(anim_configs, scale_factor, is_flipped=False, names=None):
+    """Gửi mọi khung hình của các animation (hoặc chỉ các animation trong names) cho parallel_decoder.
+
+    Trả về danh sách Future; Character tạo sau đó lấy khung hình qua load_scaled_image, tức là chờ đúng future của nó.
+    """
+    futures = []
+    for anim_name, config in anim_configs.items():
+        if names is not None and anim_name not in names:
+            continue
+        image_paths = animation_frame_paths(config["path"]) or () # Đường dẫn lỗi: decode_animation báo khi tải
+        futures.extend(parallel_decoder.submit(image_path, scale_factor, is_flipped) for image_path in image_paths)
+    return futures
+
+
+def run_loading_screen(screen, futures, background_color=(255, 255, 255), fps=60):
+    """Vẽ thanh tiến trình tới khi mọi future xong; cửa sổ vẫn nhận sự kiện trong lúc chờ.
+
+    Trả về False nếu người chơi đóng cửa sổ (hoặc nhấn ESC) trước khi tải xong.
+    """
+    clock = pygame.time.Clock()
+    total = len(futures)
+    bar_width = screen.get_width() * 2 // 3
+    bar_rect = pygame.Rect((screen.get_width() - bar_width) // 2, screen.get_height() // 2 - 10, bar_width, 20)
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                return False
 
-        background_color = (50, 50, 50) # Màu nền của thanh máu
-        border_color = (0, 0, 0) # Màu viền
-        text_color = (255, 255, 255) # Màu chữ
+        done = sum(future.done() for future in futures)
+        screen.fill(background_color)
+        pygame.draw.rect(screen, (0, 150, 0), (bar_rect.x, bar_rect.y, bar_rect.width * done // max(total, 1), bar_rect.height))
+        pygame.draw.rect(screen, (0, 0, 0), bar_rect, 2)
+        text = get_font(24).render(f"Đang tải hình ảnh... {done}/{total}", True, (0, 0, 0))
+        screen.blit(text, text.get_rect(midbottom=(bar_rect.centerx, bar_rect.y - 8)))
+        pygame.display.flip()
 
-        # Vẽ nền thanh máu
-        pygame.draw.rect(screen, background_color, (x, y, width, height))
+        if done == total:
+            return True
+        clock.tick(fps)
 
-        # Tính toán chiều rộng của phần máu hiện tại
-        health_ratio = self.current_hp / self.max_hp
-        current_health_width = int(width * health_ratio)
 
-        # Vẽ phần máu hiện tại
-        pygame.draw.rect(screen, health_color, (x, y, current_health_width, height))
+def create_scene_characters(player_anim_configs, enemy_anim_configs, window_width, window_height,
+                            player_scale, enemy_scale, atlas=None, clock=None):
+    """Tạo Player (bên trái) và Enemy (bên phải, lật ngang) ở vị trí giữa màn hình, đã gán đối thủ cho nhau."""
+    # Kích thước khung idle lấy qua cache, Character tạo sau đó sẽ dùng lại ảnh đã giải mã
+    if atlas is not None:
+        temp_enemy_img_width, temp_enemy_img_height = atlas.frame_size("enemy", "idle")
+    else:
+        temp_enemy_img_width, temp_enemy_img_height = _idle_frame_size(enemy_anim_configs, enemy_scale, is_flipped=True)
 
-        # Vẽ viền
-        pygame.draw.rect(screen, border_color, (x, y, width, height), border_thickness)
+    enemy_initial_y = (window_height // 2) - (temp_enemy_img_height // 2) if temp_enemy_img_height > 0 else (window_height // 2) - 50
+    enemy_initial_x = window_width * 3 // 4 - (temp_enemy_img_width // 2) if temp_enemy_img_width > 0 else window_width * 3 // 4 - 50
+
+    # Hai nhân vật cùng đồng hồ nên dùng chung một scheduler; vòng lặp của cảnh gọi player.timers.run_due() mỗi khung
+    clock = clock if clock is not None else pygame.time.get_ticks
+    timers = TimerScheduler(clock)
+    enemy = Character(enemy_anim_configs, (enemy_initial_x, enemy_initial_y), enemy_scale, is_flipped=True, owner_type="enemy",
+                      atlas=atlas, clock=clock, timers=timers)
+
+    if atlas is not None:
+        temp_player_img_width, temp_player_img_height = atlas.frame_size("player", "idle")
+    else:
+        temp_player_img_width, temp_player_img_height = _idle_frame_size(player_anim_configs, player_scale)
 
-        # Tạo và vẽ văn bản HP
-        font = pygame.font.Font(None, font_size) # Bạn có thể thay đổi font và kích thước
-        hp_text = f"HP: {int(self.current_hp)}/{int(self.max_hp)}" # Ép kiểu về int để hiển thị số nguyên
-        text_surface = font.render(hp_text, True, text_color)
-        
-        # Đặt vị trí văn bản ở giữa thanh máu
-        text_rect = text_surface.get_rect(center=(x + width // 2, y + height // 2))
-        screen.blit(text_surface, text_rect)
+    player_initial_y = (window_height // 2) - (temp_player_img_height // 2) if temp_player_img_height > 0 else (window_height // 2) - 50
+    player_initial_x = window_width // 4 - (temp_player_img_width // 2) if temp_player_img_width > 0 else window_width // 4 - 50
 
+    player = Character(player_anim_configs, (player_initial_x, player_initial_y), player_scale, owner_type="player",
+                       atlas=atlas, clock=clock, timers=timers)
 
-    def update(self):
-        self.update_animation()
-        self.update_position()
-        # Logic hồi máu
-        if self.is_alive and self.action_state == "idle": # Chỉ hồi máu khi còn sống và ở trạng thái idle
-            current_time = pygame.time.get_ticks()
-            if current_time - self.last_heal_time > self.healing_interval:
-                self.current_hp = min(self.max_hp, self.current_hp + self.healing_amount)
-                self.last_heal_time = current_time
+    # Gán đối thủ cho mỗi nhân vật để họ có thể tương tác sát thương trực tiếp
+    player.opponent = enemy
+    enemy.opponent = player
+    return player, enemy
+
+
+# Phím điều khiển chiến đấu (cũng là các phím được ghi vào replay)
+COMBAT_KEYS = (pygame.K_w, pygame.K_s, pygame.K_UP, pygame.K_DOWN)
+
+
+def handle_combat_key(event_type, key, player, enemy):
+    """Áp dụng một KEYDOWN/KEYUP lên nhân vật; trả về True nếu phím vừa bắt đầu một đòn tấn công."""
+    if event_type == pygame.KEYDOWN:
+        if key == pygame.K_w:
+            return player.start_attack_direct()
+        if key == pygame.K_s:
+            if player.is_alive: # Chỉ phòng thủ khi còn sống
+                player.start_defend()
+        if key == pygame.K_UP:
+            return enemy.start_attack_direct()
+        if key == pygame.K_DOWN:
+            if enemy.is_alive: # Chỉ phòng thủ khi còn sống
+                enemy.start_defend()
+    elif event_type == pygame.KEYUP:
+        if key == pygame.K_s:
+            player.stop_defend()
+        if key == pygame.K_DOWN:
+            enemy.stop_defend()
+    return False
+
+
+# Hành động của AI điều khiển Enemy, quy về đúng sự kiện phím của Enemy (để replay ghi lại được)
+ENEMY_ACTION_KEYS = {
+    "attack": (pygame.KEYDOWN, pygame.K_UP),
+    "defend": (pygame.KEYDOWN, pygame.K_DOWN),
+    "release": (pygame.KEYUP, pygame.K_DOWN),
+}
 
 
 def run_game_scene(player_anim_configs, enemy_anim_configs,
                    window_width=650, window_height=650,
-                   player_scale=0.8, enemy_scale=0.8):
+                   player_scale=0.8, enemy_scale=0.8, atlas_manifest=None,
+                   render_mode="full", profile=False, profile_output=None, record_path=None,
+                   enemy_ai=None, loop_mode="variable", render_fps=60, vsync=False, max_steps_per_frame=5,
+                   preload=True):
     pygame.init()
 
-    screen = pygame.display.set_mode((window_width, window_height))
+    # vsync chỉ có tác dụng với cửa sổ SCALED (hoặc OpenGL) trong pygame 2
+    if vsync:
+        screen = pygame.display.set_mode((window_width, window_height), pygame.SCALED, vsync=1)
+    else:
+        screen = pygame.display.set_mode((window_width, window_height))
     pygame.display.set_caption("Chém và Sát Thương Tức Thì")
 
-    temp_enemy_img_width = 0
-    temp_enemy_img_height = 0
-    if "idle" in enemy_anim_configs:
-        idle_path = enemy_anim_configs["idle"]["path"]
-        if os.path.isdir(idle_path):
-            temp_files = sorted([f for f in os.listdir(idle_path) if f.lower().endswith(('.png', '.jpg'))])
-            if temp_files:
-                try:
-                    temp_img = pygame.image.load(os.path.join(idle_path, temp_files[0]))
-                    temp_enemy_img_width = int(temp_img.get_width() * enemy_scale)
-                    temp_enemy_img_height = int(temp_img.get_height() * enemy_scale)
-                except pygame.error:
-                    pass
-        elif os.path.isfile(idle_path):
-            try:
-                temp_img = pygame.image.load(idle_path)
-                temp_enemy_img_width = int(temp_img.get_width() * enemy_scale)
-                temp_enemy_img_height = int(temp_img.get_height() * enemy_scale)
-            except pygame.error:
-                pass
+    # Atlas đóng gói sẵn (asset_packer.py): một lần đọc tệp, một lần giải mã cho cả hai nhân vật
+    atlas = TextureAtlas(atlas_manifest) if atlas_manifest else None
+
+    # preload=True: giải mã song song (parallel_decoder) các khung hình cần cho khung hình đầu tiên,
+    # vẽ màn hình chờ trong lúc đó; các animation còn lại vẫn chỉ được tải khi dùng tới
+    if preload and atlas is None:
+        futures = (submit_animations(player_anim_configs, player_scale, names=STARTUP_ANIMATIONS)
+                   + submit_animations(enemy_anim_configs, enemy_scale, is_flipped=True, names=STARTUP_ANIMATIONS))
+        if not run_loading_screen(screen, futures):
+            parallel_decoder.shutdown()
+            pygame.quit()
+            return
 
-    enemy_initial_y = (window_height // 2) - (temp_enemy_img_height // 2) if temp_enemy_img_height > 0 else (window_height // 2) - 50
-    enemy_initial_x = window_width * 3 // 4 - (temp_enemy_img_width // 2) if temp_enemy_img_width > 0 else window_width * 3 // 4 - 50
+    # loop_mode="fixed": logic chạy theo bước cố định 1000/60 ms, độc lập với tốc độ vẽ (render_fps, 0 = không giới hạn);
+    # loop_mode="variable": mỗi khung vẽ một bước logic theo thời gian thực (như trước)
+    frame_clock = TickClock(pygame.time.get_ticks())
+    timestep = FixedTimestep(max_steps_per_frame=max_steps_per_frame, start_ms=frame_clock.now) if loop_mode == "fixed" else None
+    player, enemy = create_scene_characters(player_anim_configs, enemy_anim_configs, window_width, window_height,
+                                            player_scale, enemy_scale, atlas, frame_clock)
 
-    enemy = Character(enemy_anim_configs, (enemy_initial_x, enemy_initial_y), enemy_scale, is_flipped=True, owner_type="enemy")
-
-    temp_player_img_width = 0
-    temp_player_img_height = 0
-    if "idle" in player_anim_configs:
-        idle_path = player_anim_configs["idle"]["path"]
-        if os.path.isdir(idle_path):
-            temp_files = sorted([f for f in os.listdir(idle_path) if f.lower().endswith(('.png', '.jpg'))])
-            if temp_files:
-                try:
-                    temp_img = pygame.image.load(os.path.join(idle_path, temp_files[0]))
-                    temp_player_img_width = int(temp_img.get_width() * player_scale)
-                    temp_player_img_height = int(temp_img.get_height() * player_scale)
-                except pygame.error:
-                    pass
-        elif os.path.isfile(idle_path):
-            try:
-                temp_img = pygame.image.load(idle_path)
-                temp_player_img_width = int(temp_img.get_width() * player_scale)
-                temp_player_img_height = int(temp_img.get_height() * player_scale)
-            except pygame.error:
-                pass
+    # enemy_ai="easy"/"normal"/"hard": Enemy do AI điều khiển (tìm kiếm trong tiến trình riêng, không chặn khung hình).
+    # Tạo trước khi gắn subscriber vào bus để tiến trình con không mang theo chúng
+    ai = AIController(enemy, player, difficulty=enemy_ai) if enemy_ai else None
 
-    player_initial_y = (window_height // 2) - (temp_player_img_height // 2) if temp_player_img_height > 0 else (window_height // 2) - 50
-    player_initial_x = window_width // 4 - (temp_player_img_width // 2) if temp_player_img_width > 0 else window_width // 4 - 50
-
-    player = Character(player_animation_configs, (player_initial_x, player_initial_y), player_scale, owner_type="player")
+    # Hiệu ứng trúng đòn / đỡ đòn / vỡ khiên: nhận sự kiện từ bus, khung hình dựng sẵn, pool cấp phát trước (effects.py)
+    effects = EffectSystem()
+    effects.load_default_kinds(enemy_anim_configs.get("enemy_shield_break", {}).get("path"), enemy_scale)
+    effects.attach(player.events, (player, enemy))
 
-    # Gán đối thủ cho mỗi nhân vật để họ có thể tương tác sát thương trực tiếp
-    player.opponent = enemy
-    enemy.opponent = player
+    # record_path: ghi các phím W/S/UP/DOWN và thời điểm từng khung hình ra tệp replay (xem replay.py)
+    recorder = None
+    if record_path:
+        from replay import ReplayWriter # Nhập tại chỗ: replay.py dùng lại các hàm của module này
+        recorder = ReplayWriter(record_path, window_width, window_height, player_scale, enemy_scale, frame_clock.now)
 
     clock = pygame.time.Clock()
     running = True
     background_color = (255, 255, 255)
 
+    # --- Vị trí thanh máu ---
+    health_bar_width = 200
+    health_bar_height = 20
+    # Player ở góc trên bên trái, Enemy ở góc trên bên phải
+    player_health_bar_x = 20
+    player_health_bar_y = 20
+    enemy_health_bar_x = window_width - health_bar_width - 20
+    enemy_health_bar_y = 20
+
+    # render_mode="dirty": chỉ vẽ lại vùng thay đổi (sprite đổi khung/vị trí, thanh máu đổi giá trị)
+    renderer = None
+    if render_mode == "dirty":
+        renderer = DirtyRectRenderer(screen, background_color)
+        renderer.add_sprite(player)
+        renderer.add_sprite(enemy)
+        renderer.add_health_bar(player, player_health_bar_x, player_health_bar_y, health_bar_width, health_bar_height)
+        renderer.add_health_bar(enemy, enemy_health_bar_x, enemy_health_bar_y, health_bar_width, health_bar_height)
+        renderer.add_effects(effects)
+
+    # profile=True: đo từng pha mỗi khung hình, F3 bật/tắt lớp phủ, ghi ra profile_output (.csv/.json) khi thoát
+    # Ngân sách khung hình theo render_fps; không giới hạn (0) thì đo theo 60 fps
+    profiler = FrameProfiler(target_fps=render_fps or 60) if profile else NullProfiler()
+
     print("--- Hướng dẫn điều khiển ---")
     print("Nhấn **W** để nhân vật chính (Player) TẤN CÔNG. (Trừ HP ngay lập tức)")
     print("Nhấn **S** để nhân vật chính (Player) PHÒNG THỦ. (Nhả **S** để dừng phòng thủ)")
@@ -456,65 +499,144 @@ def run_game_scene(player_anim_configs, enemy_anim_configs,
     print("Mỗi 5 giây, cả hai nhân vật sẽ hồi 2.5 HP.")
     print("Sau mỗi lần tấn công có cooldown 0.5 giây.")
     print("Khi TẤN CÔNG, đối thủ sẽ mất 25 HP nếu KHÔNG phòng thủ, hoặc 10 HP nếu ĐANG phòng thủ.")
+    if ai is not None:
+        print(f"Enemy do AI điều khiển (độ khó: {enemy_ai}, {ai.budget_ms} ms mỗi quyết định).")
     print("Nhấn **ESC** hoặc đóng cửa sổ để thoát.")
     print("--------------------------")
 
+    # Một bước logic: áp dụng phím (và quyết định của AI), ghi replay, cập nhật nhân vật còn sống
+    def simulate(keys, input_times):
+        for (event_type, key), input_time in zip(keys, input_times):
+            if handle_combat_key(event_type, key, player, enemy):
+                profiler.attack_input(input_time)
+        if ai is not None:
+            action = ai.poll(frame_clock.now)
+            if action is not None:
+                event_type, key = ENEMY_ACTION_KEYS[action]
+                keys.append((event_type, key))
+                handle_combat_key(event_type, key, player, enemy)
+        if recorder is not None:
+            recorder.frame(frame_clock.now, keys)
+
+        if player.is_alive:
+            player.update()
+        if enemy.is_alive:
+            enemy.update()
+        player.timers.run_due() # Hết trúng đòn, hết cooldown, hồi máu đến hạn (dùng chung cho cả hai nhân vật)
+
+    pending_keys = [] # Chế độ fixed: phím chờ bước mô phỏng kế tiếp
+    pending_input_times = [] # Thời điểm đọc từng phím trong pending_keys khỏi hàng đợi (đo độ trễ input)
+    previous_state = {} # Chế độ fixed: nhân vật -> (vị trí, HP) ở bước trước, để nội suy khi vẽ
+
     while running:
+        profiler.begin_frame()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            if event.type == pygame.WINDOWEXPOSED and renderer is not None:
+                renderer.invalidate()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     running = False
-                if event.key == pygame.K_w:
-                    player.start_attack_direct()
-                if event.key == pygame.K_s:
-                    if player.is_alive: # Chỉ phòng thủ khi còn sống
-                        player.start_defend()
-                if event.key == pygame.K_UP:
-                    enemy.start_attack_direct()
-                if event.key == pygame.K_DOWN:
-                    if enemy.is_alive: # Chỉ phòng thủ khi còn sống
-                        enemy.start_defend()
-
-            if event.type == pygame.KEYUP:
-                if event.key == pygame.K_s:
-                    player.stop_defend()
-                if event.key == pygame.K_DOWN:
-                    enemy.stop_defend()
-
-        # Cập nhật nhân vật chỉ nếu còn sống
-        if player.is_alive:
-            player.update()
-        if enemy.is_alive:
-            enemy.update()
-
-        screen.fill(background_color)
-        screen.blit(player.image, player.rect)
-        screen.blit(enemy.image, enemy.rect)
-
-        # --- Vẽ thanh máu ---
-        # Vị trí thanh máu Player (góc trên bên trái)
-        player_health_bar_x = 20
-        player_health_bar_y = 20
-        health_bar_width = 200
-        health_bar_height = 20
-        player.draw_health_bar(screen, player_health_bar_x, player_health_bar_y, health_bar_width, health_bar_height)
-
-        # Vị trí thanh máu Enemy (góc trên bên phải)
-        enemy_health_bar_x = window_width - health_bar_width - 20
-        enemy_health_bar_y = 20
-        enemy.draw_health_bar(screen, enemy_health_bar_x, enemy_health_bar_y, health_bar_width, health_bar_height)
-
-        pygame.display.flip()
-        clock.tick(60)
+                if event.key == pygame.K_F3:
+                    profiler.toggle_overlay()
+                    if renderer is not None:
+                        renderer.invalidate()
+
+            if event.type in (pygame.KEYDOWN, pygame.KEYUP) and event.key in COMBAT_KEYS:
+                pending_keys.append((event.type, event.key))
+                pending_input_times.append(profiler.input_time())
+        profiler.mark("events")
+
+        if timestep is None:
+            # Thời gian chỉ đọc một lần đầu mỗi khung hình: mọi logic trong khung thấy cùng một thời điểm,
+            # nhờ vậy replay (chỉ lưu thời điểm từng khung) chạy lại được y hệt
+            frame_clock.now = pygame.time.get_ticks()
+            simulate(pending_keys, pending_input_times)
+            pending_keys, pending_input_times = [], []
+        else:
+            for _ in range(timestep.begin_frame()):
+                for character in (player, enemy):
+                    previous_state[character] = (character.rect.topleft, character.current_hp)
+                simulate(pending_keys, pending_input_times)
+                pending_keys, pending_input_times = [], []
+                frame_clock.now = timestep.step()
+        effects.update(frame_clock.now)
+        profiler.mark("update")
+
+        if renderer is not None:
+            renderer.render()
+            overlay_rect = profiler.draw_overlay(screen)
+            if overlay_rect is not None:
+                pygame.display.update(overlay_rect)
+            profiler.mark("render")
+        else:
+            screen.fill(background_color)
+            if timestep is None:
+                screen.blit(player.image, player.rect)
+                screen.blit(enemy.image, enemy.rect)
+                player_hp, enemy_hp = player.current_hp, enemy.current_hp
+            else:
+                # Nội suy vị trí và HP giữa bước trước và bước hiện tại theo alpha
+                alpha = timestep.alpha
+                player_hp, enemy_hp = (
+                    _draw_interpolated(screen, character, previous_state.get(character), alpha)
+                    for character in (player, enemy))
+            effects.draw(screen)
+            profiler.mark("blit")
+
+            # --- Vẽ thanh máu ---
+            player.get_health_bar(health_bar_width, health_bar_height).draw(
+                screen, player_health_bar_x, player_health_bar_y, player_hp, player.max_hp)
+            enemy.get_health_bar(health_bar_width, health_bar_height).draw(
+                screen, enemy_health_bar_x, enemy_health_bar_y, enemy_hp, enemy.max_hp)
+            profiler.draw_overlay(screen)
+            profiler.mark("hud")
+
+            pygame.display.flip()
+            profiler.mark("flip")
+        profiler.frame_presented()
+
+        clock.tick(render_fps)
+        profiler.mark("tick")
+        profiler.end_frame()
+
+    effects.detach()
+    if timestep is not None:
+        print(f"Nhịp khung hình: {timestep.stats()}")
+
+    if ai is not None:
+        ai.close()
+        print(f"AI: {ai.metrics()}")
+
+    if recorder is not None:
+        recorder.close()
+        print(f"Đã ghi replay vào {record_path} ({recorder.frame_count} khung hình)")
+
+    if profile and profile_output:
+        profiler.dump(profile_output)
+        print(f"Đã ghi số liệu profile vào {profile_output}")
 
     pygame.quit()
+    combat_events.bus.flush()
     print("Cửa sổ đã đóng.")
 
-if __name__ == '__main__':
-    base_assets_folder = r'E:\PaRa_BaI_HoC\00_Du_An\Game_nha_lam\Ng_que_dai_chien'
-    enemy_assets_folder = os.path.join(base_assets_folder, 'Enemy')
+
+def _draw_interpolated(screen, character, previous, alpha):
+    """Vẽ nhân vật tại vị trí nội suy giữa bước trước và bước hiện tại; trả về HP nội suy cho thanh máu."""
+    if previous is None:
+        screen.blit(character.image, character.rect)
+        return character.current_hp
+    (previous_x, previous_y), previous_hp = previous
+    x = round(lerp(previous_x, character.rect.x, alpha))
+    y = round(lerp(previous_y, character.rect.y, alpha))
+    screen.blit(character.image, (x, y))
+    return lerp(previous_hp, character.current_hp, alpha)
+
+
+def build_animation_configs(base_assets_folder):
+    """Tạo anim_config cho Player và Enemy từ thư mục assets gốc."""
+    enemy_assets_folder = os.path.join(base_assets_folder, 'enemy')
     main_assets_folder = os.path.join(base_assets_folder, 'Main')
 
     player_animation_configs = {
@@ -528,14 +650,28 @@ if __name__ == '__main__':
         "idle": {"path": os.path.join(enemy_assets_folder, 'Enemy_Dung.png'), "fps": 1},
         "hit_static": {"path": os.path.join(enemy_assets_folder, 'Enemy_hit.png')},
         "enemy_attack": {"path": os.path.join(enemy_assets_folder, 'Chem'), "fps": 12},
-        "enemy_defend_static": {"path": os.path.join(enemy_assets_folder, 'enemy_phong_thu.png')}
+        "enemy_defend_static": {"path": os.path.join(enemy_assets_folder, 'Enemy_phong_thu.png')},
+        # Ảnh vỡ khiên: run_game_scene/run_battle_scene dựng hiệu ứng vỡ khiên (effects.py) từ ảnh này
+        "enemy_shield_break": {"path": os.path.join(enemy_assets_folder, 'Enemy_pha_khien.png')}
     }
+    return player_animation_configs, enemy_animation_configs
+
+
+if __name__ == '__main__':
+    base_assets_folder = r'E:\PaRa_BaI_HoC\00_Du_An\Game_nha_lam\Ng_que_dai_chien'
+    player_animation_configs, enemy_animation_configs = build_animation_configs(base_assets_folder)
 
     window_w = 650
     window_h = 650
     player_scale_factor = 1.5
     enemy_scale_factor = 1.5
 
+    # Nếu đã chạy asset_packer.py, dùng atlas đóng gói sẵn thay cho việc tải từng tệp
+    atlas_manifest = os.path.join(base_assets_folder, 'atlas.json')
+    if not os.path.isfile(atlas_manifest):
+        atlas_manifest = None
+
     run_game_scene(player_animation_configs, enemy_animation_configs,
                    window_w, window_h,
-                   player_scale_factor, enemy_scale_factor)
\ No newline at end of file
+                   player_scale_factor, enemy_scale_factor,
+                   atlas_manifest=atlas_manifest)
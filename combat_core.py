@@ -0,0 +1,511 @@
+"""Lõi luật chiến đấu thuần Python, không phụ thuộc pygame.
+
+Fighter giữ toàn bộ trạng thái và luật (sát thương 25/10/0, khiên 3 lần đỡ, cooldown 500 ms,
+hồi 2.5 HP mỗi 5 giây, thời gian hiển thị trúng đòn) và đọc thời gian qua một đồng hồ tiêm vào.
+Character trong code_1.py kế thừa Fighter và chỉ bổ sung phần hình ảnh qua các hook _on_*.
+Hết trúng đòn, hết cooldown và hồi máu được hẹn giờ qua timers.TimerScheduler (self.timers): scheduler dùng
+chung (Match, Battle, cảnh chơi) do vòng lặp gọi run_due() sau khi update mọi nhân vật; Fighter tạo không có
+timers tự chạy scheduler riêng của mình trong update().
+Match/run_match chạy trận đấu không cần SDL, nhanh nhất có thể.
+"""
+
+import combat_events
+from combat_events import (ANIMATION_MISSING, ATTACK_BLOCKED, ATTACK_END, ATTACK_HIT, ATTACK_REJECTED, ATTACK_START,
+                           COOLDOWN_READY, DAMAGE, DEATH, DEBUG, DEFEND_START, DEFEND_STOP, INFO, SHIELD_BROKEN, WARNING)
+from timers import COOLDOWN_PHASE, HEAL_PHASE, HIT_END_PHASE, TimerScheduler
+
+ATTACK_ANIMATIONS = ("attack", "enemy_attack")
+
+# Hẹn giờ sớm hơn thời điểm đến hạn một chút; khi nổ, điều kiện gốc (ví dụ now - start > duration) được
+# kiểm tra lại, nên sai số làm tròn số thực không làm hiệu ứng kết thúc muộn hơn so với kiểm tra mỗi khung
+TIMER_EPSILON_MS = 1e-6
+
+
+class TickClock:
+    """Đồng hồ thủ công tính bằng mili giây, thay cho pygame.time.get_ticks khi mô phỏng."""
+
+    __slots__ = ("now",)
+
+    def __init__(self, start_ms=0):
+        self.now = start_ms
+
+    def advance(self, ms):
+        self.now += ms
+        return self.now
+
+    def __call__(self):
+        return self.now
+
+
+class Fighter:
+    """Trạng thái và luật chiến đấu của một nhân vật, thời gian lấy từ self.clock().
+
+    Dùng __slots__: mỗi Fighter là một bản ghi gọn, không có __dict__ riêng. Character (lớp hiển thị)
+    vẫn có __dict__ cho hình ảnh/rect nhưng trạng thái chiến đấu nằm trong các slot này.
+    """
+
+    __slots__ = (
+        "clock", "owner_type", "verbose", "events", "attack_animation",
+        # Hẹn giờ đang chờ trong self.timers; _owns_timers: scheduler riêng, update() tự gọi run_due
+        "timers", "_owns_timers", "_hit_end_timer", "_cooldown_timer", "_heal_timer",
+        # Animation
+        "frame_counts", "fps_settings", "current_animation_name", "current_frame_index", "last_frame_update_time",
+        # Trạng thái hành động
+        "is_showing_hit", "hit_display_duration", "hit_start_time",
+        "is_defending", "is_attacking", "is_defend_key_held", "action_state",
+        # Máu, hồi máu, cooldown
+        "max_hp", "current_hp", "is_alive", "healing_amount", "healing_interval", "last_heal_time",
+        "attack_cooldown", "last_attack_time",
+        # Sát thương và khiên
+        "attack_damage", "shield_broken_damage", "blocked_damage", "shield_max_hits", "shield_hits_left",
+        "opponent", "battle", "__weakref__",
+    )
+
+    # Các slot thay đổi trong lúc mô phỏng; snapshot()/restore() chỉ lưu những slot này (dùng cho rollback)
+    STATE_FIELDS = (
+        "current_animation_name", "current_frame_index", "last_frame_update_time",
+        "is_showing_hit", "hit_start_time", "is_defending", "is_attacking", "is_defend_key_held", "action_state",
+        "max_hp", "current_hp", "is_alive", "last_heal_time", "last_attack_time", "shield_hits_left",
+    )
+
+    def __init__(self, owner_type="player", max_hp=250, clock=None, animation_specs=None, verbose=True, events=None,
+                 timers=None):
+        self.clock = clock if clock is not None else TickClock()
+        # Nhân vật dùng chung đồng hồ nên dùng chung scheduler (truyền vào hoặc attach_timers), để mỗi khung chỉ run_due một lần;
+        # không có scheduler chung thì nhân vật giữ scheduler riêng và tự chạy nó trong update()
+        self._owns_timers = timers is None
+        self.timers = timers if timers is not None else TimerScheduler(self.clock)
+        self._hit_end_timer = self._cooldown_timer = self._heal_timer = None
+        self.owner_type = owner_type
+        self.verbose = verbose # Ghi log sự kiện DEBUG hay không
+        self.events = events if events is not None else combat_events.bus
+        self.attack_animation = "attack" if owner_type == "player" else "enemy_attack"
+
+        # --- Trạng thái animation tối thiểu (chỉ số khung + thời gian), không có hình ảnh ---
+        # animation_specs: {tên animation: (số khung hình, fps)}; mặc định giống bộ assets hiện tại
+        if animation_specs is None:
+            animation_specs = {"idle": (1, 10), self.attack_animation: (2, 12)}
+        self.frame_counts = {name: spec[0] for name, spec in animation_specs.items()}
+        self.fps_settings = {name: spec[1] for name, spec in animation_specs.items()}
+        self.current_animation_name = ""
+        self.current_frame_index = 0
+        self.last_frame_update_time = self.clock()
+
+        self.is_showing_hit = False
+        self.hit_display_duration = 500
+        self.hit_start_time = 0
+
+        self.is_defending = False
+        self.is_attacking = False # Cờ để biết nhân vật có đang trong trạng thái gây sát thương không
+        self.is_defend_key_held = False # Phím phòng thủ có đang được giữ hay không
+        self.action_state = "idle"
+
+        # --- Máu ---
+        self.max_hp = max_hp
+        self.current_hp = max_hp
+        self.is_alive = True # Trạng thái sống/chết
+
+        # --- Hồi máu ---
+        self.healing_amount = 2.5
+        self.healing_interval = 5000 # 5 giây = 5000 mili giây
+        self.last_heal_time = self.clock() # Thời điểm hồi máu gần nhất
+
+        # --- Cooldown ---
+        self.attack_cooldown = 500 # 0.5 giây = 500 mili giây
+        self.last_attack_time = 0 # Thời điểm tấn công gần nhất
+
+        # --- Sát thương gây ra cho đối thủ ---
+        self.attack_damage = 25 # Đối thủ không phòng thủ
+        self.shield_broken_damage = 10 # Đối thủ phòng thủ nhưng đã hết khiên
+        self.blocked_damage = 0 # Khiên đỡ được đòn
+
+        # --- Khiên (shield) ---
+        self.shield_max_hits = 3 # Số lần khiên đỡ được
+        self.shield_hits_left = self.shield_max_hits
+
+        self.opponent = None
+        self.battle = None # Battle (chế độ N-vs-N) mà nhân vật tham gia, nếu có
+
+        if "idle" in self.frame_counts:
+            self.set_animation("idle")
+        self._schedule_heal()
+
+    # --- Hook cho lớp hiển thị (Character); lõi headless không làm gì ---
+    def _has_animation(self, anim_name):
+        return anim_name in self.frame_counts
+
+    def _frame_count(self, anim_name):
+        return self.frame_counts[anim_name]
+
+    def _can_show_hit(self):
+        return True
+
+    def _on_animation_changed(self):
+        pass
+
+    def _on_frame_changed(self):
+        pass
+
+    def _on_hit_start(self):
+        pass
+
+    def _on_hit_end(self):
+        pass
+
+    def _on_defend_start(self):
+        pass
+
+    def _on_death(self):
+        pass
+
+    def _emit(self, kind, level, template, *args, target=None):
+        # Chuỗi chỉ được định dạng ở luồng ghi nền; verbose=False chỉ tắt ghi log, subscriber vẫn nhận
+        self.events.emit(kind, level, self, template, args, target, self.verbose)
+
+    # --- Lưu và khôi phục trạng thái ---
+    def snapshot(self):
+        """Bộ giá trị bất biến của trạng thái mô phỏng hiện tại."""
+        return tuple([getattr(self, name) for name in self.STATE_FIELDS])
+
+    def restore(self, state):
+        for name, value in zip(self.STATE_FIELDS, state):
+            setattr(self, name, value)
+        self.reschedule_timers()
+
+    # --- Hẹn giờ: hết trúng đòn, hết cooldown, hồi máu ---
+    def attach_timers(self, timers):
+        """Chuyển các hẹn giờ đang chờ sang scheduler `timers` (dùng chung với các nhân vật cùng đồng hồ)."""
+        self._cancel_timers()
+        self.timers = timers
+        self._owns_timers = False # Chủ của scheduler chung (Match, Battle, vòng lặp) gọi run_due
+        self.reschedule_timers()
+
+    def reschedule_timers(self):
+        """Đặt lại mọi hẹn giờ theo trạng thái hiện tại (sau restore() hoặc khi đổi luật như healing_interval)."""
+        if not self.is_alive:
+            self._cancel_timers()
+            return
+        # Hẹn giờ đang chờ mà vẫn đúng thời điểm thì giữ nguyên (restore liên tục trong tìm kiếm của AI)
+        if self.is_showing_hit:
+            self._schedule_hit_end()
+        else:
+            self.timers.cancel(self._hit_end_timer)
+            self._hit_end_timer = None
+        if self.last_attack_time and self.clock() - self.last_attack_time < self.attack_cooldown: # 0 = chưa tấn công
+            self._schedule_cooldown()
+        else:
+            self.timers.cancel(self._cooldown_timer)
+            self._cooldown_timer = None
+        self._schedule_heal()
+
+    def _cancel_timers(self):
+        cancel = self.timers.cancel
+        cancel(self._hit_end_timer)
+        cancel(self._cooldown_timer)
+        cancel(self._heal_timer)
+        self._hit_end_timer = self._cooldown_timer = self._heal_timer = None
+
+    def _schedule(self, timer, due_ms, callback, phase):
+        if timer is not None and not timer.cancelled and timer.due == due_ms:
+            return timer
+        self.timers.cancel(timer)
+        return self.timers.schedule(due_ms, callback, phase)
+
+    def _schedule_hit_end(self, due_ms=None):
+        if due_ms is None:
+            due_ms = self.hit_start_time + self.hit_display_duration - TIMER_EPSILON_MS
+        self._hit_end_timer = self._schedule(self._hit_end_timer, due_ms, self._hit_end_due, HIT_END_PHASE)
+
+    def _schedule_cooldown(self, due_ms=None):
+        if due_ms is None:
+            due_ms = self.last_attack_time + self.attack_cooldown - TIMER_EPSILON_MS
+        self._cooldown_timer = self._schedule(self._cooldown_timer, due_ms, self._cooldown_due, COOLDOWN_PHASE)
+
+    def _schedule_heal(self, due_ms=None):
+        if due_ms is None:
+            due_ms = self.last_heal_time + self.healing_interval - TIMER_EPSILON_MS
+        self._heal_timer = self._schedule(self._heal_timer, due_ms, self._heal_due, HEAL_PHASE)
+
+    def _hit_end_due(self, now):
+        self._hit_end_timer = None
+        if not self.is_alive or not self.is_showing_hit:
+            return
+        if now - self.hit_start_time > self.hit_display_duration:
+            self.is_showing_hit = False
+            self._set_idle(now)
+            self._on_hit_end()
+            self.set_animation("idle")
+        else:
+            self._schedule_hit_end(now) # Chưa quá hạn theo điều kiện gốc: thử lại ở khung sau
+
+    def _cooldown_due(self, now):
+        self._cooldown_timer = None
+        if not self.is_alive:
+            return
+        if now - self.last_attack_time >= self.attack_cooldown:
+            self._emit(COOLDOWN_READY, DEBUG, "DEBUG: {} hết cooldown, có thể tấn công.", self.owner_type)
+        else:
+            self._schedule_cooldown(now)
+
+    def _heal_due(self, now):
+        self._heal_timer = None
+        if not self.is_alive or self.action_state != "idle":
+            return # Chỉ hồi máu khi idle: _set_idle hẹn lại khi nhân vật về "idle"
+        if now - self.last_heal_time <= self.healing_interval:
+            self._schedule_heal(now) # Chưa quá hạn theo điều kiện gốc: thử lại ở khung sau
+        else:
+            self.current_hp = min(self.max_hp, self.current_hp + self.healing_amount)
+            self.last_heal_time = now
+            self._schedule_heal()
+
+    def _set_idle(self, timer_now=None):
+        """Về "idle" và hẹn lại lượt hồi máu đã bị bỏ trong lúc bận (xem _heal_due).
+
+        timer_now: gọi từ một hẹn giờ đang chạy; kiểm tra hồi máu ngay, như hồi máu chạy sau hết trúng
+        đòn trong cùng một lần run_due (hẹn giờ đặt trong lúc run_due phải chờ tới lần sau).
+        """
+        self.action_state = "idle"
+        if self._heal_timer is not None or not self.is_alive:
+            return
+        if timer_now is not None:
+            self._heal_due(timer_now)
+        else:
+            self._heal_timer = self.timers.schedule(self.clock(), self._heal_due, HEAL_PHASE)
+
+    # --- Animation ---
+    def set_animation(self, anim_name, force_restart=False):
+        # Không thay đổi animation nếu đang hit hoặc đã chết
+        if self.is_showing_hit or not self.is_alive:
+            return
+
+        # Nếu đang phòng thủ và phím phòng thủ vẫn đang giữ, không thay đổi animation
+        if self.is_defending and self.is_defend_key_held:
+            return
+
+        if not self._has_animation(anim_name):
+            self._emit(ANIMATION_MISSING, WARNING, "Cảnh báo: Animation '{}' không tồn tại.", anim_name)
+            return
+
+        if self.current_animation_name != anim_name or force_restart:
+            self.current_animation_name = anim_name
+            self.current_frame_index = 0
+            self.last_frame_update_time = self.clock()
+            self._on_animation_changed()
+
+    def update_animation(self):
+        if not self.is_alive: # Không cập nhật animation nếu đã chết
+            return
+
+        if self.is_showing_hit: # Kết thúc bởi hẹn giờ _hit_end_due
+            return
+
+        # Nếu đang phòng thủ và phím phòng thủ đang giữ, không cập nhật animation khác
+        if self.is_defending and self.is_defend_key_held:
+            return
+
+        current_time = self.clock()
+        current_fps = self.fps_settings.get(self.current_animation_name, 10)
+        frame_duration_ms = 1000 / current_fps
+
+        if current_time - self.last_frame_update_time > frame_duration_ms:
+            self.current_frame_index += 1
+            num_frames = self._frame_count(self.current_animation_name)
+
+            if self.current_frame_index >= num_frames:
+                # Đảm bảo animation tấn công dừng ở khung cuối cùng và sau đó chuyển về idle
+                if self.current_animation_name in ATTACK_ANIMATIONS:
+                    self.current_frame_index = num_frames - 1 # Giữ ở khung cuối cùng
+                    self._action_complete_attack() # Xử lý hoàn thành tấn công
+                else:
+                    self.current_frame_index = 0
+
+            self._on_frame_changed()
+            self.last_frame_update_time = current_time
+
+    # --- Tấn công / phòng thủ ---
+    def _action_complete_attack(self):
+        self.is_attacking = False
+        self.last_attack_time = self.clock() # Đặt thời gian cooldown khi kết thúc tấn công
+        self._schedule_cooldown()
+        self._set_idle()
+        self.set_animation("idle")
+        self._emit(ATTACK_END, DEBUG, "DEBUG: {} kết thúc tấn công. is_attacking = {}", self.owner_type, self.is_attacking)
+
+    def start_attack_direct(self):
+        """Bắt đầu đòn tấn công và trừ HP đối thủ ngay; trả về True nếu đòn được tung ra."""
+        current_time = self.clock()
+        if current_time - self.last_attack_time < self.attack_cooldown:
+            return False
+
+        if self.action_state == "idle" and not self.is_defending and not self.is_showing_hit and self.is_alive:
+            self.set_animation(self.attack_animation, force_restart=True)
+            self.action_state = "attacking" if self.owner_type == "player" else "enemy_attacking"
+            self.is_attacking = True
+
+            # --- LOGIC TRỪ HP NGAY LẬP TỨC KHI TẤN CÔNG KHỞI TẠO ---
+            for target in self._attack_targets():
+                self._strike(target)
+
+            self._emit(ATTACK_START, DEBUG, "DEBUG: {} bắt đầu tấn công trực tiếp. is_attacking = {}", self.owner_type, self.is_attacking)
+            return True
+        else:
+            self._emit(ATTACK_REJECTED, DEBUG, "DEBUG: {} không thể tấn công: action_state={}, defending={}, alive={}",
+                       self.owner_type, self.action_state, self.is_defending, self.is_alive)
+            return False
+
+    def _attack_targets(self):
+        """Những ai nhận đòn: đối thủ duy nhất, hoặc mọi kẻ địch trong hitbox khi ở chế độ Battle."""
+        if self.battle is not None:
+            return self.battle.targets_for(self)
+        if self.opponent and self.opponent.is_alive:
+            return [self.opponent]
+        return []
+
+    def _strike(self, target):
+        if target.is_defending and target.shield_hits_left > 0:
+            damage_to_deal = self.blocked_damage # Chặn hoàn toàn sát thương khi phòng thủ
+            target.shield_hits_left -= 1
+            self._emit(ATTACK_BLOCKED, DEBUG, "DEBUG: {} tấn công. {} đang phòng thủ. Khiên còn lại: {}. Không gây sát thương.",
+                       self.owner_type, target.owner_type, target.shield_hits_left, target=target)
+            target.take_damage(damage_to_deal)
+            if target.shield_hits_left == 0:
+                self._emit(SHIELD_BROKEN, DEBUG, "DEBUG: {} đã hết khiên! Phòng thủ không còn hiệu lực.", target.owner_type, target=target)
+                target.stop_defend()
+        elif target.is_defending and target.shield_hits_left <= 0:
+            damage_to_deal = self.shield_broken_damage
+            self._emit(ATTACK_HIT, DEBUG, "DEBUG: {} tấn công. {} đang phòng thủ nhưng đã hết khiên. Gây {} sát thương.",
+                       self.owner_type, target.owner_type, damage_to_deal, target=target)
+            target.take_damage(damage_to_deal)
+            target._react_to_hit()
+        else:
+            damage_to_deal = self.attack_damage
+            self._emit(ATTACK_HIT, DEBUG, "DEBUG: {} tấn công. {} không phòng thủ. Gây {} sát thương.",
+                       self.owner_type, target.owner_type, damage_to_deal, target=target)
+            target.take_damage(damage_to_deal)
+            target._react_to_hit()
+
+    def _react_to_hit(self):
+        # Nếu không phòng thủ, hiển thị trạng thái trúng đòn
+        if self.is_alive and self._can_show_hit():
+            self.is_showing_hit = True
+            self.action_state = "hit"
+            self.hit_start_time = self.clock()
+            self._schedule_hit_end()
+            self._on_hit_start()
+        else:
+            self._set_idle() # Nếu chết hoặc không có hit_image, về idle
+            self.set_animation("idle")
+
+    def start_defend(self):
+        if self.action_state == "idle" and not self.is_showing_hit and self.is_alive:
+            self.is_defending = True
+            self.is_defend_key_held = True # Đặt cờ là phím phòng thủ đang được giữ
+            self.action_state = "defending"
+            self._emit(DEFEND_START, DEBUG, "DEBUG: {} BẮT ĐẦU phòng thủ. is_defending = {}", self.owner_type, self.is_defending)
+            self._on_defend_start()
+
+    def stop_defend(self):
+        self.is_defend_key_held = False # Bỏ cờ phím phòng thủ không còn được giữ
+        if self.is_defending:
+            self.is_defending = False
+            self._set_idle()
+            self._emit(DEFEND_STOP, DEBUG, "DEBUG: {} DỪNG phòng thủ. is_defending = {}", self.owner_type, self.is_defending)
+            self.set_animation("idle", force_restart=True)
+
+    def update_position(self):
+        pass # Không có di chuyển trong chế độ này
+
+    def take_damage(self, damage_amount):
+        """Giảm máu và kiểm tra cái chết."""
+        if not self.is_alive:
+            return
+
+        self.current_hp -= damage_amount
+        if self.current_hp <= 0:
+            self.current_hp = 0
+            self.is_alive = False
+            self._emit(DEATH, INFO, "DEBUG: {} đã bị đánh bại!", self.owner_type)
+            self.action_state = "dead" # Thêm trạng thái chết
+            self._cancel_timers()
+            self._on_death()
+        else:
+            self._emit(DAMAGE, DEBUG, "DEBUG: {} nhận {} sát thương. HP còn lại: {}", self.owner_type, damage_amount, self.current_hp)
+
+    def update(self):
+        self.update_animation()
+        self.update_position()
+        # Hết trúng đòn và hồi máu: xem _hit_end_due/_heal_due, chạy khi vòng lặp gọi self.timers.run_due()
+        if self._owns_timers:
+            self.timers.run_due()
+
+
+# --- Chạy trận đấu headless ---
+ACTIONS = ("attack", "defend", "release")
+
+
+class Match:
+    """Trận 1-1 không cần SDL: hai Fighter dùng chung một TickClock, tiến từng bước cố định."""
+
+    def __init__(self, player=None, enemy=None, clock=None, step_ms=1000 / 60):
+        self.clock = clock if clock is not None else TickClock()
+        self.step_ms = step_ms
+        self.player = player if player is not None else Fighter("player", clock=self.clock, verbose=False)
+        self.enemy = enemy if enemy is not None else Fighter("enemy", clock=self.clock, verbose=False)
+        self.player.opponent = self.enemy
+        self.enemy.opponent = self.player
+        self.timers = TimerScheduler(self.clock)
+        self.player.attach_timers(self.timers)
+        self.enemy.attach_timers(self.timers)
+        self.frame = 0
+
+    @staticmethod
+    def apply_action(fighter, action):
+        """Áp dụng một hành động giống phím bấm: attack (W/UP), defend (nhấn S/DOWN), release (nhả)."""
+        if action == "attack":
+            fighter.start_attack_direct()
+        elif action == "defend":
+            fighter.start_defend()
+        elif action == "release":
+            fighter.stop_defend()
+
+    def step(self, player_action=None, enemy_action=None):
+        """Một khung hình: xử lý input, cập nhật nhân vật còn sống, rồi tăng đồng hồ."""
+        self.apply_action(self.player, player_action)
+        self.apply_action(self.enemy, enemy_action)
+        if self.player.is_alive:
+            self.player.update()
+        if self.enemy.is_alive:
+            self.enemy.update()
+        self.timers.run_due()
+        self.clock.advance(self.step_ms)
+        self.frame += 1
+
+    @property
+    def is_over(self):
+        return not (self.player.is_alive and self.enemy.is_alive)
+
+    @property
+    def winner(self):
+        if self.player.is_alive and not self.enemy.is_alive:
+            return "player"
+        if self.enemy.is_alive and not self.player.is_alive:
+            return "enemy"
+        return None
+
+
+def run_match(player_policy, enemy_policy, max_duration_ms=300000, step_ms=1000 / 60, **fighter_kwargs):
+    """Chạy một trận với hai chiến thuật policy(me, opponent, now) -> hành động hoặc None."""
+    clock = TickClock()
+    match = Match(Fighter("player", clock=clock, verbose=False, **fighter_kwargs),
+                  Fighter("enemy", clock=clock, verbose=False, **fighter_kwargs),
+                  clock=clock, step_ms=step_ms)
+    while not match.is_over and clock.now < max_duration_ms:
+        match.step(player_policy(match.player, match.enemy, clock.now),
+                   enemy_policy(match.enemy, match.player, clock.now))
+    return {
+        "winner": match.winner,
+        "duration_ms": clock.now,
+        "frames": match.frame,
+        "player_hp": match.player.current_hp,
+        "enemy_hp": match.enemy.current_hp,
+    }
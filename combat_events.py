@@ -0,0 +1,165 @@
+"""Bus sự kiện chiến đấu có bộ đệm, thay cho print() đồng bộ trong các đường nóng.
+
+Sự kiện được lọc theo mức (level) ngay đầu emit(), nên sự kiện bị tắt gần như không tốn gì.
+Sự kiện được ghi log nằm trong một ring buffer; một luồng nền gom và ghi ra stream theo lô.
+Subscriber được gọi đồng bộ (dùng cho phản ứng trong game, ví dụ hiệu ứng).
+"""
+import atexit
+import sys
+import threading
+from collections import deque
+
+# --- Mức sự kiện (giống logging) ---
+DEBUG = 10
+INFO = 20
+WARNING = 30
+SILENT = 100
+
+# --- Loại sự kiện ---
+ATTACK_START = "attack_start"
+ATTACK_REJECTED = "attack_rejected"
+ATTACK_END = "attack_end"
+ATTACK_BLOCKED = "attack_blocked"
+ATTACK_HIT = "attack_hit"
+SHIELD_BROKEN = "shield_broken"
+DEFEND_START = "defend_start"
+DEFEND_STOP = "defend_stop"
+DAMAGE = "damage"
+DEATH = "death"
+COOLDOWN_READY = "cooldown_ready"
+ANIMATION_MISSING = "animation_missing"
+
+
+class CombatEvent:
+    """Một sự kiện; chuỗi thông báo chỉ được định dạng khi cần (message)."""
+
+    __slots__ = ("kind", "level", "source", "target", "template", "args", "time_ms")
+
+    def __init__(self, kind, level, source, target, template, args, time_ms):
+        self.kind = kind
+        self.level = level
+        self.source = source # Fighter phát sinh sự kiện
+        self.target = target # Fighter bị tác động (nếu có)
+        self.template = template
+        self.args = args
+        self.time_ms = time_ms # Thời gian theo đồng hồ của source
+
+    @property
+    def message(self):
+        return self.template.format(*self.args)
+
+
+class CombatEventBus:
+    def __init__(self, level=DEBUG, capacity=4096, stream=None, flush_interval=0.1, batch_size=256):
+        self.level = level # Mức tối thiểu để ghi log
+        self.stream = stream # None = sys.stdout tại thời điểm ghi
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._buffer = deque(maxlen=capacity)
+        self._subscribers = [] # (callback, level, kinds)
+        self._min_level = level
+        self._subscribed_kinds = frozenset() # Hợp các kinds của subscriber; None = có subscriber nhận mọi loại
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopped = False
+
+        # --- Thống kê ---
+        self.emitted = 0
+        self.dropped = 0 # Bị ghi đè khi ring buffer đầy
+        self.batches_written = 0
+
+    def _refresh_filters(self):
+        self._min_level = min([self.level] + [level for _, level, _ in self._subscribers])
+        kinds = frozenset()
+        for _, _, subscriber_kinds in self._subscribers:
+            if subscriber_kinds is None:
+                kinds = None
+                break
+            kinds |= subscriber_kinds
+        self._subscribed_kinds = kinds
+
+    def set_level(self, level):
+        self.level = level
+        self._refresh_filters()
+
+    def subscribe(self, callback, level=DEBUG, kinds=None):
+        """Gọi callback(event) đồng bộ cho mọi sự kiện từ `level` trở lên (lọc theo kinds nếu có)."""
+        self._subscribers.append((callback, level, frozenset(kinds) if kinds else None))
+        self._refresh_filters()
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers = [entry for entry in self._subscribers if entry[0] is not callback]
+        self._refresh_filters()
+
+    def emit(self, kind, level, source, template, args=(), target=None, log=True):
+        if level < self._min_level:
+            return
+        record = log and level >= self.level
+        if not record and self._subscribed_kinds is not None and kind not in self._subscribed_kinds:
+            return # Không ghi log và không subscriber nào nhận loại này: không tạo CombatEvent
+
+        event = CombatEvent(kind, level, source, target, template, args, source.clock() if source is not None else 0)
+        self.emitted += 1
+        for callback, callback_level, kinds in self._subscribers:
+            if level >= callback_level and (kinds is None or kind in kinds):
+                callback(event)
+
+        if record:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(event)
+            if self._thread is None:
+                self._start()
+            elif len(self._buffer) >= self.batch_size:
+                self._wake.set()
+
+    # --- Luồng ghi nền ---
+    def _start(self):
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="combat-event-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Ghi toàn bộ sự kiện đang chờ ra stream trong một lần write."""
+        with self._lock:
+            lines = []
+            while True:
+                try:
+                    event = self._buffer.popleft()
+                except IndexError:
+                    break
+                lines.append(event.message)
+            if lines:
+                stream = self.stream if self.stream is not None else sys.stdout
+                stream.write("\n".join(lines) + "\n")
+                stream.flush()
+                self.batches_written += 1
+
+    def close(self):
+        """Dừng luồng ghi và ghi nốt các sự kiện còn lại."""
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self):
+        return {
+            "emitted": self.emitted,
+            "pending": len(self._buffer),
+            "dropped": self.dropped,
+            "batches_written": self.batches_written,
+        }
+
+
+bus = CombatEventBus()
+atexit.register(bus.close)
@@ -0,0 +1,220 @@
+"""Hiệu ứng trúng đòn / đỡ đòn / vỡ khiên: khung hình dựng sẵn, đối tượng lấy từ pool cấp phát trước.
+
+EffectSystem nghe bus sự kiện chiến đấu (ATTACK_HIT, ATTACK_BLOCKED, SHIELD_BROKEN) và đặt hiệu ứng tại
+hurtbox của nhân vật bị đánh. Trong lúc chơi không tạo Surface hay đối tượng Effect mới: mọi khung hình
+được dựng khi khởi tạo, Effect được dùng lại từ pool, và cả lớp hiệu ứng được vẽ bằng một lần Surface.blits.
+"""
+from collections import deque
+
+import pygame
+
+from assets import load_scaled_image
+from combat_events import ATTACK_BLOCKED, ATTACK_HIT, SHIELD_BROKEN
+
+# Loại sự kiện -> loại hiệu ứng
+EVENT_EFFECTS = {ATTACK_HIT: "hit_spark", ATTACK_BLOCKED: "block_spark", SHIELD_BROKEN: "shield_break"}
+
+
+# --- Dựng sẵn khung hình ---
+def make_spark_frames(radius, color, count=6):
+    """Tia lửa: vòng tròn và các tia to dần, mờ dần qua `count` khung."""
+    frames = []
+    size = radius * 2 + 4
+    center = (size // 2, size // 2)
+    for i in range(count):
+        progress = (i + 1) / count
+        alpha = int(255 * (1 - progress * 0.8))
+        frame = pygame.Surface((size, size), pygame.SRCALPHA)
+        r = max(2, int(radius * progress))
+        pygame.draw.circle(frame, color + (alpha // 2,), center, r)
+        for k in range(8):
+            direction = pygame.math.Vector2(1, 0).rotate(k * 45 + i * 10)
+            start = direction * (r * 0.4)
+            end = direction * r
+            pygame.draw.line(frame, color + (alpha,), (center[0] + start.x, center[1] + start.y),
+                             (center[0] + end.x, center[1] + end.y), 2)
+        frames.append(frame)
+    return frames
+
+
+def make_burst_frames(image, count=8, grow=0.3):
+    """Ảnh phóng to dần và mờ dần qua `count` khung (dùng cho Enemy_pha_khien.png)."""
+    frames = []
+    width, height = image.get_size()
+    for i in range(count):
+        progress = i / max(count - 1, 1)
+        factor = 1 + grow * progress
+        frame = pygame.transform.smoothscale(image, (int(width * factor), int(height * factor)))
+        frame.set_alpha(int(255 * (1 - progress)))
+        frames.append(frame)
+    return frames
+
+
+class Effect:
+    """Một hiệu ứng đang chạy (hoặc đang nằm trong pool chờ dùng lại)."""
+
+    __slots__ = ("frames", "frame_ms", "start_ms", "center", "rect", "blit", "drawn")
+
+    def __init__(self):
+        self.frames = None
+        self.frame_ms = 0
+        self.start_ms = 0
+        self.center = (0, 0)
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.blit = [None, self.rect] # Mục trong danh sách Surface.blits, sửa tại chỗ mỗi khung
+        # Vùng đã vẽ ở hai khung gần nhất, dùng xen kẽ (xem EffectSystem.dirty_rects)
+        self.drawn = (pygame.Rect(0, 0, 0, 0), pygame.Rect(0, 0, 0, 0))
+
+
+# --- Pool hiệu ứng ---
+class EffectSystem:
+    """Pool `capacity` hiệu ứng cấp phát sẵn; khi pool cạn, hiệu ứng cũ nhất bị dùng lại (không cấp phát thêm)."""
+
+    def __init__(self, capacity=128, frame_ms=40):
+        self.frame_ms = frame_ms
+        self.kinds = {} # tên -> danh sách khung hình dựng sẵn
+        self._free = [Effect() for _ in range(capacity)]
+        self._active = deque() # Theo thứ tự tạo: phần tử đầu là hiệu ứng cũ nhất
+        self._blits = deque() # effect.blit của các hiệu ứng đang chạy, cùng thứ tự với _active
+        # Cho DirtyRectRenderer: hiệu ứng đã vẽ ở khung trước, ô nào trong effect.drawn là của khung này,
+        # và danh sách vùng bẩn dùng lại mỗi khung
+        self._drawn = []
+        self._drawn_slot = 0
+        self._dirty = []
+        self._fighters = set() # Chỉ tạo hiệu ứng cho các nhân vật này (bus dùng chung cho mọi Fighter)
+        self._bus = None
+
+        # --- Thống kê ---
+        self.capacity = capacity
+        self.spawned = 0
+        self.recycled = 0 # Số lần phải lấy lại hiệu ứng đang chạy vì pool cạn
+        self.peak_active = 0
+
+    def register(self, kind, frames):
+        self.kinds[kind] = frames
+
+    def load_default_kinds(self, shield_break_path=None, scale_factor=1.0):
+        """Tia lửa trúng đòn, tia đỡ đòn và hiệu ứng vỡ khiên theo hai hướng (cho kẻ tấn công lật hoặc không)."""
+        spark_radius = max(8, int(40 * scale_factor))
+        self.register("hit_spark", make_spark_frames(spark_radius, (255, 200, 40)))
+        self.register("block_spark", make_spark_frames(spark_radius * 3 // 4, (80, 170, 255)))
+        if shield_break_path is None:
+            return
+        for flip in (False, True):
+            try:
+                image = load_scaled_image(shield_break_path, scale_factor, flip)
+            except (pygame.error, FileNotFoundError) as e:
+                print(f"Không tải được ảnh hiệu ứng vỡ khiên '{shield_break_path}': {e}")
+                return
+            self.register("shield_break_flipped" if flip else "shield_break", make_burst_frames(image))
+
+    # --- Nguồn hiệu ứng: bus sự kiện chiến đấu ---
+    def attach(self, bus, fighters):
+        self._fighters.update(fighters)
+        if self._bus is None:
+            self._bus = bus
+            bus.subscribe(self._on_event, kinds=EVENT_EFFECTS.keys())
+
+    def detach(self):
+        if self._bus is not None:
+            self._bus.unsubscribe(self._on_event)
+            self._bus = None
+        self._fighters.clear()
+
+    def _on_event(self, event):
+        target = event.target
+        if target not in self._fighters:
+            return
+        kind = EVENT_EFFECTS[event.kind]
+        if kind == "shield_break" and getattr(event.source, "is_flipped", False):
+            kind = "shield_break_flipped" # Cùng hướng với kẻ tấn công
+        self.spawn(kind, target.hurtbox().center, event.time_ms)
+
+    # --- Vòng đời ---
+    def spawn(self, kind, center, now):
+        frames = self.kinds.get(kind)
+        if not frames:
+            return None
+        if self._free:
+            effect = self._free.pop()
+        else:
+            effect = self._active.popleft() # Pool cạn: dùng lại hiệu ứng cũ nhất
+            self._blits.popleft()
+            self.recycled += 1
+        effect.frames = frames
+        effect.frame_ms = self.frame_ms
+        effect.start_ms = now
+        effect.center = center
+        self._set_frame(effect, 0)
+        self._active.append(effect)
+        self._blits.append(effect.blit)
+        self.spawned += 1
+        self.peak_active = max(self.peak_active, len(self._active))
+        return effect
+
+    @staticmethod
+    def _set_frame(effect, index):
+        frame = effect.frames[index]
+        effect.blit[0] = frame
+        effect.rect.size = frame.get_size()
+        effect.rect.center = effect.center
+
+    def update(self, now):
+        """Chuyển khung hình theo thời gian, trả các hiệu ứng đã xong về pool."""
+        if not self._active:
+            return
+        finished = 0
+        for effect in self._active:
+            index = int((now - effect.start_ms) // effect.frame_ms)
+            if index >= len(effect.frames):
+                finished += 1
+            elif effect.blit[0] is not effect.frames[index]:
+                self._set_frame(effect, index)
+        if finished:
+            # Hiệu ứng cùng thời lượng kết thúc theo thứ tự tạo, nhưng thời lượng có thể khác nhau giữa các loại:
+            # xoay hết một vòng, hiệu ứng còn chạy được đưa lại vào cuối theo đúng thứ tự
+            active, blits = self._active, self._blits
+            for _ in range(len(active)):
+                effect = active.popleft()
+                blits.popleft()
+                if (now - effect.start_ms) // effect.frame_ms >= len(effect.frames):
+                    effect.frames = None
+                    effect.blit[0] = None
+                    self._free.append(effect)
+                else:
+                    active.append(effect)
+                    blits.append(effect.blit)
+
+    def draw(self, surface):
+        """Vẽ mọi hiệu ứng đang chạy bằng một lần Surface.blits."""
+        if self._blits:
+            surface.blits(self._blits, doreturn=False)
+
+    def dirty_rects(self):
+        """Vùng cần vẽ lại vì hiệu ứng: vùng của khung trước và của khung này.
+
+        Không tạo Rect mới: vùng của khung này được chép vào một ô của effect.drawn, ô còn lại giữ vùng
+        của khung trước. Danh sách trả về được dùng lại, chỉ hợp lệ tới lần gọi sau.
+        """
+        rects = self._dirty
+        rects.clear()
+        if not self._drawn and not self._active:
+            return rects
+        slot = self._drawn_slot = 1 - self._drawn_slot
+        for effect in self._drawn: # Kể cả hiệu ứng đã xong hoặc đã được dùng lại: ô kia chưa bị ghi đè
+            rects.append(effect.drawn[1 - slot])
+        self._drawn.clear()
+        for effect in self._active:
+            drawn = effect.drawn[slot]
+            drawn.update(effect.rect)
+            rects.append(drawn)
+            self._drawn.append(effect)
+        return rects
+
+    @property
+    def active_count(self):
+        return len(self._active)
+
+    def stats(self):
+        return {"capacity": self.capacity, "active": len(self._active), "peak_active": self.peak_active,
+                "spawned": self.spawned, "recycled": self.recycled}
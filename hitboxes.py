@@ -0,0 +1,62 @@
+import weakref
+
+import pygame
+
+
+def mask_bounds(mask):
+    """Rect bao quanh mọi điểm ảnh được bật của mask (rect rỗng nếu mask trống)."""
+    rects = mask.get_bounding_rects()
+    if not rects:
+        return pygame.Rect(0, 0, 0, 0)
+    return rects[0].unionall(rects[1:])
+
+
+class FrameCollision:
+    """Dữ liệu va chạm của một khung hình, theo tọa độ trong khung (góc trên trái của ảnh là 0, 0).
+
+    hurt: mọi điểm ảnh không trong suốt; hit: phần của hurt nằm trong vùng gây sát thương (bằng hurt
+    nếu khung không có vùng riêng).
+    """
+
+    __slots__ = ("hurt_mask", "hurt_rect", "hit_mask", "hit_rect")
+
+    def __init__(self, frame, hit_region=None, threshold=127):
+        self.hurt_mask = pygame.mask.from_surface(frame, threshold)
+        self.hurt_rect = mask_bounds(self.hurt_mask)
+        if hit_region is None:
+            self.hit_mask = self.hurt_mask
+            self.hit_rect = self.hurt_rect
+        else:
+            region = pygame.Rect(hit_region).clip(frame.get_rect())
+            self.hit_mask = self.hurt_mask.overlap_mask(pygame.Mask(region.size, fill=True), region.topleft)
+            self.hit_rect = mask_bounds(self.hit_mask)
+
+
+# --- Bộ nhớ đệm dữ liệu va chạm, gắn với chính Surface của khung hình ---
+class CollisionCache:
+    """Khung hình -> {vùng gây sát thương: FrameCollision}.
+
+    Khóa yếu theo Surface: khi khung hình bị giải phóng (ví dụ AnimationBudget loại animation),
+    dữ liệu va chạm của nó cũng được bỏ theo.
+    """
+
+    def __init__(self):
+        self._entries = weakref.WeakKeyDictionary()
+        self.builds = 0
+
+    def get(self, frame, hit_region=None):
+        region_key = tuple(hit_region) if hit_region is not None else None
+        per_frame = self._entries.get(frame)
+        if per_frame is None:
+            per_frame = self._entries[frame] = {}
+        collision = per_frame.get(region_key)
+        if collision is None:
+            collision = per_frame[region_key] = FrameCollision(frame, hit_region)
+            self.builds += 1
+        return collision
+
+    def stats(self):
+        return {"frames": len(self._entries), "builds": self.builds}
+
+
+collision_cache = CollisionCache()
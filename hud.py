@@ -0,0 +1,105 @@
+from collections import OrderedDict
+
+import pygame
+
+# --- Cache font theo cỡ chữ (tạo Font là thao tác tốn kém, chỉ làm một lần mỗi phiên pygame.font) ---
+_fonts = {}
+
+
+def _clear_font_caches():
+    """Font và surface chữ render từ nó chỉ dùng được trong phiên pygame.font đã tạo ra chúng."""
+    _fonts.clear()
+    text_cache.clear()
+
+
+def get_font(font_size):
+    font = _fonts.get(font_size)
+    if font is None:
+        if not pygame.font.get_init():
+            _clear_font_caches() # pygame.font.quit() riêng lẻ: các Font cũ đã chết
+        if not _fonts:
+            # Font đầu tiên của phiên: bỏ cả hai cache khi pygame.quit() (ví dụ trước khi chạy cảnh kế tiếp)
+            pygame.register_quit(_clear_font_caches)
+        font = _fonts[font_size] = pygame.font.Font(None, font_size)
+    return font
+
+
+# --- Cache surface chữ đã render, dùng chung cho mọi thanh máu ---
+class TextCache:
+    """Cache LRU surface chữ, khóa theo (text, font_size, color)."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, font_size, color):
+        key = (text, font_size, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = get_font(font_size).render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+
+
+text_cache = TextCache()
+
+
+class HealthBar:
+    """Thanh máu vẽ sẵn vào một surface riêng, chỉ vẽ lại khi current_hp hoặc max_hp thay đổi."""
+
+    background_color = (50, 50, 50) # Màu nền của thanh máu
+    border_color = (0, 0, 0) # Màu viền
+    text_color = (255, 255, 255) # Màu chữ
+
+    def __init__(self, width, height, health_color, border_thickness=2, font_size=16):
+        self.width = width
+        self.height = height
+        self.health_color = health_color
+        self.border_thickness = border_thickness
+        self.font_size = font_size
+        self.surface = pygame.Surface((width, height))
+        self._drawn_values = None # (current_hp, max_hp) lần vẽ gần nhất
+        self.redraw_count = 0
+
+    def is_dirty(self, current_hp, max_hp):
+        return self._drawn_values != (current_hp, max_hp)
+
+    def refresh(self, current_hp, max_hp):
+        """Vẽ lại surface nếu giá trị máu đã đổi; trả về True nếu có vẽ lại."""
+        if not self.is_dirty(current_hp, max_hp):
+            return False
+
+        width, height = self.width, self.height
+        self.surface.fill(self.background_color)
+
+        # Tính toán chiều rộng của phần máu hiện tại
+        health_ratio = current_hp / max_hp
+        current_health_width = int(width * health_ratio)
+        pygame.draw.rect(self.surface, self.health_color, (0, 0, current_health_width, height))
+        pygame.draw.rect(self.surface, self.border_color, (0, 0, width, height), self.border_thickness)
+
+        hp_text = f"HP: {int(current_hp)}/{int(max_hp)}" # Ép kiểu về int để hiển thị số nguyên
+        text_surface = text_cache.render(hp_text, self.font_size, self.text_color)
+        # Đặt vị trí văn bản ở giữa thanh máu
+        self.surface.blit(text_surface, text_surface.get_rect(center=(width // 2, height // 2)))
+
+        self._drawn_values = (current_hp, max_hp)
+        self.redraw_count += 1
+        return True
+
+    def draw(self, screen, x, y, current_hp, max_hp):
+        """Blit thanh máu lên màn hình, trả về vùng đã vẽ."""
+        self.refresh(current_hp, max_hp)
+        return screen.blit(self.surface, (x, y))
@@ -0,0 +1,450 @@
+"""Chơi qua mạng với rollback: mỗi người chơi một tiến trình, trao đổi input qua UDP.
+
+Input của người chơi tại chỗ được mô phỏng ngay (không thêm độ trễ). Input của đối phương chưa tới
+thì được đoán là "không bấm gì"; khi input thật tới và khác với dự đoán, trạng thái được khôi phục
+về khung hình sai đầu tiên (Character.snapshot/restore) rồi mô phỏng lại đến khung hiện tại.
+Thời gian mô phỏng là số khung * step_ms, không phụ thuộc đồng hồ của từng máy.
+
+Chạy (hai cửa sổ):
+    python netplay.py --side player --port 7000 --remote 127.0.0.1:7001
+    python netplay.py --side enemy  --port 7001 --remote 127.0.0.1:7000
+Thử nghiệm tự động (hai tiến trình headless, đường truyền mất gói và dao động độ trễ):
+    python netplay.py --local-test --frames 3000 --loss 0.1 --latency 20 80
+"""
+import argparse
+import heapq
+import json
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import time
+import zlib
+
+import pygame
+
+from code_1 import build_animation_configs, create_scene_characters, handle_combat_key
+from combat_core import Fighter, TickClock
+from hud import text_cache
+from profiler import percentile
+
+ASSETS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+# --- Input một khung hình của một người chơi: các bit ---
+INPUT_ATTACK = 1 # Nhấn phím tấn công
+INPUT_DEFEND = 2 # Nhấn phím phòng thủ
+INPUT_RELEASE = 4 # Nhả phím phòng thủ
+
+SIDE_KEYS = {"player": (pygame.K_w, pygame.K_s), "enemy": (pygame.K_UP, pygame.K_DOWN)}
+
+# magic, ack (khung liên tục cuối cùng đã nhận của đối phương), checksum_frame, first_frame, checksum, số input
+PACKET = struct.Struct("<2siiiIH")
+MAGIC = b"NQ"
+CHECKSUM_INTERVAL = 30 # Khung hình giữa hai lần so checksum
+
+
+def apply_input(side, bits, player, enemy):
+    """Áp dụng input của một phía như các sự kiện phím tương ứng trong run_game_scene."""
+    attack_key, defend_key = SIDE_KEYS[side]
+    if bits & INPUT_DEFEND:
+        handle_combat_key(pygame.KEYDOWN, defend_key, player, enemy)
+    if bits & INPUT_RELEASE:
+        handle_combat_key(pygame.KEYUP, defend_key, player, enemy)
+    if bits & INPUT_ATTACK:
+        handle_combat_key(pygame.KEYDOWN, attack_key, player, enemy)
+
+
+def state_checksum(player, enemy):
+    """CRC32 của trạng thái chiến đấu hai nhân vật (không gồm hình ảnh), dùng để phát hiện lệch đồng bộ."""
+    return zlib.crc32(repr((Fighter.snapshot(player), Fighter.snapshot(enemy))).encode())
+
+
+# --- Đường truyền ---
+class UdpTransport:
+    """Socket UDP không chặn gửi tới một địa chỉ cố định."""
+
+    def __init__(self, local_port, remote_addr, host="127.0.0.1"):
+        self.remote_addr = remote_addr
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, local_port))
+        self.sock.setblocking(False)
+
+    def send(self, data):
+        try:
+            self.sock.sendto(data, self.remote_addr)
+        except OSError:
+            pass # Đối phương chưa mở cổng (ICMP port unreachable), gói coi như mất
+
+    def receive(self):
+        packets = []
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(2048)
+            except (BlockingIOError, ConnectionResetError):
+                return packets
+            packets.append(data)
+
+    def close(self):
+        self.sock.close()
+
+
+class LossyLink:
+    """Bọc một transport và giả lập đường truyền xấu cho các gói gửi đi: mất gói, độ trễ dao động
+    trong latency_ms (gây jitter và đảo thứ tự), nhân đôi gói."""
+
+    def __init__(self, transport, loss=0.0, latency_ms=(0, 0), duplicate=0.0, seed=None):
+        self.transport = transport
+        self.loss = loss
+        self.latency_ms = latency_ms
+        self.duplicate = duplicate
+        self.rng = random.Random(seed)
+        self._queue = [] # (thời điểm gửi, số thứ tự, dữ liệu)
+        self._sequence = 0
+        self.dropped = 0
+
+    def send(self, data):
+        copies = 2 if self.rng.random() < self.duplicate else 1
+        for _ in range(copies):
+            if self.rng.random() < self.loss:
+                self.dropped += 1
+                continue
+            delay = self.rng.uniform(*self.latency_ms) / 1000
+            self._sequence += 1
+            heapq.heappush(self._queue, (time.perf_counter() + delay, self._sequence, data))
+        self.poll()
+
+    def poll(self):
+        now = time.perf_counter()
+        while self._queue and self._queue[0][0] <= now:
+            self.transport.send(heapq.heappop(self._queue)[2])
+
+    def receive(self):
+        self.poll()
+        return self.transport.receive()
+
+    def close(self):
+        self.transport.close()
+
+
+# --- Phiên rollback ---
+class RollbackSession:
+    """Mô phỏng hai nhân vật theo khung hình cố định, đoán input đối phương và rollback khi đoán sai."""
+
+    def __init__(self, local_side, player, enemy, clock, transport, step_ms=1000 / 60, max_prediction=8,
+                 send_window=64):
+        self.local_side = local_side
+        self.remote_side = "enemy" if local_side == "player" else "player"
+        self.player = player
+        self.enemy = enemy
+        self.clock = clock
+        self.transport = transport
+        self.step_ms = step_ms
+        self.max_prediction = max_prediction # Số khung tối đa được đi trước input đã xác nhận của đối phương
+        self.send_window = send_window
+
+        self.frame = 0 # Khung hình kế tiếp sẽ mô phỏng
+        self.local_inputs = []
+        self.remote_inputs = {} # Input đã xác nhận của đối phương
+        self.remote_confirmed = -1 # Khung liên tục cuối cùng có input đối phương
+        self.remote_ack = -1 # Khung liên tục cuối cùng đối phương đã nhận từ ta
+        self.predicted = {} # Input đối phương đã dùng (dự đoán) cho các khung chưa xác nhận
+        self.snapshots = {} # Khung -> trạng thái trước khi mô phỏng khung đó
+        self.local_checksums = {}
+        self._last_send = 0.0
+
+        # --- Thống kê ---
+        self.rollbacks = 0
+        self.resimulated_frames = 0
+        self.max_rollback_depth = 0
+        self.stalls = 0
+        self.desyncs = 0
+        self.checksums_compared = 0
+        self.packets_sent = 0
+        self.packets_received = 0
+        self.resim_ms = [] # Thời gian mô phỏng lại trong mỗi khung hình (0 nếu không rollback)
+
+    # --- Mô phỏng ---
+    def _simulate(self, frame, remote_bits):
+        self.snapshots[frame] = (self.player.snapshot(), self.enemy.snapshot())
+        self.clock.now = frame * self.step_ms
+        local_bits = self.local_inputs[frame]
+        inputs = {self.local_side: local_bits, self.remote_side: remote_bits}
+        # Thứ tự cố định (player trước) để hai tiến trình cho cùng một kết quả
+        apply_input("player", inputs["player"], self.player, self.enemy)
+        apply_input("enemy", inputs["enemy"], self.player, self.enemy)
+        if self.player.is_alive:
+            self.player.update()
+        if self.enemy.is_alive:
+            self.enemy.update()
+        self.player.timers.run_due()
+
+    def _remote_input_for(self, frame):
+        bits = self.remote_inputs.get(frame)
+        if bits is None:
+            bits = 0 # Dự đoán: đối phương không bấm gì ở khung này
+            self.predicted[frame] = bits
+        return bits
+
+    def _rollback(self, first_frame):
+        start = time.perf_counter()
+        player_state, enemy_state = self.snapshots[first_frame]
+        self.clock.now = first_frame * self.step_ms # restore() đặt lại hẹn giờ theo đồng hồ
+        self.player.restore(player_state)
+        self.enemy.restore(enemy_state)
+        for frame in range(first_frame, self.frame):
+            self._simulate(frame, self._remote_input_for(frame))
+        depth = self.frame - first_frame
+        self.rollbacks += 1
+        self.resimulated_frames += depth
+        self.max_rollback_depth = max(self.max_rollback_depth, depth)
+        return (time.perf_counter() - start) * 1000
+
+    def can_advance(self):
+        return self.frame - self.remote_confirmed - 1 < self.max_prediction
+
+    def advance(self, local_bits):
+        """Mô phỏng một khung hình với input tại chỗ; trả về False (không làm gì) nếu phải chờ đối phương."""
+        resim_ms = self.poll()
+        if not self.can_advance():
+            self.stalls += 1
+            self.resim_ms.append(resim_ms)
+            return False
+        self.local_inputs.append(local_bits)
+        self._simulate(self.frame, self._remote_input_for(self.frame))
+        self.frame += 1
+        self.resim_ms.append(resim_ms)
+        self._send()
+        return True
+
+    def poll(self):
+        """Nhận gói, cập nhật input đối phương và rollback nếu dự đoán sai; trả về thời gian mô phỏng lại (ms)."""
+        first_wrong = None
+        for data in self.transport.receive():
+            wrong = self._handle_packet(data)
+            if wrong is not None and (first_wrong is None or wrong < first_wrong):
+                first_wrong = wrong
+        resim_ms = self._rollback(first_wrong) if first_wrong is not None else 0.0
+        self._discard_confirmed()
+        if time.perf_counter() - self._last_send > 0.01:
+            self._send() # Gửi lại định kỳ khi đang chờ, phòng gói trước bị mất
+        return resim_ms
+
+    def _handle_packet(self, data):
+        if len(data) < PACKET.size or data[:2] != MAGIC:
+            return None
+        _, ack, checksum_frame, first_frame, checksum, count = PACKET.unpack_from(data)
+        self.packets_received += 1
+        self.remote_ack = max(self.remote_ack, ack)
+        if checksum_frame >= 0 and checksum_frame in self.local_checksums:
+            self.checksums_compared += 1
+            if self.local_checksums[checksum_frame] != checksum:
+                self.desyncs += 1
+
+        first_wrong = None
+        for offset, bits in enumerate(data[PACKET.size:PACKET.size + count]):
+            frame = first_frame + offset
+            if frame <= self.remote_confirmed or frame in self.remote_inputs:
+                continue
+            self.remote_inputs[frame] = bits
+            predicted = self.predicted.pop(frame, None)
+            if predicted is not None and predicted != bits and (first_wrong is None or frame < first_wrong):
+                first_wrong = frame
+        while self.remote_confirmed + 1 in self.remote_inputs:
+            self.remote_confirmed += 1
+        return first_wrong
+
+    def _discard_confirmed(self):
+        # Không bao giờ rollback về trước khung đầu tiên chưa xác nhận
+        for frame in [frame for frame in self.snapshots if frame <= self.remote_confirmed]:
+            player_state, enemy_state = self.snapshots.pop(frame)
+            # snapshots[f] là trạng thái sau khung f - 1, đã có input thật của cả hai phía
+            if frame > 0 and (frame - 1) % CHECKSUM_INTERVAL == 0:
+                self.local_checksums[frame - 1] = zlib.crc32(repr((player_state[0], enemy_state[0])).encode())
+        for old in [old for old in self.local_checksums if old < self.remote_confirmed - CHECKSUM_INTERVAL * 16]:
+            del self.local_checksums[old]
+        # Đối phương có thể đi trước ta: chỉ bỏ input của những khung đã mô phỏng xong
+        done = min(self.remote_confirmed, self.frame)
+        for frame in [frame for frame in self.remote_inputs if frame < done]:
+            del self.remote_inputs[frame]
+
+    def _send(self):
+        first = max(self.remote_ack + 1, self.frame - self.send_window)
+        inputs = bytes(self.local_inputs[first:self.frame])
+        checksum_frame = max(self.local_checksums) if self.local_checksums else -1
+        checksum = self.local_checksums.get(checksum_frame, 0)
+        self.transport.send(PACKET.pack(MAGIC, self.remote_confirmed, checksum_frame, first, checksum, len(inputs)) + inputs)
+        self.packets_sent += 1
+        self._last_send = time.perf_counter()
+
+    @property
+    def synced(self):
+        """Mọi khung đã mô phỏng đều có input thật của đối phương."""
+        return self.remote_confirmed >= self.frame - 1
+
+    def stats(self):
+        ordered = sorted(self.resim_ms)
+        return {
+            "frames": self.frame,
+            "rollbacks": self.rollbacks,
+            "resimulated_frames": self.resimulated_frames,
+            "resimulated_per_frame": self.resimulated_frames / self.frame if self.frame else 0.0,
+            "max_rollback_depth": self.max_rollback_depth,
+            "stalls": self.stalls,
+            "desyncs": self.desyncs,
+            "checksums_compared": self.checksums_compared,
+            "packets_sent": self.packets_sent,
+            "packets_received": self.packets_received,
+            "resim_ms_p50": percentile(ordered, 50),
+            "resim_ms_p95": percentile(ordered, 95),
+            "resim_ms_p99": percentile(ordered, 99),
+            "resim_ms_max": ordered[-1] if ordered else 0.0,
+        }
+
+
+def read_local_input(events, side):
+    """Gom các sự kiện phím của phía `side` trong khung hình thành các bit input."""
+    attack_key, defend_key = SIDE_KEYS[side]
+    bits = 0
+    for event in events:
+        if event.type == pygame.KEYDOWN and event.key in (attack_key, pygame.K_w):
+            bits |= INPUT_ATTACK
+        elif event.type == pygame.KEYDOWN and event.key in (defend_key, pygame.K_s):
+            bits |= INPUT_DEFEND
+        elif event.type == pygame.KEYUP and event.key in (defend_key, pygame.K_s):
+            bits |= INPUT_RELEASE
+    return bits
+
+
+def create_session(side, port, remote_addr, loss=0.0, latency_ms=(0, 0), seed=None, window_size=(650, 650),
+                   scale_factor=1.5, max_prediction=8):
+    player_configs, enemy_configs = build_animation_configs(ASSETS_FOLDER)
+    clock = TickClock()
+    player, enemy = create_scene_characters(player_configs, enemy_configs, *window_size, scale_factor, scale_factor,
+                                            clock=clock)
+    player.verbose = enemy.verbose = False # Khung hình có thể được mô phỏng lại nhiều lần
+    transport = UdpTransport(port, remote_addr)
+    if loss or any(latency_ms):
+        transport = LossyLink(transport, loss, latency_ms, seed=seed)
+    return RollbackSession(side, player, enemy, clock, transport, max_prediction=max_prediction)
+
+
+def run_net_scene(side, port, remote_addr, loss=0.0, latency_ms=(0, 0), window_width=650, window_height=650,
+                  scale_factor=1.5):
+    """Cảnh hai người chơi qua mạng: W (hoặc phím tấn công của phía mình) để tấn công, S để phòng thủ."""
+    pygame.init()
+    screen = pygame.display.set_mode((window_width, window_height))
+    pygame.display.set_caption(f"Chém qua mạng ({side})")
+    session = create_session(side, port, remote_addr, loss, latency_ms, window_size=(window_width, window_height),
+                             scale_factor=scale_factor)
+    clock = pygame.time.Clock()
+    running = True
+    pending_bits = 0 # Input gom lại trong lúc phải chờ đối phương
+
+    while running:
+        events = pygame.event.get()
+        for event in events:
+            if event.type == pygame.QUIT or event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                running = False
+        pending_bits |= read_local_input(events, side)
+        if session.advance(pending_bits):
+            pending_bits = 0
+
+        screen.fill((255, 255, 255))
+        screen.blit(session.player.image, session.player.rect)
+        screen.blit(session.enemy.image, session.enemy.rect)
+        session.player.draw_health_bar(screen, 20, 20, 200, 20)
+        session.enemy.draw_health_bar(screen, window_width - 220, 20, 200, 20)
+        stats = session.stats()
+        status = (f"frame {stats['frames']}  rollback {stats['rollbacks']}  resim p95 {stats['resim_ms_p95']:.2f} ms"
+                  f"  stall {stats['stalls']}")
+        screen.blit(text_cache.render(status, 16, (0, 0, 0)), (20, window_height - 30))
+        pygame.display.flip()
+        clock.tick(60)
+
+    pygame.quit()
+    print(json.dumps(session.stats()))
+
+
+def run_headless(side, port, remote_addr, frames, seed, loss=0.0, latency_ms=(0, 0), fps=0, timeout_s=60.0):
+    """Chơi `frames` khung với input ngẫu nhiên (theo seed) không cần cửa sổ; trả về checksum cuối và thống kê."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    session = create_session(side, port, remote_addr, loss, latency_ms, seed=seed)
+    rng = random.Random(f"{seed}-{side}")
+    frame_time = 1 / fps if fps else 0.0
+    deadline = time.perf_counter() + timeout_s
+
+    # Input được sinh trước theo seed nên lần chạy nào cũng như nhau
+    script = [rng.choice((0, 0, 0, 0, 0, INPUT_ATTACK, INPUT_DEFEND, INPUT_RELEASE)) for _ in range(frames)]
+    while (session.frame < frames or not session.synced) and time.perf_counter() < deadline:
+        start = time.perf_counter()
+        if session.frame < frames:
+            session.advance(script[session.frame])
+        else:
+            session.poll()
+        if frame_time:
+            time.sleep(max(frame_time - (time.perf_counter() - start), 0))
+        elif session.frame >= frames or not session.can_advance():
+            time.sleep(0.0005) # Đang chờ đối phương
+
+    # Ở lại một lúc để đối phương chắc chắn nhận đủ input của ta
+    linger_until = time.perf_counter() + 2.0
+    while session.remote_ack < frames - 1 and time.perf_counter() < linger_until:
+        session.poll()
+        time.sleep(0.002)
+    session.transport.close()
+    pygame.quit()
+    return {"side": side, "frames": session.frame, "synced": session.synced,
+            "checksum": state_checksum(session.player, session.enemy), "stats": session.stats()}
+
+
+def run_local_test(frames, loss, latency_ms, seed, fps=60, base_port=47000):
+    """Chạy hai tiến trình headless qua localhost và so checksum trạng thái cuối của hai bên."""
+    commands = []
+    for side, port, remote_port in (("player", base_port, base_port + 1), ("enemy", base_port + 1, base_port)):
+        commands.append([sys.executable, os.path.abspath(__file__), "--side", side, "--port", str(port),
+                         "--remote", f"127.0.0.1:{remote_port}", "--headless", "--frames", str(frames),
+                         "--seed", str(seed), "--loss", str(loss), "--latency", *map(str, latency_ms),
+                         "--fps", str(fps)])
+    processes = [subprocess.Popen(command, stdout=subprocess.PIPE, text=True) for command in commands]
+    results = [json.loads(process.communicate()[0].strip().splitlines()[-1]) for process in processes]
+    for result in results:
+        print(f"{result['side']:<7} checksum={result['checksum']:08x} {result['stats']}")
+    same = results[0]["checksum"] == results[1]["checksum"] and all(result["synced"] for result in results)
+    print("Hai tiến trình đồng bộ." if same else "LỆCH ĐỒNG BỘ giữa hai tiến trình!")
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chơi qua mạng (UDP) với rollback.")
+    parser.add_argument("--side", choices=("player", "enemy"), default="player")
+    parser.add_argument("--port", type=int, default=7000)
+    parser.add_argument("--remote", default="127.0.0.1:7001", help="host:port của tiến trình đối phương")
+    parser.add_argument("--loss", type=float, default=0.0, help="Tỉ lệ mất gói giả lập (0..1)")
+    parser.add_argument("--latency", type=float, nargs=2, default=(0, 0), metavar=("MIN_MS", "MAX_MS"),
+                        help="Độ trễ một chiều giả lập, ngẫu nhiên trong khoảng")
+    parser.add_argument("--headless", action="store_true", help="Không mở cửa sổ, input ngẫu nhiên theo --seed")
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fps", type=float, default=60, help="Nhịp khung hình khi headless (0 = không giới hạn)")
+    parser.add_argument("--local-test", action="store_true", help="Tự chạy hai tiến trình headless và so kết quả")
+    args = parser.parse_args()
+
+    if args.local_test:
+        sys.exit(0 if run_local_test(args.frames, args.loss, tuple(args.latency), args.seed, args.fps) else 1)
+
+    host, port = args.remote.rsplit(":", 1)
+    remote_addr = (host, int(port))
+    if args.headless:
+        result = run_headless(args.side, args.port, remote_addr, args.frames, args.seed, args.loss,
+                              tuple(args.latency), args.fps)
+        print(json.dumps(result))
+    else:
+        run_net_scene(args.side, args.port, remote_addr, args.loss, tuple(args.latency))
+
+
+if __name__ == '__main__':
+    main()
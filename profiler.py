@@ -0,0 +1,194 @@
+import csv
+import json
+import math
+import time
+from collections import deque
+
+import pygame
+
+from hud import get_font
+
+
+def percentile(sorted_values, q):
+    """Phân vị theo nearest-rank trên danh sách đã sắp xếp (q từ 0 đến 100)."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(q / 100 * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(rank, 1)) - 1]
+
+
+# --- Đo thời gian từng pha của mỗi khung hình ---
+class FrameProfiler:
+    """Ghi thời gian từng pha (mark), phân vị p50/p95/p99 cuộn, khung hình rớt và độ trễ input -> hiển thị.
+
+    Trong vòng lặp: begin_frame() trước khi lấy sự kiện, mark("tên pha") sau mỗi pha,
+    frame_presented() ngay sau display.flip/update, end_frame() cuối vòng lặp.
+    """
+
+    def __init__(self, target_fps=60, window=300, max_records=100000, overlay_refresh_ms=500):
+        self.frame_budget_ms = 1000 / target_fps
+        self.window = window
+        self.max_records = max_records
+        self.overlay_refresh_ms = overlay_refresh_ms
+
+        self.phases = [] # Thứ tự các pha theo lần xuất hiện đầu tiên
+        self._rolling = {} # pha -> deque thời gian (ms) của `window` khung gần nhất
+        self._rolling_total = deque(maxlen=window)
+        self.records = [] # Mỗi khung hình: {"frame", "<pha>"..., "total"}
+        self.latencies = [] # Độ trễ input -> hiển thị (ms)
+        self._rolling_latency = deque(maxlen=window)
+        self.frame_count = 0
+        self.dropped_frames = 0
+
+        self._frame_start = 0.0
+        self._last_mark = 0.0
+        self._current = {}
+        self._pending_inputs = []
+
+        self.overlay_visible = False
+        self._overlay_surface = None
+        self._overlay_updated_at = 0.0
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        self._frame_start = self._last_mark = now
+        self._current = {}
+
+    def mark(self, phase):
+        """Kết thúc pha `phase`: ghi thời gian từ lần mark trước đến giờ."""
+        now = time.perf_counter()
+        self._current[phase] = self._current.get(phase, 0.0) + (now - self._last_mark) * 1000
+        self._last_mark = now
+
+    def input_time(self):
+        """Thời điểm đọc một sự kiện input khỏi hàng đợi; gọi trong vòng lặp sự kiện, cho từng sự kiện."""
+        return time.perf_counter()
+
+    def attack_input(self, input_time):
+        """Gọi khi một KEYDOWN (W/UP) vừa bắt đầu đòn tấn công; input_time là giá trị input_time() lúc đọc sự kiện."""
+        self._pending_inputs.append(input_time)
+
+    def frame_presented(self):
+        """Gọi ngay sau khi khung hình được đưa lên màn hình (khung tấn công đã hiển thị)."""
+        if self._pending_inputs:
+            now = time.perf_counter()
+            for input_time in self._pending_inputs:
+                latency = (now - input_time) * 1000
+                self.latencies.append(latency)
+                self._rolling_latency.append(latency)
+            self._pending_inputs.clear()
+
+    def end_frame(self):
+        total = (time.perf_counter() - self._frame_start) * 1000
+        self.frame_count += 1
+        if total > self.frame_budget_ms * 1.5: # Trễ hơn một nhịp khung hình
+            self.dropped_frames += 1
+
+        for phase, duration in self._current.items():
+            if phase not in self._rolling:
+                self.phases.append(phase)
+                self._rolling[phase] = deque(maxlen=self.window)
+            self._rolling[phase].append(duration)
+        self._rolling_total.append(total)
+
+        if len(self.records) < self.max_records:
+            record = {"frame": self.frame_count}
+            record.update(self._current)
+            record["total"] = total
+            self.records.append(record)
+
+    def summary(self):
+        """{pha: (p50, p95, p99)} trên cửa sổ cuộn, gồm cả "total" và "latency"."""
+        series = dict(self._rolling)
+        series["total"] = self._rolling_total
+        series["latency"] = self._rolling_latency
+        result = {}
+        for name, values in series.items():
+            ordered = sorted(values)
+            result[name] = (percentile(ordered, 50), percentile(ordered, 95), percentile(ordered, 99))
+        return result
+
+    # --- Lớp phủ trên màn hình (bật/tắt bằng F3) ---
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+        self._overlay_surface = None
+
+    def _render_overlay(self):
+        font = get_font(16)
+        lines = [f"frames {self.frame_count}  dropped {self.dropped_frames}", "phase      p50    p95    p99 (ms)"]
+        for name, (p50, p95, p99) in self.summary().items():
+            lines.append(f"{name:<9}{p50:6.2f} {p95:6.2f} {p99:6.2f}")
+        line_height = font.get_linesize()
+        # Nền đục để vẽ đè nhiều lần (chế độ dirty) không làm tối dần vùng bên dưới
+        surface = pygame.Surface((230, line_height * len(lines) + 8))
+        surface.fill((30, 30, 30))
+        for i, line in enumerate(lines):
+            surface.blit(font.render(line, True, (255, 255, 255)), (6, 4 + i * line_height))
+        return surface
+
+    def draw_overlay(self, screen, position=(10, 50)):
+        """Vẽ lớp phủ (render lại tối đa mỗi overlay_refresh_ms); trả về vùng đã vẽ hoặc None."""
+        if not self.overlay_visible:
+            return None
+        now = time.perf_counter()
+        if self._overlay_surface is None or (now - self._overlay_updated_at) * 1000 >= self.overlay_refresh_ms:
+            self._overlay_surface = self._render_overlay()
+            self._overlay_updated_at = now
+        return screen.blit(self._overlay_surface, position)
+
+    # --- Xuất dữ liệu từng khung hình ---
+    def dump(self, path):
+        """Ghi dữ liệu ra CSV hoặc JSON tùy theo phần mở rộng của path."""
+        if path.lower().endswith(".json"):
+            self.dump_json(path)
+        else:
+            self.dump_csv(path)
+
+    def dump_csv(self, path):
+        fieldnames = ["frame"] + self.phases + ["total"]
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, restval=0.0)
+            writer.writeheader()
+            writer.writerows(self.records)
+
+    def dump_json(self, path):
+        data = {
+            "frame_budget_ms": self.frame_budget_ms,
+            "dropped_frames": self.dropped_frames,
+            "phases": self.phases,
+            "summary": self.summary(),
+            "frames": self.records,
+            "input_latency_ms": self.latencies,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+
+
+class NullProfiler:
+    """Cùng giao diện với FrameProfiler nhưng không đo gì, dùng khi tắt profile."""
+
+    overlay_visible = False
+
+    def begin_frame(self):
+        pass
+
+    def mark(self, phase):
+        pass
+
+    def input_time(self):
+        return 0.0
+
+    def attack_input(self, input_time):
+        pass
+
+    def frame_presented(self):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def toggle_overlay(self):
+        pass
+
+    def draw_overlay(self, screen, position=(10, 50)):
+        return None
@@ -0,0 +1,111 @@
+import pygame
+
+
+def merge_rects(rects):
+    """Gộp các vùng chồng lên nhau để mỗi điểm ảnh chỉ được vẽ lại một lần."""
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+# --- Chế độ vẽ theo vùng bẩn (dirty rectangles) ---
+class DirtyRectRenderer:
+    """Chỉ vẽ lại và đưa lên màn hình những vùng thay đổi bằng pygame.display.update(rects).
+
+    Một sprite bẩn khi đổi ảnh hoặc đổi vị trí (vẽ lại cả vùng cũ lẫn vùng mới);
+    một thanh máu bẩn khi current_hp hoặc max_hp thay đổi; hiệu ứng (EffectSystem) luôn bẩn khi đang chạy.
+    """
+
+    def __init__(self, screen, background_color):
+        self.screen = screen
+        self.background_color = background_color
+        self.sprites = []
+        self.health_bars = [] # (character, HealthBar, rect)
+        self.effects = None # EffectSystem, vẽ trên các sprite và dưới thanh máu
+        self._sprite_state = {} # sprite -> (image, vùng đã vẽ) ở khung hình trước
+        self._full_redraw = True
+
+        # --- Thống kê ---
+        self.frames = 0
+        self.idle_frames = 0 # Khung hình không có gì thay đổi
+        self.last_dirty_area = 0
+
+    def add_sprite(self, sprite):
+        self.sprites.append(sprite)
+        self._full_redraw = True
+
+    def add_health_bar(self, character, x, y, width, height, border_thickness=2, font_size=16):
+        health_bar = character.get_health_bar(width, height, border_thickness, font_size)
+        self.health_bars.append((character, health_bar, pygame.Rect(x, y, width, height)))
+        self._full_redraw = True
+
+    def add_effects(self, effects):
+        self.effects = effects
+        self._full_redraw = True
+
+    def invalidate(self):
+        """Buộc vẽ lại toàn màn hình ở khung hình kế tiếp (ví dụ khi cửa sổ bị che rồi hiện lại)."""
+        self._full_redraw = True
+
+    @staticmethod
+    def _drawn_area(sprite):
+        # blit(image, rect) chỉ dùng góc trên trái của rect (rect có thể bị nới rộng làm hitbox)
+        return pygame.Rect(sprite.rect.topleft, sprite.image.get_size())
+
+    def _draw_region(self, region):
+        self.screen.fill(self.background_color, region)
+        for sprite in self.sprites:
+            if region is None or self._sprite_state[sprite][1].colliderect(region):
+                self.screen.blit(sprite.image, sprite.rect)
+        if self.effects is not None:
+            self.effects.draw(self.screen) # Phần nằm ngoài region bị set_clip cắt bỏ
+        for character, health_bar, rect in self.health_bars:
+            if region is None or rect.colliderect(region):
+                health_bar.draw(self.screen, rect.x, rect.y, character.current_hp, character.max_hp)
+
+    def render(self):
+        """Vẽ và hiển thị khung hình hiện tại; trả về danh sách vùng đã cập nhật."""
+        self.frames += 1
+        dirty = []
+        for sprite in self.sprites:
+            area = self._drawn_area(sprite)
+            last = self._sprite_state.get(sprite)
+            if last is None or last[0] is not sprite.image or last[1] != area:
+                if last is not None:
+                    dirty.append(last[1])
+                dirty.append(area)
+                self._sprite_state[sprite] = (sprite.image, area)
+        for character, health_bar, rect in self.health_bars:
+            if health_bar.is_dirty(character.current_hp, character.max_hp):
+                dirty.append(rect)
+        if self.effects is not None:
+            dirty.extend(self.effects.dirty_rects())
+
+        if self._full_redraw:
+            self._full_redraw = False
+            self._draw_region(None)
+            pygame.display.flip()
+            screen_rect = self.screen.get_rect()
+            self.last_dirty_area = screen_rect.width * screen_rect.height
+            return [screen_rect]
+
+        screen_rect = self.screen.get_rect()
+        dirty = [rect.clip(screen_rect) for rect in merge_rects(dirty)]
+        dirty = [rect for rect in dirty if rect.width and rect.height]
+        self.last_dirty_area = sum(rect.width * rect.height for rect in dirty)
+        if not dirty:
+            self.idle_frames += 1
+            return dirty
+
+        for rect in dirty:
+            self.screen.set_clip(rect)
+            self._draw_region(rect)
+        self.screen.set_clip(None)
+        pygame.display.update(dirty)
+        return dirty
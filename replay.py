@@ -0,0 +1,204 @@
+"""Ghi và phát lại replay: các phím chiến đấu (W/S/UP/DOWN) cùng thời điểm của từng khung hình.
+
+Tệp replay (nhị phân, little-endian):
+    header  : magic "NQRP", version (u8), window_width, window_height (u16), player_scale, enemy_scale (f64),
+              start_ms (u32) - thời điểm tạo nhân vật
+    mỗi khung: delta_ms (u16, 0xFFFF = u32 theo sau) so với khung trước, số phím (u8), mỗi phím một byte
+              (chỉ số trong COMBAT_KEYS, bit 7 bật nếu là KEYUP)
+
+Chạy:  python replay.py tran_1.nqr tran_2.nqr                  # phát lại nhanh nhất có thể, in kết quả
+       python replay.py tran_1.nqr --realtime                  # phát lại có hình, đúng tốc độ đã ghi
+       python replay.py replays/*.nqr --save-results kq.json    # ghi kết quả làm mốc
+       python replay.py replays/*.nqr --check kq.json           # so sánh với mốc, mã thoát 1 nếu khác
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+
+import pygame
+
+from code_1 import COMBAT_KEYS, build_animation_configs, create_scene_characters, handle_combat_key
+from combat_core import TickClock
+import combat_events
+
+MAGIC = b"NQRP"
+VERSION = 1
+HEADER = struct.Struct("<4sBHHddI")
+FRAME = struct.Struct("<HB")
+LONG_DELTA = 0xFFFF
+KEYUP_BIT = 0x80
+
+ASSETS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+class ReplayWriter:
+    """Ghi replay từng khung hình vào tệp (có bộ đệm), gọi frame() một lần mỗi khung."""
+
+    def __init__(self, path, window_width, window_height, player_scale, enemy_scale, start_ms):
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, window_width, window_height, player_scale, enemy_scale, start_ms))
+        self._last_ms = start_ms
+        self.frame_count = 0
+
+    def frame(self, now_ms, keys):
+        """keys: danh sách (pygame.KEYDOWN/KEYUP, phím trong COMBAT_KEYS) theo thứ tự xảy ra trong khung."""
+        delta = now_ms - self._last_ms
+        self._last_ms = now_ms
+        if delta < LONG_DELTA:
+            self._file.write(FRAME.pack(delta, len(keys)))
+        else:
+            self._file.write(FRAME.pack(LONG_DELTA, len(keys)) + struct.pack("<I", delta))
+        if keys:
+            self._file.write(bytes(COMBAT_KEYS.index(key) | (KEYUP_BIT if event_type == pygame.KEYUP else 0)
+                                   for event_type, key in keys))
+        self.frame_count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Replay:
+    """Replay đã đọc vào bộ nhớ: thông số cảnh và danh sách khung hình (delta_ms, [(event_type, key), ...])."""
+
+    def __init__(self, window_width, window_height, player_scale, enemy_scale, start_ms, frames):
+        self.window_width = window_width
+        self.window_height = window_height
+        self.player_scale = player_scale
+        self.enemy_scale = enemy_scale
+        self.start_ms = start_ms
+        self.frames = frames
+
+    @property
+    def duration_ms(self):
+        return sum(delta for delta, _ in self.frames)
+
+
+def read_replay(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, window_width, window_height, player_scale, enemy_scale, start_ms = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"'{path}' không phải tệp replay.")
+    if version != VERSION:
+        raise ValueError(f"Replay '{path}' có phiên bản {version}, chỉ hỗ trợ {VERSION}.")
+
+    frames = []
+    offset = HEADER.size
+    while offset < len(data):
+        delta, count = FRAME.unpack_from(data, offset)
+        offset += FRAME.size
+        if delta == LONG_DELTA:
+            delta, = struct.unpack_from("<I", data, offset)
+            offset += 4
+        keys = [(pygame.KEYUP if code & KEYUP_BIT else pygame.KEYDOWN, COMBAT_KEYS[code & ~KEYUP_BIT])
+                for code in data[offset:offset + count]]
+        offset += count
+        frames.append((delta, keys))
+    return Replay(window_width, window_height, player_scale, enemy_scale, start_ms, frames)
+
+
+def play_replay(replay, player_anim_configs, enemy_anim_configs, realtime=False, verbose=False, on_frame=None):
+    """Chạy lại replay qua đúng logic Character của run_game_scene; trả về kết quả trận.
+
+    realtime=False: không vẽ, không chờ, chạy nhanh nhất có thể (cần một display, có thể là SDL dummy).
+    realtime=True: vẽ cảnh và chờ đúng khoảng thời gian giữa các khung như lúc ghi.
+    on_frame(player, enemy): gọi sau mỗi khung đã mô phỏng (ví dụ để so checksum trạng thái từng khung).
+    """
+    pygame.init()
+    size = (replay.window_width, replay.window_height)
+    screen = pygame.display.set_mode(size if realtime else (1, 1))
+    if realtime:
+        pygame.display.set_caption("Phát lại replay")
+
+    frame_clock = TickClock(replay.start_ms)
+    player, enemy = create_scene_characters(player_anim_configs, enemy_anim_configs, *size,
+                                            replay.player_scale, replay.enemy_scale, clock=frame_clock)
+    player.verbose = enemy.verbose = verbose
+
+    for delta, keys in replay.frames:
+        frame_clock.now += delta
+        if realtime:
+            pygame.event.pump()
+            pygame.time.wait(int(delta))
+        for event_type, key in keys:
+            handle_combat_key(event_type, key, player, enemy)
+        if player.is_alive:
+            player.update()
+        if enemy.is_alive:
+            enemy.update()
+        player.timers.run_due()
+        if on_frame is not None:
+            on_frame(player, enemy)
+
+        if realtime:
+            screen.fill((255, 255, 255))
+            screen.blit(player.image, player.rect)
+            screen.blit(enemy.image, enemy.rect)
+            player.draw_health_bar(screen, 20, 20, 200, 20)
+            enemy.draw_health_bar(screen, replay.window_width - 220, 20, 200, 20)
+            pygame.display.flip()
+
+    if verbose:
+        combat_events.bus.flush()
+    if not player.is_alive and enemy.is_alive:
+        winner = "enemy"
+    elif not enemy.is_alive and player.is_alive:
+        winner = "player"
+    else:
+        winner = None
+    return {
+        "winner": winner,
+        "frames": len(replay.frames),
+        "duration_ms": replay.duration_ms,
+        "player_hp": player.current_hp,
+        "enemy_hp": enemy.current_hp,
+        "player_shield": player.shield_hits_left,
+        "enemy_shield": enemy.shield_hits_left,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Phát lại replay đã ghi bằng run_game_scene(record_path=...).")
+    parser.add_argument("replays", nargs="+")
+    parser.add_argument("--realtime", action="store_true", help="Vẽ cảnh và phát đúng tốc độ đã ghi")
+    parser.add_argument("--verbose", action="store_true", help="In log DEBUG của trận")
+    parser.add_argument("--save-results", help="Ghi kết quả các replay ra tệp JSON làm mốc")
+    parser.add_argument("--check", help="So sánh kết quả với tệp JSON mốc, mã thoát 1 nếu khác")
+    args = parser.parse_args()
+
+    if not args.realtime:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    player_configs, enemy_configs = build_animation_configs(ASSETS_FOLDER)
+
+    results = {}
+    for path in args.replays:
+        results[os.path.basename(path)] = result = play_replay(read_replay(path), player_configs, enemy_configs,
+                                                               realtime=args.realtime, verbose=args.verbose)
+        print(f"{path}: {result}")
+    pygame.quit()
+
+    if args.save_results:
+        with open(args.save_results, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.check:
+        with open(args.check, encoding="utf-8") as f:
+            expected = json.load(f)
+        mismatches = [name for name, result in results.items() if name in expected and expected[name] != result]
+        for name in mismatches:
+            print(f"KHÁC MỐC: {name}: {expected[name]} -> {results[name]}")
+        if mismatches:
+            sys.exit(1)
+        print("Mọi replay cho kết quả giống mốc.")
+
+
+if __name__ == '__main__':
+    main()
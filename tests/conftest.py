@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pygame
+import pytest
+
+# Kiểm thử chạy không cần cửa sổ thật: SDL dùng driver giả
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS_FOLDER = ROOT # Thư mục Main/ và enemy/ nằm ngay ở gốc repo (xem code_1.build_animation_configs)
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def display():
+    """Cửa sổ SDL giả, cần cho convert_alpha() khi tải khung hình của Character."""
+    pygame.init()
+    return pygame.display.set_mode((1, 1))
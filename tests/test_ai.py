@@ -0,0 +1,32 @@
+"""Bản mô phỏng của AI: cùng luật với Fighter và không chạm vào bus của trận thật."""
+import combat_events
+from ai import LookaheadSearch, fighter_config
+from combat_core import Fighter, TickClock
+
+
+def create_search():
+    clock = TickClock(1000)
+    me, opponent = Fighter("enemy", clock=clock, verbose=False), Fighter("player", clock=clock, verbose=False)
+    return LookaheadSearch(fighter_config(me), fighter_config(opponent))
+
+
+def test_attack_is_legal_exactly_when_cooldown_has_elapsed():
+    for elapsed_offset, legal in ((0, True), (-1, False)):
+        search = create_search()
+        me = search.me
+        search.clock.now = 2000
+        me.last_attack_time = search.clock.now - me.attack_cooldown - elapsed_offset
+        assert ("attack" in search._legal(me)) is legal
+        assert me.start_attack_direct() is legal
+
+
+def test_search_does_not_emit_on_the_shared_bus():
+    received = []
+    callback = combat_events.bus.subscribe(received.append)
+    try:
+        search = create_search()
+        search.decide(search.me.snapshot(), search.opponent.snapshot(), 1000, budget_ms=20)
+    finally:
+        combat_events.bus.unsubscribe(callback)
+    assert search.nodes > 0
+    assert received == []
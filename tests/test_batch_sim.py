@@ -0,0 +1,66 @@
+"""BatchSim phải cho đúng từng bước như combat_core.Match với cùng chuỗi hành động."""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from batch_sim import ATTACK, ATTACKING, DEAD, DEFEND, DEFENDING, HIT, IDLE, NONE, RELEASE, BatchSim
+from combat_core import Fighter, Match, TickClock
+
+ACTION_NAMES = {NONE: None, ATTACK: "attack", DEFEND: "defend", RELEASE: "release"}
+STATE_CODES = {"idle": IDLE, "attacking": ATTACKING, "enemy_attacking": ATTACKING, "defending": DEFENDING,
+               "hit": HIT, "dead": DEAD}
+WINNER_CODES = {None: 0, "player": 1, "enemy": 2}
+
+
+def random_actions(rng, n, p_attack, p_defend, p_release):
+    return rng.choice([NONE, ATTACK, DEFEND, RELEASE], size=n,
+                      p=[1 - p_attack - p_defend - p_release, p_attack, p_defend, p_release]).astype(np.int8)
+
+
+@pytest.mark.parametrize("seed, rules", [
+    (1, {}),
+    (2, {"attack_cooldown": 300, "shield_max_hits": 1, "healing_interval": 1000}),
+    (3, {"max_hp": 100, "hit_display_duration": 200, "shield_broken_damage": 15}),
+])
+def test_batch_sim_matches_fighter_rules_every_step(seed, rules):
+    n = 24
+    rng = np.random.default_rng(seed)
+    sim = BatchSim(n, **rules)
+    matches = []
+    for _ in range(n):
+        clock = TickClock()
+        matches.append(Match(Fighter("player", clock=clock, verbose=False),
+                             Fighter("enemy", clock=clock, verbose=False), clock=clock))
+        for fighter in (matches[-1].player, matches[-1].enemy):
+            for name, value in rules.items():
+                setattr(fighter, name, value)
+            fighter.shield_hits_left = fighter.shield_max_hits
+            fighter.current_hp = fighter.max_hp
+            fighter.reschedule_timers()
+    end_time = [None] * n
+
+    for step in range(3000):
+        # Nhiều tấn công để trận kết thúc, đủ phòng thủ/nhả để đi qua mọi nhánh khiên
+        player_actions = random_actions(rng, n, 0.08, 0.04, 0.04)
+        enemy_actions = random_actions(rng, n, 0.08, 0.04, 0.04)
+        sim.step(player_actions, enemy_actions)
+        for i, match in enumerate(matches):
+            if match.is_over:
+                continue
+            match.step(ACTION_NAMES[player_actions[i]], ACTION_NAMES[enemy_actions[i]])
+            if match.is_over:
+                end_time[i] = match.clock.now
+            for side, fighter in ((sim.player, match.player), (sim.enemy, match.enemy)):
+                context = f"trận {i}, bước {step}, {fighter.owner_type}"
+                assert side.hp[i] == fighter.current_hp, context
+                assert side.state[i] == STATE_CODES[fighter.action_state], context
+                assert side.alive[i] == fighter.is_alive, context
+                assert side.shield[i] == fighter.shield_hits_left, context
+            assert sim.winner[i] == WINNER_CODES[match.winner], f"trận {i}, bước {step}"
+        if not sim.active.any():
+            break
+
+    assert not sim.active.any(), "mọi trận phải kết thúc trong giới hạn bước"
+    for i, match in enumerate(matches):
+        assert sim.winner[i] == WINNER_CODES[match.winner]
+        assert sim.end_time[i] == end_time[i]
@@ -0,0 +1,61 @@
+"""Broad phase của Battle: lưới dựng đầu khung hình nhưng khung tấn công có thể rộng hơn rất nhiều."""
+import pygame
+
+from battle import Battle
+from combat_core import Fighter, TickClock
+
+
+class BoxFighter(Fighter):
+    """Fighter headless với hurtbox/hitbox là rect: khung tấn công rộng thêm `reach` px về phía trước."""
+
+    __slots__ = ("x", "reach")
+
+    def __init__(self, owner_type, x, reach, clock):
+        super().__init__(owner_type, clock=clock, verbose=False)
+        self.x = x
+        self.reach = reach
+
+    def hurtbox(self):
+        width = 60 + (self.reach if self.current_animation_name == self.attack_animation else 0)
+        return pygame.Rect(self.x, 0, width, 60)
+
+    def attack_hitbox(self):
+        return self.hurtbox()
+
+    def attack_reach(self):
+        return pygame.Rect(self.x, 0, 60 + self.reach, 60)
+
+    def hits(self, target):
+        return self.attack_hitbox().colliderect(target.hurtbox())
+
+
+def test_attacker_is_found_by_its_attack_frame_in_the_same_step():
+    clock = TickClock(1000)
+    battle = Battle(cell_size=128, query_margin=32)
+    wide = BoxFighter("player", 0, 289, clock) # Khung tấn công rộng như "attack" của player
+    enemy = BoxFighter("enemy", 330, 0, clock) # Ngoài hurtbox idle + query_margin của player
+    battle.add(wide, "player")
+    battle.add(enemy, "enemy")
+    battle.rebuild_grid()
+
+    assert battle.targets_for(enemy) == [] # Theo khung idle, player ở ngoài tầm
+    assert wide.start_attack_direct()
+    assert battle.targets_for(wide) == [enemy]
+    # Cùng khung hình, lưới chưa dựng lại: enemy phải thấy player theo khung tấn công mới
+    assert battle.targets_for(enemy) == [wide]
+
+
+def test_enemy_in_reach_uses_rects_without_narrow_phase():
+    clock = TickClock(1000)
+    battle = Battle(cell_size=128, query_margin=32)
+    wide = BoxFighter("player", 0, 289, clock)
+    near = BoxFighter("enemy", 330, 0, clock) # Trong tầm đánh của wide, ngoài hurtbox idle của nó
+    battle.add(wide, "player")
+    battle.add(near, "enemy")
+    battle.rebuild_grid()
+
+    assert battle.enemy_in_reach(wide)
+    assert not battle.enemy_in_reach(near)
+    near.take_damage(near.max_hp)
+    assert not battle.enemy_in_reach(wide) # Địch đã chết không còn là mục tiêu
+    assert battle.narrow_phase_checks == 0
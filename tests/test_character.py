@@ -0,0 +1,37 @@
+"""Vùng gây sát thương của khung tấn công: phía trước nhân vật, theo tỉ lệ và hướng của ảnh."""
+import pytest
+
+from assets import AnimationBudget
+from code_1 import Character, build_animation_configs, create_scene_characters
+from combat_core import TickClock
+from conftest import ASSETS_FOLDER
+
+
+@pytest.mark.parametrize("scale", [0.4, 1.5, 2.5])
+def test_attack_hit_region_is_in_front_and_scaled(display, scale):
+    player_configs, enemy_configs = build_animation_configs(ASSETS_FOLDER)
+    player, enemy = create_scene_characters(player_configs, enemy_configs, 650, 650, scale, scale, clock=TickClock())
+    for fighter in (player, enemy):
+        frame_size = fighter.animations[fighter.attack_animation][0].get_size()
+        region = fighter._hit_region(fighter.attack_animation, frame_size)
+        ratio = scale / fighter.attack_hitbox_reference_scale
+        assert region.width == int(fighter.attack_range * fighter.attack_hitbox_multiplier * ratio)
+        # Player quay sang phải, enemy (ảnh lật) quay sang trái: vùng đối xứng qua khung hình
+        back_gap = frame_size[0] - region.right if fighter.is_flipped else region.left
+        assert back_gap == int(fighter.attack_offset * ratio)
+        assert fighter._hit_region("idle", frame_size) is None
+    assert not player.is_flipped and enemy.is_flipped
+
+
+def test_eager_and_lazy_characters_share_one_frame_cache(display):
+    player_configs, _ = build_animation_configs(ASSETS_FOLDER)
+    budget = AnimationBudget()
+    lazy = Character(player_configs, (0, 0), 0.4, clock=TickClock(), budget=budget)
+    attack_frames = lazy.animations["attack"]
+    hits = budget.hits
+    eager = Character(player_configs, (0, 0), 0.4, clock=TickClock(), lazy=False, budget=budget)
+    # Animation lazy đã giải mã thì eager lấy lại đúng khung hình đó, không giải mã lần hai
+    assert eager.animations["attack"] is attack_frames
+    assert eager.animations["idle"] is lazy.animations["idle"]
+    assert budget.hits > hits
+    assert budget.stats()["misses"] == budget.misses == len(budget)
@@ -0,0 +1,28 @@
+"""EffectSystem với DirtyRectRenderer: vẽ theo vùng bẩn phải cho cùng ảnh như vẽ lại toàn màn hình."""
+import random
+
+import pygame
+
+from effects import EffectSystem
+from rendering import DirtyRectRenderer
+
+
+def test_dirty_rendering_matches_full_redraw_with_pool_recycling(display):
+    screen = pygame.display.set_mode((320, 240))
+    effects = EffectSystem(capacity=6) # Pool nhỏ: hiệu ứng cũ nhất thường bị dùng lại
+    effects.load_default_kinds()
+    renderer = DirtyRectRenderer(screen, (255, 255, 255))
+    renderer.add_effects(effects)
+    reference = pygame.Surface(screen.get_size())
+    rng = random.Random(7)
+    now = 0
+    for _ in range(600):
+        now += 16
+        for _ in range(rng.choice((0, 0, 0, 1, 3))):
+            effects.spawn(rng.choice(("hit_spark", "block_spark")), (rng.randrange(320), rng.randrange(240)), now)
+        effects.update(now)
+        renderer.render()
+        reference.fill((255, 255, 255))
+        effects.draw(reference)
+        assert pygame.image.tobytes(screen, "RGB") == pygame.image.tobytes(reference, "RGB")
+    assert effects.recycled > 0
@@ -0,0 +1,28 @@
+"""Cache font/chữ của hud không được giữ Font của một phiên pygame đã đóng."""
+import subprocess
+import sys
+import textwrap
+
+from conftest import ROOT
+
+# Chạy trong tiến trình riêng: dùng Font đã chết làm tiến trình segfault, và pygame.quit() không được
+# ảnh hưởng tới cửa sổ giả dùng chung của các kiểm thử khác
+CYCLES = textwrap.dedent("""
+    import os
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    import pygame
+    import hud
+
+    for cycle in range(2):
+        pygame.init()
+        pygame.display.set_mode((200, 40))
+        bar = hud.HealthBar(200, 40, (0, 200, 0))
+        assert bar.refresh(250, 250) # Cùng chữ ở cả hai vòng: vòng hai phải render bằng Font mới
+        assert hud.text_cache.misses == cycle + 1
+        pygame.quit()
+        assert not hud._fonts and not hud.text_cache._surfaces
+""")
+
+def test_two_init_render_quit_cycles():
+    result = subprocess.run([sys.executable, "-c", CYCLES], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,75 @@
+"""Rollback netplay: hai RollbackSession qua LossyLink (UDP localhost) phải luôn đồng bộ."""
+import random
+import time
+
+from code_1 import build_animation_configs, create_scene_characters
+from combat_core import Fighter, TickClock
+from netplay import (ASSETS_FOLDER, INPUT_ATTACK, INPUT_DEFEND, INPUT_RELEASE, LossyLink, RollbackSession,
+                     UdpTransport, state_checksum)
+
+# Slot của Fighter không thuộc trạng thái mô phỏng: cấu hình luật, tham chiếu, hẹn giờ (đặt lại bởi restore).
+# Thêm slot mới mà không xếp vào đây hoặc STATE_FIELDS thì kiểm thử dưới đây báo lỗi.
+NON_STATE_SLOTS = {
+    "clock", "owner_type", "verbose", "events", "attack_animation",
+    "timers", "_owns_timers", "_hit_end_timer", "_cooldown_timer", "_heal_timer",
+    "frame_counts", "fps_settings", "hit_display_duration", "healing_amount", "healing_interval", "attack_cooldown",
+    "attack_damage", "shield_broken_damage", "blocked_damage", "shield_max_hits",
+    "opponent", "battle", "__weakref__",
+}
+
+
+def test_every_fighter_slot_is_state_or_declared_config():
+    slots = set(Fighter.__slots__)
+    assert slots - set(Fighter.STATE_FIELDS) == NON_STATE_SLOTS
+    assert set(Fighter.STATE_FIELDS) <= slots
+
+
+def full_state(fighter):
+    """Mọi slot trạng thái, không dựa vào STATE_FIELDS (để phát hiện cả trường bị quên trong snapshot)."""
+    return {name: getattr(fighter, name) for name in sorted(set(Fighter.__slots__) - NON_STATE_SLOTS)}
+
+
+def create_linked_sessions(seed, loss, latency_ms):
+    player_configs, enemy_configs = build_animation_configs(ASSETS_FOLDER)
+    transports = [UdpTransport(0, None), UdpTransport(0, None)]
+    transports[0].remote_addr = transports[1].sock.getsockname()
+    transports[1].remote_addr = transports[0].sock.getsockname()
+    sessions = []
+    for side, transport in zip(("player", "enemy"), transports):
+        clock = TickClock()
+        player, enemy = create_scene_characters(player_configs, enemy_configs, 650, 650, 1.5, 1.5, clock=clock)
+        player.verbose = enemy.verbose = False
+        link = LossyLink(transport, loss, latency_ms, duplicate=0.05, seed=f"{seed}-{side}")
+        sessions.append(RollbackSession(side, player, enemy, clock, link))
+    return sessions
+
+
+def test_rollback_sessions_stay_in_sync_over_lossy_link(display):
+    frames = 1200
+    sessions = create_linked_sessions(seed=3, loss=0.15, latency_ms=(0, 15))
+    rng = random.Random(3)
+    scripts = {session.local_side: [rng.choice((0, 0, 0, 0, INPUT_ATTACK, INPUT_DEFEND, INPUT_RELEASE))
+                                    for _ in range(frames)] for session in sessions}
+    deadline = time.perf_counter() + 60
+    try:
+        while (any(session.frame < frames or not session.synced or session.remote_ack < frames - 1
+                   for session in sessions) and time.perf_counter() < deadline):
+            for session in sessions:
+                if session.frame < frames:
+                    session.advance(scripts[session.local_side][session.frame])
+                else:
+                    session.poll()
+            time.sleep(0.0005)
+    finally:
+        for session in sessions:
+            session.transport.close()
+
+    player_side, enemy_side = sessions
+    for session in sessions:
+        assert session.frame == frames and session.synced
+        assert session.desyncs == 0
+        assert session.checksums_compared > 0
+    assert player_side.rollbacks + enemy_side.rollbacks > 0 # Đường truyền xấu phải gây rollback thật
+    assert state_checksum(player_side.player, player_side.enemy) == state_checksum(enemy_side.player, enemy_side.enemy)
+    assert full_state(player_side.player) == full_state(enemy_side.player)
+    assert full_state(player_side.enemy) == full_state(enemy_side.enemy)
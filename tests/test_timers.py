@@ -0,0 +1,133 @@
+"""Hẹn giờ (timers.TimerScheduler) phải cho đúng từng khung như kiểm tra mỗi khung trong update() trước đây."""
+import random
+
+import pytest
+
+from combat_core import Fighter, Match, TickClock
+
+ACTIONS = (None, "attack", "defend", "release")
+
+
+class PollingFighter(Fighter):
+    """Luật cũ: hết trúng đòn kiểm tra trong update_animation, hồi máu trong update, không dùng hẹn giờ."""
+
+    __slots__ = ()
+
+    def _schedule(self, timer, due_ms, callback, phase):
+        return None
+
+    def update_animation(self):
+        if self.is_alive and self.is_showing_hit:
+            if self.clock() - self.hit_start_time > self.hit_display_duration:
+                self.is_showing_hit = False
+                self.action_state = "idle"
+                self._on_hit_end()
+                self.set_animation("idle")
+            return
+        super().update_animation()
+
+    def update(self):
+        self.update_animation()
+        self.update_position()
+        if self.is_alive and self.action_state == "idle":
+            current_time = self.clock()
+            if current_time - self.last_heal_time > self.healing_interval:
+                self.current_hp = min(self.max_hp, self.current_hp + self.healing_amount)
+                self.last_heal_time = current_time
+
+
+def create_pair(fighter_class, clock, rules):
+    pair = []
+    for owner_type in ("player", "enemy"):
+        fighter = fighter_class(owner_type, clock=clock, verbose=False)
+        for name, value in rules.items():
+            setattr(fighter, name, value)
+        fighter.reschedule_timers()
+        pair.append(fighter)
+    pair[0].opponent, pair[1].opponent = pair[1], pair[0]
+    return pair
+
+
+def random_script(seed, steps):
+    rng = random.Random(seed)
+    # Nhiều phòng thủ dài: hồi máu đến hạn trong lúc bận rồi mới được về "idle"
+    weights = (0.8, 0.08, 0.07, 0.05)
+    return [(rng.choices(ACTIONS, weights)[0], rng.choices(ACTIONS, weights)[0], rng.choice((16, 17, 33)))
+            for _ in range(steps)]
+
+
+RULES = [
+    {},
+    {"healing_interval": 250, "hit_display_duration": 200, "max_hp": 400},
+    {"healing_interval": 100, "attack_cooldown": 100, "healing_amount": 7},
+]
+
+
+def trace(pair, clock, script, step):
+    """Trạng thái của hai bên sau mỗi khung; step(hành động player, hành động enemy, delta) chạy một khung."""
+    states = []
+    for player_action, enemy_action, delta in script:
+        step(player_action, enemy_action, delta)
+        states.append((clock.now, pair[0].snapshot(), pair[1].snapshot()))
+        if not (pair[0].is_alive and pair[1].is_alive):
+            break
+    return states
+
+
+def standalone_step(pair, clock):
+    """Vòng lặp không có scheduler chung: mỗi Fighter tự chạy scheduler riêng trong update()."""
+    def step(player_action, enemy_action, delta):
+        Match.apply_action(pair[0], player_action)
+        Match.apply_action(pair[1], enemy_action)
+        for fighter in pair:
+            if fighter.is_alive:
+                fighter.update()
+        clock.advance(delta)
+    return step
+
+
+def polling_trace(script, rules):
+    clock = TickClock()
+    pair = create_pair(PollingFighter, clock, rules)
+    return trace(pair, clock, script, standalone_step(pair, clock))
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("rules", RULES)
+def test_fighters_with_own_schedulers_match_polling(seed, rules):
+    script = random_script(seed, 4000)
+    clock = TickClock()
+    pair = create_pair(Fighter, clock, rules)
+    assert trace(pair, clock, script, standalone_step(pair, clock)) == polling_trace(script, rules)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("rules", RULES)
+def test_match_with_shared_scheduler_matches_polling(seed, rules):
+    script = random_script(seed, 4000)
+    clock = TickClock()
+    match = Match(*create_pair(Fighter, clock, rules), clock=clock)
+
+    def step(player_action, enemy_action, delta):
+        match.step_ms = delta
+        match.step(player_action, enemy_action)
+    assert trace((match.player, match.enemy), clock, script, step) == polling_trace(script, rules)
+
+
+def test_heal_is_not_rearmed_every_frame_while_busy():
+    clock = TickClock()
+    fighter = Fighter("player", clock=clock, verbose=False)
+    fighter.current_hp = 100
+    fighter.start_defend()
+    while clock.now < 3 * fighter.healing_interval:
+        fighter.update()
+        clock.advance(16)
+    # Một lần nổ khi đến hạn (đang phòng thủ nên bỏ), không thử lại mỗi khung
+    assert fighter.timers.fired == 1
+    assert len(fighter.timers) == 0 and fighter.current_hp == 100
+
+    fighter.stop_defend()
+    fighter.update()
+    assert fighter.current_hp == 100 + fighter.healing_amount
+    assert fighter.last_heal_time == clock.now
+    assert len(fighter.timers) == 1 # Lượt hồi máu kế tiếp
@@ -0,0 +1,20 @@
+"""Lưới luật của tournament: giá trị theo đúng kiểu của luật mặc định."""
+import pytest
+
+pytest.importorskip("numpy")
+
+from tournament import parse_grid
+
+
+def test_values_take_the_type_of_the_default_rule():
+    grid = parse_grid(["attack_cooldown=300,500", "healing_amount=2,2.5"])
+    assert grid == {"attack_cooldown": [300, 500], "healing_amount": [2.0, 2.5]}
+    assert all(type(value) is int for value in grid["attack_cooldown"])
+    assert all(type(value) is float for value in grid["healing_amount"])
+
+
+@pytest.mark.parametrize("spec", ["shield_max_hits=1.5", "max_hp=250,abc", "healing_amount=x", "attack_fps=30",
+                                  "attack_cooldown="])
+def test_invalid_values_are_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_grid([spec])
@@ -0,0 +1,98 @@
+"""Bộ hẹn giờ trung tâm cho các hiệu ứng có thời hạn (hết trúng đòn, hết cooldown, hồi máu).
+
+Thay vì mỗi nhân vật tự so thời gian cho từng loại hiệu ứng ở mọi khung hình, mỗi hiệu ứng đặt một
+hẹn giờ vào heap; run_due() mỗi khung chỉ xem đỉnh heap, nên chi phí tỉ lệ với số hẹn giờ đến hạn,
+không phải số nhân vật x số loại hiệu ứng.
+"""
+import heapq
+
+# Thứ tự xử lý các hẹn giờ đến hạn trong cùng một lần run_due (nhỏ chạy trước), bất kể thời điểm hẹn:
+# hết trúng đòn phải xảy ra trước khi kiểm tra hồi máu (chỉ hồi máu khi đã về "idle"), giống thứ tự trong Fighter.update
+HIT_END_PHASE = 0
+COOLDOWN_PHASE = 1
+HEAL_PHASE = 2
+
+
+class Timer:
+    """Một hẹn giờ; cancel() chỉ đánh dấu, mục trong heap được bỏ khi tới lượt hoặc khi dọn heap."""
+
+    __slots__ = ("due", "phase", "callback", "cancelled", "queued")
+
+    def __init__(self, due, phase, callback):
+        self.due = due
+        self.phase = phase
+        self.callback = callback
+        self.cancelled = False
+        self.queued = True # Còn nằm trong heap
+
+
+class TimerScheduler:
+    """Heap các Timer theo (due, thứ tự đặt); mọi nhân vật dùng chung một đồng hồ nên dùng chung một scheduler.
+
+    Vòng lặp game gọi run_due() một lần mỗi khung hình, sau khi đã update mọi nhân vật.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._heap = []
+        self._sequence = 0
+        self._cancelled = 0 # Số mục đã hủy còn nằm trong heap
+        self.fired = 0
+
+    def schedule(self, due_ms, callback, phase=0):
+        """Gọi callback(now) ở lần run_due đầu tiên có now >= due_ms."""
+        timer = Timer(due_ms, phase, callback)
+        self._sequence += 1
+        heapq.heappush(self._heap, (due_ms, self._sequence, timer))
+        return timer
+
+    def cancel(self, timer):
+        if timer is None or timer.cancelled:
+            return
+        timer.cancelled = True
+        if timer.queued:
+            self._cancelled += 1
+            # Dọn heap khi phần lớn là mục đã hủy (ví dụ sau nhiều lần restore trong tìm kiếm của AI)
+            if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+                for entry in self._heap:
+                    if entry[2].cancelled:
+                        entry[2].queued = False
+                self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+
+    def run_due(self, now=None):
+        """Chạy mọi hẹn giờ đã đến hạn, theo phase rồi theo thời điểm hẹn; trả về số hẹn giờ đã chạy.
+
+        Hẹn giờ được đặt trong lúc chạy (kể cả đặt lại cho chính `now`) chờ tới lần run_due sau.
+        """
+        heap = self._heap
+        if not heap:
+            return 0
+        if now is None:
+            now = self.clock()
+        if heap[0][0] > now:
+            return 0
+
+        due = []
+        while heap and heap[0][0] <= now:
+            timer = heapq.heappop(heap)[2]
+            timer.queued = False
+            if timer.cancelled:
+                self._cancelled -= 1
+            else:
+                due.append(timer)
+        if len(due) > 1:
+            due.sort(key=lambda timer: timer.phase) # sort ổn định: cùng phase vẫn theo thời điểm hẹn
+        for timer in due:
+            if not timer.cancelled: # Có thể bị hủy bởi callback chạy trước trong cùng lần
+                timer.cancelled = True # Đã chạy: cancel() sau đó không làm gì
+                timer.callback(now)
+        self.fired += len(due)
+        return len(due)
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    def stats(self):
+        return {"pending": len(self), "heap_size": len(self._heap), "fired": self.fired}
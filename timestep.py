@@ -0,0 +1,94 @@
+import math
+import time
+
+from profiler import percentile
+
+
+# --- Vòng lặp bước cố định: mô phỏng theo step_ms, vẽ theo tốc độ màn hình ---
+class FixedTimestep:
+    """Bộ tích lũy thời gian thực -> số bước mô phỏng cố định cần chạy trong mỗi khung hình vẽ.
+
+    Thời gian mô phỏng là số nguyên mili giây round(bước * step_ms), giống nhau trên mọi máy bất kể tốc độ vẽ.
+    Chống "vòng xoáy tử thần": mỗi khung chạy tối đa max_steps_per_frame bước, phần thời gian dư bị bỏ
+    (game chậm lại thay vì cố đuổi theo và càng lúc càng trễ).
+    """
+
+    def __init__(self, step_ms=1000 / 60, max_steps_per_frame=5, start_ms=0, window=600):
+        self.step_ms = step_ms
+        self.max_steps_per_frame = max_steps_per_frame
+        self.start_ms = start_ms
+        self.steps = 0 # Tổng số bước đã chạy
+        self.accumulator = 0.0
+        self._last_time = None
+
+        # --- Thống kê nhịp khung hình ---
+        self.window = window
+        self.frames = 0
+        self.spiral_frames = 0 # Số khung chạm giới hạn bước
+        self.dropped_ms = 0.0 # Thời gian thực bị bỏ bởi giới hạn bước
+        self.steps_histogram = {} # số bước trong một khung -> số khung
+        self._intervals = [] # Khoảng cách giữa hai khung vẽ (ms), `window` khung gần nhất
+        self._started_at = None
+
+    @property
+    def sim_time(self):
+        """Thời gian mô phỏng hiện tại (ms, số nguyên)."""
+        return self.start_ms + round(self.steps * self.step_ms)
+
+    @property
+    def alpha(self):
+        """Vị trí của khung vẽ giữa bước trước và bước hiện tại (0..1), dùng để nội suy."""
+        return min(self.accumulator / self.step_ms, 1.0)
+
+    def begin_frame(self, now=None):
+        """Cộng thời gian thực từ khung trước; trả về số bước mô phỏng cần chạy trong khung này."""
+        now = time.perf_counter() if now is None else now
+        if self._last_time is None:
+            self._last_time = self._started_at = now
+            return 0
+        elapsed_ms = (now - self._last_time) * 1000
+        self._last_time = now
+        self.frames += 1
+        self._intervals.append(elapsed_ms)
+        if len(self._intervals) > self.window:
+            del self._intervals[0]
+
+        self.accumulator += elapsed_ms
+        steps = int(self.accumulator // self.step_ms)
+        if steps > self.max_steps_per_frame:
+            self.spiral_frames += 1
+            self.dropped_ms += (steps - self.max_steps_per_frame) * self.step_ms
+            steps = self.max_steps_per_frame
+            self.accumulator = self.accumulator % self.step_ms
+        else:
+            self.accumulator -= steps * self.step_ms
+        self.steps_histogram[steps] = self.steps_histogram.get(steps, 0) + 1
+        return steps
+
+    def step(self):
+        """Gọi sau mỗi bước mô phỏng; trả về thời gian mô phỏng mới."""
+        self.steps += 1
+        return self.sim_time
+
+    def stats(self):
+        ordered = sorted(self._intervals)
+        mean = sum(ordered) / len(ordered) if ordered else 0.0
+        jitter = math.sqrt(sum((value - mean) ** 2 for value in ordered) / len(ordered)) if ordered else 0.0
+        elapsed = self._last_time - self._started_at if self._started_at is not None else 0.0
+        return {
+            "frames": self.frames,
+            "steps": self.steps,
+            "render_fps": self.frames / elapsed if elapsed > 0 else 0.0,
+            "sim_hz": self.steps / elapsed if elapsed > 0 else 0.0,
+            "frame_ms_p50": percentile(ordered, 50),
+            "frame_ms_p95": percentile(ordered, 95),
+            "frame_ms_p99": percentile(ordered, 99),
+            "frame_ms_jitter": jitter,
+            "steps_per_frame": dict(sorted(self.steps_histogram.items())),
+            "spiral_frames": self.spiral_frames,
+            "dropped_ms": self.dropped_ms,
+        }
+
+
+def lerp(a, b, alpha):
+    return a + (b - a) * alpha
@@ -0,0 +1,214 @@
+"""Giải đấu quét tham số: mọi tổ hợp luật chiến đấu x mọi cặp chiến thuật, chạy trên nhiều tiến trình (cần numpy).
+
+Mỗi việc = một bộ luật + một cặp chiến thuật (player, enemy), mô phỏng `matches` trận bằng batch_sim.BatchSim
+trong một tiến trình con. Kết quả từng việc được ghi nối vào tệp checkpoint (JSON Lines) ngay khi xong;
+chạy lại cùng lệnh sẽ bỏ qua các việc đã có trong tệp, nên có thể dừng (Ctrl+C) và chạy tiếp bất cứ lúc nào.
+
+Chạy:  python tournament.py --grid attack_cooldown=300,500,800 --grid shield_max_hits=1,3,5 \\
+           --strategies aggressive,defensive,random --matches 20000 --checkpoint sweep.jsonl
+       python tournament.py --checkpoint sweep.jsonl --summary-only        # chỉ in bảng từ checkpoint
+"""
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import time
+import zlib
+
+from batch_sim import POLICIES, RULE_NAMES, BatchSim, default_rules
+
+SUMMARY_COLUMNS = ("player_win_rate", "enemy_win_rate", "timeout_rate", "ttk_p50_ms")
+
+
+def parse_grid(specs):
+    """["attack_cooldown=300,500", ...] -> {"attack_cooldown": [300, 500], ...}"""
+    rule_types = {name: type(value) for name, value in default_rules().items()}
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in RULE_NAMES or not values:
+            raise ValueError(f"Tham số lưới không hợp lệ: '{spec}' (tên hợp lệ: {', '.join(RULE_NAMES)})")
+        grid[name] = [_parse_rule_value(name, value, rule_types[name]) for value in values.split(",")]
+    return grid
+
+
+def _parse_rule_value(name, value, rule_type):
+    """Giá trị theo kiểu của luật mặc định: luật số nguyên (ví dụ shield_max_hits, mảng int16) không nhận số lẻ."""
+    try:
+        return rule_type(value)
+    except ValueError:
+        kind = "số nguyên" if rule_type is int else "số"
+        raise ValueError(f"Giá trị '{value}' của {name} phải là {kind}") from None
+
+
+def job_key(rules, player_strategy, enemy_strategy, matches, max_duration_ms):
+    """Khóa ổn định của một việc, dùng để nhận ra việc đã xong trong checkpoint."""
+    return json.dumps([sorted(rules.items()), player_strategy, enemy_strategy, matches, max_duration_ms])
+
+
+def build_jobs(grid, strategies, matches, max_duration_ms, seed=0):
+    """Tích Descartes của lưới luật với mọi cặp chiến thuật có thứ tự (kể cả cặp giống nhau)."""
+    names = sorted(grid)
+    jobs = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        rules = dict(zip(names, values))
+        for player_strategy, enemy_strategy in itertools.product(strategies, repeat=2):
+            key = job_key(rules, player_strategy, enemy_strategy, matches, max_duration_ms)
+            # Seed theo khóa: việc chạy lại sau khi tiếp tục cho đúng kết quả như lần đầu
+            jobs.append({"key": key, "rules": rules, "player": player_strategy, "enemy": enemy_strategy,
+                         "matches": matches, "max_duration_ms": max_duration_ms,
+                         "seed": zlib.crc32(key.encode()) ^ seed})
+    return jobs
+
+
+def run_job(job):
+    """Chạy trong tiến trình con: một bộ luật, một cặp chiến thuật, `matches` trận."""
+    start = time.perf_counter()
+    sim = BatchSim(job["matches"], **job["rules"])
+    summary = sim.run(POLICIES[job["player"]], POLICIES[job["enemy"]], job["max_duration_ms"], job["seed"])
+    return dict(job, summary=summary, elapsed_s=time.perf_counter() - start)
+
+
+# --- Checkpoint: mỗi dòng một việc đã xong ---
+def load_checkpoint(path):
+    """Đọc các việc đã xong; bỏ qua dòng cuối bị cắt dở nếu lần chạy trước bị dừng giữa chừng."""
+    results = {}
+    if not path or not os.path.isfile(path):
+        return results
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[result["key"]] = result
+    return results
+
+
+class CheckpointWriter:
+    """Ghi nối kết quả vào tệp JSON Lines, flush + fsync sau mỗi việc để không mất kết quả khi bị ngắt."""
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8") if path else None
+        if self._file is not None and self._file.tell() > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n") # Dòng cuối bị cắt dở: kết quả mới bắt đầu ở dòng riêng
+
+    def write(self, result):
+        if self._file is None:
+            return
+        self._file.write(json.dumps(result) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def run_tournament(jobs, checkpoint=None, workers=None, progress=True):
+    """Chạy các việc chưa có trong checkpoint trên `workers` tiến trình; trả về mọi kết quả (cũ + mới)."""
+    results = load_checkpoint(checkpoint)
+    todo = [job for job in jobs if job["key"] not in results]
+    if progress:
+        print(f"{len(jobs)} việc, {len(jobs) - len(todo)} đã có trong checkpoint, còn {len(todo)}.")
+    if not todo:
+        return results
+
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    with CheckpointWriter(checkpoint) as writer, multiprocessing.Pool(workers) as pool:
+        # Việc nào xong trước ghi trước; chunksize=1 vì mỗi việc đã đủ lớn (hàng nghìn trận)
+        for done, result in enumerate(pool.imap_unordered(run_job, todo), 1):
+            writer.write(result)
+            results[result["key"]] = result
+            if progress:
+                elapsed = time.perf_counter() - start
+                remaining = elapsed / done * (len(todo) - done)
+                print(f"[{done}/{len(todo)}] {format_rules(result['rules'])} {result['player']} vs {result['enemy']}: "
+                      f"player thắng {result['summary']['player_win_rate']:.1%} (còn ~{remaining:.0f} s)")
+    return results
+
+
+# --- Bảng tổng kết ---
+def format_rules(rules):
+    return " ".join(f"{name}={value}" for name, value in sorted(rules.items())) or "(mặc định)"
+
+
+def summary_rows(results):
+    """Một hàng mỗi (bộ luật, cặp chiến thuật), sắp theo bộ luật rồi theo cặp chiến thuật."""
+    rows = []
+    for result in results.values():
+        summary = result["summary"]
+        rows.append([format_rules(result["rules"]), result["player"], result["enemy"]]
+                    + [summary[column] for column in SUMMARY_COLUMNS])
+    rows.sort(key=lambda row: row[:3])
+    return rows
+
+
+def print_summary(results):
+    header = ["luật", "player", "enemy", "player thắng", "enemy thắng", "hết giờ", "ttk p50 (ms)"]
+    lines = [[rules, player, enemy, f"{p_win:.1%}", f"{e_win:.1%}", f"{timeout:.1%}", f"{ttk:.0f}"]
+             for rules, player, enemy, p_win, e_win, timeout, ttk in summary_rows(results)]
+    widths = [max(len(str(row[i])) for row in [header] + lines) for i in range(len(header))]
+    for row in [header] + lines:
+        print("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)))
+
+
+def write_summary_csv(results, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["rules", "player", "enemy"] + list(SUMMARY_COLUMNS))
+        writer.writerows(summary_rows(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quét lưới luật chiến đấu x chiến thuật trên nhiều tiến trình.")
+    parser.add_argument("--grid", action="append", default=[], metavar="TÊN=GIÁ_TRỊ,...",
+                        help=f"Một chiều của lưới, lặp lại được; tên: {', '.join(RULE_NAMES)}")
+    parser.add_argument("--strategies", default="aggressive,defensive,random",
+                        help=f"Các chiến thuật, cách nhau bởi dấu phẩy ({', '.join(sorted(POLICIES))})")
+    parser.add_argument("--matches", type=int, default=10000, help="Số trận cho mỗi (bộ luật, cặp chiến thuật)")
+    parser.add_argument("--max-duration", type=float, default=300000, help="Giới hạn thời gian mỗi trận (ms)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="Số tiến trình (mặc định: số nhân CPU)")
+    parser.add_argument("--checkpoint", help="Tệp JSON Lines ghi kết quả từng việc; chạy lại để tiếp tục")
+    parser.add_argument("--summary-only", action="store_true", help="Không chạy, chỉ in bảng từ checkpoint")
+    parser.add_argument("--csv", help="Ghi bảng tổng kết ra tệp CSV")
+    args = parser.parse_args()
+
+    if args.summary_only:
+        results = load_checkpoint(args.checkpoint)
+    else:
+        strategies = args.strategies.split(",")
+        unknown = [name for name in strategies if name not in POLICIES]
+        if unknown:
+            parser.error(f"Chiến thuật không hợp lệ: {unknown}")
+        try:
+            grid = parse_grid(args.grid)
+        except ValueError as e:
+            parser.error(str(e))
+        jobs = build_jobs(grid, strategies, args.matches, args.max_duration, args.seed)
+        try:
+            results = run_tournament(jobs, args.checkpoint, args.workers)
+        except KeyboardInterrupt:
+            print("Đã dừng; chạy lại cùng lệnh để tiếp tục từ checkpoint.")
+            return
+
+    print_summary(results)
+    if args.csv:
+        write_summary_csv(results, args.csv)
+
+
+if __name__ == '__main__':
+    main()